@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the campaign hot paths
+Times address extraction, JSON contact extraction, prompt context building,
+response parsing, placeholder cleaning, generate_email_data and the send
+path at several recipient counts. The LLM is a stub model that answers
+instantly and AgentMail is the in-process fake from utils.fake_agentmail, so
+the numbers measure this code rather than the network. All app state
+(checkpoints, router stats, suppression list) lives in a scratch directory.
+
+Results are written as JSON (one file per commit) so runs can be compared:
+    python benchmarks/bench_campaign.py [--sizes 100,10000] [--out PATH] [--compare OLD.json]
+--compare exits 2 if any case got slower than --threshold (default 1.25x).
+
+Run from the repo root: python benchmarks/bench_campaign.py
+"""
+
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+# Add the repo root to the path to import our utilities
+sys.path.append(REPO_ROOT)
+# Every AgentMail client in the app becomes the in-process fake
+os.environ['AGENTMAIL_BASE_URL'] = 'inprocess'
+
+import components.ai_utils as ai_utils
+from components.agentmail_utils import create_inbox
+from components.email_manager import EmailManager, create_email_config
+from components.json_email_processor import extract_contact_info_from_json
+from config import MODEL_PROFILES
+from utils.checkpoint import clear_checkpoints
+from utils.prompt_context import serialize_contact_context
+from utils.response_parser import parse_email_response
+from utils.validators import extract_emails_from_text
+
+SIZES = [100, 10_000, 100_000]
+# Pure-function cases keep the best of this many runs; pipeline cases run once
+REPEAT = 3
+DEFAULT_THRESHOLD = 1.25
+
+STUB_BODY = (
+    "Hi {name},\n\nI came across the work your team at {company} has been doing and wanted to reach out. "
+    "I have spent the last few years building data pipelines and would love to hear how [Your Team] "
+    "approaches {{the problem}} at your scale.\n\nWould you be open to a short call next week to talk it "
+    "through? I am happy to work around your schedule."
+)
+PROMPT_NAME_RE = re.compile(r'- Name: (.*)')
+PROMPT_COMPANY_RE = re.compile(r'- Company: (.*)')
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Answers like a JSON-mode Gemini model, instantly, greeting whoever the prompt names"""
+
+    def generate_content(self, prompt, request_options=None):
+        name = PROMPT_NAME_RE.search(prompt)
+        company = PROMPT_COMPANY_RE.search(prompt)
+        body = STUB_BODY.format(name=name.group(1) if name else "there",
+                                company=company.group(1) if company else "your company")
+        return StubResponse(json.dumps({'subject': "Quick question about [Your Topic] data work", 'body': body}))
+
+def install_stub_llm():
+    """Route every Gemini model through StubModel"""
+    ai_utils.GEMINI_API_KEY = 'stub'
+    for model_name in MODEL_PROFILES:
+        ai_utils._models[model_name] = StubModel()
+
+def make_raw_contacts(count):
+    """Synthetic JSON import with mixed field names, nested data and 1 in 20 bad addresses"""
+    contacts = []
+    for i in range(count):
+        contact = {
+            'full_name' if i % 3 else 'name': f"First{i} Last{i % 389}",
+            'email': f"broken.{i}@nodomain" if i % 20 == 0 else f"first.last{i}@company{i % 997}.com",
+            'Organization' if i % 2 else 'company': f"Company{i % 997}",
+            'job_title': ['Engineer', 'Recruiter', 'Manager', 'Director'][i % 4],
+            'location': {'city': ['Austin', 'Berlin', 'Toronto'][i % 3], 'remote': i % 2 == 0},
+            'skills': ['python', 'sql', 'spark', 'airflow'][:1 + i % 4],
+            'bio': "Builds data platforms and cares about developer experience. " * (1 + i % 3),
+            'id': i,
+        }
+        contacts.append(contact)
+    return contacts
+
+def make_responses(count):
+    """Model outputs in the shapes parse_email_response handles: JSON, fenced JSON and SUBJECT:/BODY:"""
+    body = STUB_BODY.format(name="Alex", company="Acme")
+    shapes = [
+        json.dumps({'subject': "Data work at Acme", 'body': body}),
+        "```json\n" + json.dumps({'subject': "Data work at Acme", 'body': body}) + "\n```",
+        f"SUBJECT: Data work at Acme\nBODY: {body}",
+        f"**Subject:** Data work at Acme\n\n**Body:**\n{body}",
+    ]
+    return [shapes[i % len(shapes)] for i in range(count)]
+
+def time_call(func, *args):
+    """Return (seconds, result) for a single call"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def best_of(func, *args):
+    """Return (seconds, result) for the fastest of REPEAT calls"""
+    runs = [time_call(func, *args) for _ in range(REPEAT)]
+    return min(runs, key=lambda run: run[0])
+
+def run_generation(contacts, email_config):
+    clear_checkpoints()
+    manager = EmailManager(create_inbox_toggle=False)
+    return manager.generate_email_data([contact['email'] for contact in contacts], email_config, contacts)
+
+def run_send(email_data, inbox_id):
+    manager = EmailManager(create_inbox_toggle=False, selected_inbox=inbox_id)
+    return manager.send_multiple_emails(email_data)
+
+def bench_size(size):
+    """Time every case at one recipient count; returns result records"""
+    raw_contacts = make_raw_contacts(size)
+    pasted_text = ",\n".join(contact['email'] for contact in raw_contacts)
+    responses = make_responses(size)
+    records = []
+
+    def record(case, seconds, items):
+        records.append({
+            'case': case,
+            'size': size,
+            'items': items,
+            'seconds': round(seconds, 6),
+            'us_per_item': round(seconds / items * 1e6, 3) if items else None,
+            'items_per_second': round(items / seconds, 1) if seconds else None,
+        })
+        print(f"{size:>8} {case:<32} {items:>8} {seconds:>9.3f} {seconds / max(items, 1) * 1e6:>10.1f}")
+
+    seconds, emails = best_of(extract_emails_from_text, pasted_text)
+    record('extract_emails_from_text', seconds, size)
+
+    seconds, contacts = best_of(extract_contact_info_from_json, raw_contacts)
+    record('extract_contact_info_from_json', seconds, size)
+
+    seconds, _ = best_of(lambda: [serialize_contact_context(contact) for contact in contacts])
+    record('serialize_contact_context', seconds, len(contacts))
+
+    seconds, parsed = best_of(lambda: [parse_email_response(response) for response in responses])
+    record('parse_email_response', seconds, size)
+
+    bodies = [entry['body'] for entry in parsed]
+    seconds, _ = best_of(lambda: [ai_utils.clean_placeholder_content(body) for body in bodies])
+    record('clean_placeholder_content', seconds, size)
+
+    # Prompt building, the stub model call, parsing and cleaning for one recipient at a time
+    seconds, _ = best_of(lambda: [
+        ai_utils.generate_personalized_email(contact['email'], prompt="Ask about their data platform",
+                                             contact_context=contact, sender_info="Data engineer")
+        for contact in contacts
+    ])
+    record('generate_personalized_email', seconds, len(contacts))
+
+    regular_config = create_email_config('regular', subject="Hello {name}",
+                                         body="Hi {name},\n\nA note for the {title} team at {company}.")
+    seconds, _ = time_call(run_generation, contacts, regular_config)
+    record('generate_email_data_regular', seconds, len(contacts))
+
+    ai_config = create_email_config('ai', prompt="Ask about their data platform",
+                                    subject=None, customize_per_recipient=True)
+    seconds, email_data = time_call(run_generation, contacts, ai_config)
+    record('generate_email_data_ai', seconds, len(contacts))
+
+    inbox_id = create_inbox().inbox_id
+    seconds, results = time_call(run_send, email_data, inbox_id)
+    record('send_multiple_emails', seconds, len(email_data))
+    if results['success'] != len(email_data):
+        print(f"         warning: only {results['success']} of {len(email_data)} sends succeeded ({results})")
+
+    return records
+
+def git_revision():
+    """(commit SHA, whether the tree has uncommitted changes), or (None, None) outside git"""
+    try:
+        sha = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        return sha, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def compare(old, new, threshold):
+    """Print per-case change against an earlier run; returns the cases that regressed"""
+    old_records = {(entry['case'], entry['size']): entry for entry in old['results']}
+    regressions = []
+    print(f"\nCompared with {old.get('commit') or 'unknown commit'} ({old.get('timestamp')}):")
+    print(f"{'size':>8} {'case':<32} {'old us':>10} {'new us':>10} {'ratio':>7}")
+    for entry in new['results']:
+        previous = old_records.get((entry['case'], entry['size']))
+        if not previous or not previous.get('us_per_item') or entry['us_per_item'] is None:
+            continue
+        ratio = entry['us_per_item'] / previous['us_per_item']
+        flag = "  REGRESSION" if ratio > threshold else ""
+        if flag:
+            regressions.append(entry)
+        print(f"{entry['size']:>8} {entry['case']:<32} {previous['us_per_item']:>10.1f} "
+              f"{entry['us_per_item']:>10.1f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main(argv):
+    sizes = SIZES
+    out_path = None
+    baseline = None
+    threshold = DEFAULT_THRESHOLD
+    args = list(argv)
+    while args:
+        flag = args.pop(0)
+        if flag in ('--sizes', '--out', '--compare', '--threshold') and args:
+            value = args.pop(0)
+            if flag == '--sizes':
+                sizes = [int(size.replace('_', '')) for size in value.split(',') if size]
+            elif flag == '--out':
+                out_path = os.path.abspath(value)
+            elif flag == '--compare':
+                baseline = os.path.abspath(value)
+            else:
+                threshold = float(value)
+        else:
+            print("Usage: python benchmarks/bench_campaign.py [--sizes 100,10000] [--out PATH] "
+                  "[--compare OLD.json] [--threshold 1.25]")
+            return 1
+
+    commit, dirty = git_revision()
+    if out_path is None:
+        out_path = os.path.join(RESULTS_DIR, f"{(commit or 'unknown')[:12]}{'-dirty' if dirty else ''}.json")
+
+    install_stub_llm()
+    scratch = tempfile.mkdtemp(prefix='bench_campaign_')
+    os.chdir(scratch)
+    print(f"Scratch directory: {scratch}")
+
+    print(f"{'size':>8} {'case':<32} {'items':>8} {'seconds':>9} {'us/item':>10}")
+    print("-" * 71)
+    results = []
+    for size in sizes:
+        results.extend(bench_size(size))
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, threshold)
+        if regressions:
+            print(f"{len(regressions)} cases are more than {threshold}x slower per item")
+            return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,18 +1,22 @@
 import os
 from dotenv import load_dotenv
-from agentmail import AgentMail
+from utils.agentmail_client import create_agentmail_client
 
 # Load environment variables
 load_dotenv()
 api_key = os.getenv("AGENTMAIL_API_KEY")
 
-# Initialize AgentMail client
-client = AgentMail(api_key=api_key)
+# Initialize AgentMail client (AGENTMAIL_BASE_URL can point it at a local stand-in)
+client = create_agentmail_client(api_key)
 
-def create_inbox():
+def _request_options(timeout):
+    """Per-request options for the AgentMail client, with an optional timeout in seconds"""
+    return {'timeout_in_seconds': int(max(1, timeout))} if timeout else None
+
+def create_inbox(timeout=None):
     """Create a new inbox using the AgentMail API."""
     print("Creating inbox...")
-    inbox = client.inboxes.create()  # domain is optional
+    inbox = client.inboxes.create(request_options=_request_options(timeout))  # domain is optional
     print("Inbox created successfully!")
     print(inbox)
     return inbox
@@ -21,13 +25,14 @@ def list_inboxes():
     """List all available inboxes."""
     return client.inboxes.list()
 
-def send_email(inbox_id, recipient, subject, body):
+def send_email(inbox_id, recipient, subject, body, timeout=None):
     """Send an email using the AgentMail API."""
     return client.inboxes.messages.send(
         inbox_id=inbox_id,
         to=recipient,
         subject=subject,
-        text=body
+        text=body,
+        request_options=_request_options(timeout)
     )
 
 def list_messages(inbox_id):
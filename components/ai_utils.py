@@ -1,18 +1,64 @@
 import google.generativeai as genai
 import os
+import re
 from dotenv import load_dotenv
+from config import MODEL_PROFILES, GENERATION_CALL_TIMEOUT_SECONDS
+from components.model_router import is_rate_limit_error
+from utils.prompt_context import serialize_contact_context
+from utils.response_parser import parse_email_response, EMAIL_RESPONSE_SCHEMA
+from utils.cancellation import CancellationToken
 
 # Load environment variables
 load_dotenv()
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+MODEL_NAME = 'gemini-2.0-flash-lite'  # Fast model with high rate limits, used when no model is routed
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-    # Use the latest Gemini model with high rate limits
-    model = genai.GenerativeModel('gemini-2.0-flash-lite')  # Fast model with high rate limits
     # all models: https://ai.google.dev/gemini-api/docs/models
 
+_models = {}
+
+def supports_structured_output(model_name):
+    """Whether the model can be asked for JSON matching EMAIL_RESPONSE_SCHEMA"""
+    return MODEL_PROFILES.get(model_name, {}).get('structured_output', False)
+
+def get_model(model_name=MODEL_NAME):
+    """Return a cached Gemini model client, in JSON mode where the model supports it"""
+    if model_name not in _models:
+        generation_config = None
+        if supports_structured_output(model_name):
+            generation_config = genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=EMAIL_RESPONSE_SCHEMA
+            )
+        _models[model_name] = genai.GenerativeModel(model_name, generation_config=generation_config)
+    return _models[model_name]
+
+# Common placeholder patterns to replace (case insensitive)
+PLACEHOLDER_REPLACEMENTS = [
+    (re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in [
+        (r'\[Your [^\]]+\]', ''),
+        (r'\{[^}]+\}', ''),
+        (r'your major here', 'Computer Science'),
+        (r'put information about yourself here', 'I am a motivated professional with relevant experience'),
+        (r'insert details here', 'relevant details'),
+        (r'mention your experience', 'my experience'),
+        (r'add your qualifications', 'my qualifications'),
+        (r'insert your background', 'my background'),
+        (r'describe your skills', 'my skills'),
+        (r'your experience here', 'relevant professional experience'),
+        (r'your background here', 'a strong background in technology'),
+        (r'your qualifications here', 'relevant qualifications'),
+        (r'your skills here', 'strong technical skills'),
+    ]
+]
+LEFTOVER_BRACKETS_RE = re.compile(r'\[[^\]]*\]|\{[^}]*\}')
+SPACE_RUN_RE = re.compile(r'[ \t]+')
+LINE_EDGE_SPACE_RE = re.compile(r'[ \t]*\n[ \t]*')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
 def extract_name_and_company(email):
     """Extract name and company from email address using simple logic"""
     try:
@@ -30,43 +76,24 @@ def extract_name_and_company(email):
         return "there", "your company"
 
 def clean_placeholder_content(content):
-    """Remove or replace placeholder content with generic professional content"""
-    import re
-    
-    # Common placeholder patterns to replace
-    placeholder_patterns = [
-        (r'\[Your [^\]]+\]', ''),
-        (r'\[your [^\]]+\]', ''),
-        (r'\{[^}]+\}', ''),
-        (r'your major here', 'Computer Science'),
-        (r'put information about yourself here', 'I am a motivated professional with relevant experience'),
-        (r'insert details here', 'relevant details'),
-        (r'mention your experience', 'my experience'),
-        (r'add your qualifications', 'my qualifications'),
-        (r'insert your background', 'my background'),
-        (r'describe your skills', 'my skills'),
-        (r'your experience here', 'relevant professional experience'),
-        (r'your background here', 'a strong background in technology'),
-        (r'your qualifications here', 'relevant qualifications'),
-        (r'your skills here', 'strong technical skills'),
-    ]
-    
-    # Apply replacements (case insensitive)
-    for pattern, replacement in placeholder_patterns:
-        content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+    """Remove or replace placeholder content with generic professional content, keeping line breaks"""
+    for pattern, replacement in PLACEHOLDER_REPLACEMENTS:
+        content = pattern.sub(replacement, content)
     
     # Clean up any remaining brackets or braces that might contain placeholders
-    content = re.sub(r'\[[^\]]*\]', '', content)
-    content = re.sub(r'\{[^}]*\}', '', content)
+    content = LEFTOVER_BRACKETS_RE.sub('', content)
     
-    # Clean up extra spaces and line breaks
-    content = re.sub(r'\s+', ' ', content)
-    content = re.sub(r'\n\s*\n', '\n\n', content)
+    # Collapse runs of spaces but keep paragraphs: at most one blank line in a row
+    content = SPACE_RUN_RE.sub(' ', content)
+    content = LINE_EDGE_SPACE_RE.sub('\n', content)
+    content = BLANK_LINES_RE.sub('\n\n', content)
     
     return content.strip()
 
-def generate_personalized_email(recipient_email, template=None, prompt=None, subject=None, customize_per_recipient=False, contact_context=None, sender_info=None):
-    """Generate personalized email using Gemini AI"""
+def generate_personalized_email(recipient_email, template=None, prompt=None, subject=None, customize_per_recipient=False, contact_context=None, sender_info=None, model_name=MODEL_NAME, cancel_token=None):
+    """Generate personalized email using Gemini AI; raises OperationCancelled if cancel_token was cancelled"""
+    cancel_token = cancel_token or CancellationToken()
+    cancel_token.raise_if_cancelled()
     
     if not GEMINI_API_KEY:
         # Fallback if no Gemini API key
@@ -78,7 +105,8 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
         
         return {
             'subject': subject or f"Exciting Opportunity at {company}",
-            'body': f"Hi {name},\n\nI hope this email finds you well. I wanted to reach out regarding an exciting opportunity that might interest you."
+            'body': f"Hi {name},\n\nI hope this email finds you well. I wanted to reach out regarding an exciting opportunity that might interest you.",
+            'fallback': True
         }
     
     # Use contact context if provided, otherwise extract from email
@@ -90,6 +118,15 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
         name, company = extract_name_and_company(recipient_email)
         title = "Professional"
     
+    # Compact, budgeted summary of the extra JSON fields (not the whole dict)
+    additional_context = serialize_contact_context(contact_context)
+    context_block = f"- Additional Context:\n{additional_context}" if additional_context else ""
+    
+    if supports_structured_output(model_name):
+        response_format = 'Respond with a JSON object with a "subject" string and a "body" string. Separate paragraphs in the body with blank lines.'
+    else:
+        response_format = "Format your response as:\n            SUBJECT: [subject line here]\n            BODY: [email body here]"
+    
     try:
         if template:
             # Use template with AI enhancement
@@ -105,7 +142,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             - Company: {company}
             - Title: {title}
             - Email: {recipient_email}
-            {f"- Additional Context: {contact_context}" if contact_context and contact_context.get('original_data') else ""}
+            {context_block}
             
             Sender Information (USE THIS FOR ANY PERSONAL DETAILS):
             {sender_info if sender_info else "Professional with relevant experience seeking opportunities"}
@@ -122,9 +159,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             - The user will add their own signature separately
             {customization_note}
             
-            Format your response as:
-            SUBJECT: [subject line here]
-            BODY: [email body here]
+            {response_format}
             """
         elif prompt:
             # Use custom prompt
@@ -138,7 +173,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             - Company: {company}
             - Title: {title}
             - Email: {recipient_email}
-            {f"- Additional Context: {contact_context}" if contact_context and contact_context.get('original_data') else ""}
+            {context_block}
             
             Sender Information (USE THIS FOR ANY PERSONAL DETAILS):
             {sender_info if sender_info else "Professional with relevant experience seeking opportunities"}
@@ -154,9 +189,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             - The user will add their own signature separately
             {customization_note}
             
-            Format your response as:
-            SUBJECT: [subject line here]
-            BODY: [email body here]
+            {response_format}
             """
         else:
             # Default AI generation
@@ -164,7 +197,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             
             ai_prompt = f"""
             Write a professional, personalized email to {name} who works at {company} as a {title} ({recipient_email}).
-            {f"Additional context: {contact_context}" if contact_context and contact_context.get('original_data') else ""}
+            {context_block}
             
             Sender Information (USE THIS FOR ANY PERSONAL DETAILS):
             {sender_info if sender_info else "Professional with relevant experience seeking opportunities"}
@@ -181,33 +214,23 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             - The user will add their own signature separately
             {customization_note}
             
-            Format your response as:
-            SUBJECT: [subject line here]
-            BODY: [email body here]
+            {response_format}
             """
         
-        response = model.generate_content(ai_prompt)
+        response = get_model(model_name).generate_content(
+            ai_prompt,
+            request_options={'timeout': cancel_token.timeout(GENERATION_CALL_TIMEOUT_SECONDS)}
+        )
         content = response.text
         
-        # Post-process to remove any remaining placeholders
-        content = clean_placeholder_content(content)
+        # Parse before cleaning: cleaning strips braces, which would break JSON
+        parsed = parse_email_response(content) or {'subject': '', 'body': content}
         
-        # Parse the response
-        if "SUBJECT:" in content and "BODY:" in content:
-            subject_part = content.split("SUBJECT:")[1].split("BODY:")[0].strip()
-            body_part = content.split("BODY:")[1].strip()
-            
-            return {
-                'subject': subject_part,
-                'body': body_part
-            }
-        else:
-            # Fallback parsing
-            lines = content.strip().split('\n')
-            return {
-                'subject': subject or f"Personalized message for {name}",
-                'body': content
-            }
+        # Post-process to remove any remaining placeholders
+        return {
+            'subject': clean_placeholder_content(parsed['subject']) or subject or f"Personalized message for {name}",
+            'body': clean_placeholder_content(parsed['body'])
+        }
     
     except Exception as e:
         print(f"Gemini API error: {e}")
@@ -220,5 +243,7 @@ def generate_personalized_email(recipient_email, template=None, prompt=None, sub
             
         return {
             'subject': subject or f"Exciting Opportunity at {company}",
-            'body': f"Hi {name},\n\nI hope this email finds you well. I wanted to reach out regarding an exciting opportunity."
+            'body': f"Hi {name},\n\nI hope this email finds you well. I wanted to reach out regarding an exciting opportunity.",
+            'fallback': True,
+            'throttled': is_rate_limit_error(e)
         }
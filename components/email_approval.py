@@ -2,9 +2,16 @@
 Email preview and approval workflow management
 """
 import streamlit as st
-from typing import List, Dict
+from typing import List, Dict, Optional
 from components.email_manager import EmailManager
-from utils.session_manager import get_email_data, mark_email_sent
+from components.review_clustering import cluster_emails, diff_against_representative
+from components.quality_gate import format_issues
+from config import REVIEW_MAX_DIFFS_PER_CLUSTER
+from utils.session_manager import (
+    get_email_data, set_email_data, mark_email_sent, mark_recipients_sent, get_previous_email_data,
+    get_sample_stage, start_sample_stage, clear_sample_stage,
+    get_generation_retry_queue, clear_generation_retry_queue
+)
 
 class EmailApprovalManager:
     """Manages email preview and approval workflows"""
@@ -23,9 +30,20 @@ class EmailApprovalManager:
         # Add bulk select controls if human approval is required
         if human_approval:
             self._display_bulk_approval_controls(email_data)
+            
+            # Near-identical emails can be reviewed and approved a cluster at a time
+            if len(email_data) > 1 and st.checkbox(
+                "Group near-duplicate emails for review", value=True, key="group_similar_emails",
+                help="Shows one representative per group of similar emails plus what differs for each member. "
+                     "Turn off to edit emails individually."
+            ):
+                self._display_clustered_previews(email_data)
+                return
         
         for i, email_info in enumerate(email_data):
             with st.expander(f"Email for {email_info['recipient']}", expanded=human_approval):
+                self._display_quality_warning(email_info)
+                
                 if human_approval and not email_info.get('sent', False):
                     # Editable email content
                     st.write("✏️ **Edit Email Content:**")
@@ -49,6 +67,7 @@ class EmailApprovalManager:
                     if edited_subject != email_info['subject'] or edited_body != email_info['body']:
                         st.session_state.email_data[i]['subject'] = edited_subject
                         st.session_state.email_data[i]['body'] = edited_body
+                        st.session_state.email_data[i]['edited'] = True
                     
                     st.markdown("---")
                     self._display_approval_controls(i, email_info)
@@ -61,6 +80,170 @@ class EmailApprovalManager:
                 if email_info.get('sent', False):
                     st.success(f"Email sent to {email_info['recipient']}")
     
+    def display_sample_review(self, email_data: List[Dict], json_contacts: Optional[List[Dict]] = None) -> None:
+        """Show the sample drafts and let the reviewer accept or tweak the prompt before the full run"""
+        stage = get_sample_stage()
+        if not stage:
+            return
+        
+        email_config = stage['email_config']
+        remaining_recipients = stage['remaining_recipients']
+        
+        st.subheader("Sample Drafts")
+        st.write(f"Review these {len(email_data)} drafts. Once the prompt looks right, "
+                 f"the remaining {len(remaining_recipients)} emails are generated with the same settings.")
+        
+        for email_info in email_data:
+            with st.expander(f"Draft for {email_info['recipient']}", expanded=True):
+                st.write(f"**Subject:** {email_info['subject']}")
+                st.write(f"**Body:**")
+                st.write(email_info['body'])
+        
+        st.markdown("---")
+        # Template campaigns generate from the template and ignore the prompt, so that is what gets edited
+        field = 'template' if email_config.get('template') else 'prompt'
+        edited_prompt = st.text_area(
+            f"Campaign {field}:",
+            value=email_config.get(field) or "",
+            height=120,
+            key=f"sample_review_{field}",
+            help=f"Tweak the {field} and regenerate the sample until the drafts look right."
+        )
+        prompt_changed = edited_prompt.strip() != (email_config.get(field) or "").strip()
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(f"✅ Accept Prompt & Generate Remaining {len(remaining_recipients)} Emails",
+                         disabled=prompt_changed, use_container_width=True):
+                remaining_data = self.email_manager.generate_email_data(
+                    remaining_recipients, email_config, json_contacts, get_previous_email_data()
+                )
+                clear_sample_stage()
+                set_email_data(email_data + remaining_data)
+                st.rerun()
+        with col2:
+            if st.button("🔁 Regenerate Sample With Edited Prompt", disabled=not prompt_changed,
+                         use_container_width=True):
+                approved_config = dict(email_config, **{field: edited_prompt})
+                sample_recipients = [email_info['recipient'] for email_info in email_data]
+                sample_data = self.email_manager.generate_email_data(
+                    sample_recipients, approved_config, json_contacts
+                )
+                start_sample_stage(approved_config, remaining_recipients)
+                set_email_data(sample_data)
+                st.rerun()
+        
+        if prompt_changed:
+            st.info(f"The {field} was edited. Regenerate the sample to review it before generating the rest.")
+    
+    def display_retry_controls(self, email_data: List[Dict], json_contacts: Optional[List[Dict]] = None) -> None:
+        """Offer to retry recipients whose generation failed every attempt"""
+        retry_queue = get_generation_retry_queue()
+        if not retry_queue:
+            return
+        
+        recipients = retry_queue['recipients']
+        st.warning(f"{len(recipients)} emails still need to be generated: " + ", ".join(recipients[:10]))
+        if st.button(f"🔁 Generate {len(recipients)} Remaining Emails", use_container_width=True):
+            clear_generation_retry_queue()
+            retried_data = self.email_manager.generate_email_data(
+                recipients, retry_queue['email_config'], json_contacts
+            )
+            set_email_data(email_data + retried_data)
+            st.rerun()
+    
+    def _display_quality_warning(self, email_info: Dict) -> None:
+        """Show why an email failed the automatic quality check, if it did"""
+        quality = email_info.get('quality')
+        if quality and not quality['passed']:
+            st.warning(f"⚠️ Quality check (score {quality['score']}): {format_issues(quality)}")
+    
+    def _display_clustered_previews(self, email_data: List[Dict]) -> None:
+        """Display one representative per near-duplicate cluster with member diffs and cluster approval"""
+        clusters = cluster_emails(email_data)
+        st.caption(f"{len(email_data)} emails grouped into {len(clusters)} clusters")
+        
+        for cluster in clusters:
+            representative = email_data[cluster['representative']]
+            members = cluster['members']
+            title = f"{len(members)} similar emails (e.g. {representative['recipient']})" if len(members) > 1 \
+                else f"Email for {representative['recipient']}"
+            
+            with st.expander(title, expanded=True):
+                flagged = [email_data[i]['recipient'] for i in members
+                           if not email_data[i].get('quality', {}).get('passed', True)]
+                if flagged:
+                    st.warning(f"{len(flagged)} emails in this cluster failed the quality check: " + ", ".join(flagged[:5]))
+                
+                st.write(f"**Subject:** {representative['subject']}")
+                st.write(f"**Body:**")
+                st.write(representative['body'])
+                
+                all_diffs_viewed = self._display_member_diffs(cluster, representative, email_data)
+                
+                unsent = [i for i in members if not email_data[i].get('sent', False)]
+                if not unsent:
+                    st.success("All emails in this cluster have been sent")
+                    continue
+                
+                # Emails that failed the quality check need an individual look, so cluster approval skips them
+                approvable = [i for i in unsent if email_data[i].get('quality', {}).get('passed', True)]
+                if len(approvable) < len(unsent):
+                    st.caption(f"{len(unsent) - len(approvable)} emails that failed the quality check are not "
+                               f"included; turn off grouping to review and approve them one by one")
+                if not approvable:
+                    continue
+                
+                approval_key = f"approve_cluster_{cluster['representative']}_{representative['recipient']}"
+                if st.session_state.get('select_all_emails') or approval_key not in st.session_state:
+                    st.session_state[approval_key] = all(email_data[i].get('approved', False) for i in approvable)
+                # Approvals are only written when the box is toggled, so auto-approvals survive reruns
+                st.checkbox(
+                    f"Approve all {len(approvable)} emails in this cluster",
+                    key=approval_key,
+                    on_change=self._set_cluster_approval,
+                    args=(approvable, approval_key),
+                    disabled=not all_diffs_viewed,
+                    help=None if all_diffs_viewed else "Page through every member's differences to enable"
+                )
+    
+    def _display_member_diffs(self, cluster: Dict, representative: Dict, email_data: List[Dict]) -> bool:
+        """
+        Show each member's differences from the representative, a page of diffs at a time
+        Returns True once the reviewer has seen every page, so cluster approval only covers viewed diffs
+        """
+        others = cluster['members'][1:]
+        if not others:
+            return True
+        pages = (len(others) + REVIEW_MAX_DIFFS_PER_CLUSTER - 1) // REVIEW_MAX_DIFFS_PER_CLUSTER
+        page = 1
+        cluster_key = f"{cluster['representative']}_{representative['recipient']}"
+        if pages > 1:
+            page = st.number_input(
+                f"Differences page (of {pages})", min_value=1, max_value=pages, step=1,
+                key=f"diff_page_{cluster_key}"
+            )
+        viewed_pages = st.session_state.setdefault(f"diff_pages_viewed_{cluster_key}", set())
+        viewed_pages.add(page)
+        start = (page - 1) * REVIEW_MAX_DIFFS_PER_CLUSTER
+        for member_index in others[start:start + REVIEW_MAX_DIFFS_PER_CLUSTER]:
+            member = email_data[member_index]
+            st.caption(f"Differences for {member['recipient']}")
+            st.code(diff_against_representative(representative, member) or "(identical)", language='diff')
+        
+        if len(viewed_pages) < pages:
+            st.caption(f"Viewed {len(viewed_pages)} of {pages} pages of differences; "
+                       f"view them all to approve this cluster")
+            return False
+        return True
+    
+    @staticmethod
+    def _set_cluster_approval(indices: List[int], approval_key: str) -> None:
+        """Checkbox callback: apply a cluster's approval to its members"""
+        approved = st.session_state[approval_key]
+        for i in indices:
+            st.session_state.email_data[i]['approved'] = approved
+    
     def _display_bulk_approval_controls(self, email_data: List[Dict]) -> None:
         """Display bulk approval controls"""
         st.markdown("---")
@@ -127,21 +310,16 @@ class EmailApprovalManager:
         if approved_emails:
             if st.button(f"📧 Send All Approved Emails ({len(approved_emails)} emails)", 
                         use_container_width=True):
-                self._send_bulk_emails(approved_emails, email_data)
+                self._send_bulk_emails(approved_emails)
         else:
             st.info("No emails approved for sending. Please approve emails above.")
     
-    def _send_bulk_emails(self, approved_emails: List[Dict], all_email_data: List[Dict]) -> None:
+    def _send_bulk_emails(self, approved_emails: List[Dict]) -> None:
         """Send all approved emails in bulk"""
         results = self.email_manager.send_multiple_emails(approved_emails)
         
-        # Update sent status for successfully sent emails
-        for email_info in approved_emails:
-            # Find the index in the original list and mark as sent
-            for i, original_email in enumerate(all_email_data):
-                if original_email['recipient'] == email_info['recipient']:
-                    mark_email_sent(i)
-                    break
+        # Only emails that actually went out are marked; failed and suppressed ones stay approved for a retry
+        mark_recipients_sent(results['sent_recipients'])
         
         self.email_manager.display_results(results)
         st.rerun()
@@ -151,6 +329,5 @@ def display_auto_send_workflow(email_manager: EmailManager, email_data: List[Dic
     results = email_manager.send_multiple_emails(email_data)
     email_manager.display_results(results)
     
-    # Mark all emails as sent in session state
-    for i, _ in enumerate(email_data):
-        mark_email_sent(i)
+    # Mark the emails that went out as sent in session state
+    mark_recipients_sent(results['sent_recipients'])
@@ -4,10 +4,30 @@ Handles email generation, approval, and sending workflows
 """
 import streamlit as st
 import time
-from typing import List, Dict, Optional
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from typing import List, Dict, Optional, Tuple
+from config import (
+    GENERATION_MAX_WORKERS, GENERATION_MAX_ATTEMPTS, GENERATION_RETRY_BACKOFF_SECONDS,
+    SAMPLE_FIRST_SIZE, QUALITY_MAX_REGENERATIONS, HEDGE_LATENCY_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MAX_FRACTION,
+    GENERATION_STAGE_DEADLINE_SECONDS, SEND_CALL_TIMEOUT_SECONDS, SEND_STAGE_DEADLINE_SECONDS, MODEL_ROUTES
+)
 from components.agentmail_utils import create_inbox, send_email
-from components.ai_utils import generate_personalized_email
-from utils.session_manager import get_email_data, set_email_data, mark_email_sent
+from components.ai_utils import generate_personalized_email, extract_name_and_company, MODEL_NAME
+from components.model_router import get_model_router, request_class_for, HedgeBudget
+from components.segmentation import segment_recipients, personalize_segment_draft
+from components.quality_gate import check_email_batch, summarize_quality
+from utils.session_manager import (
+    get_email_data, set_email_data, mark_email_sent, set_generation_retry_queue,
+    get_sample_stage, save_partial_email_data
+)
+from utils.cancellation import CancellationToken, OperationCancelled
+from utils.checkpoint import GenerationCheckpoint, campaign_checkpoint_id
+from utils.suppression import get_suppression_list
+from utils.template_engine import (
+    CompiledTemplate, DEFAULT_FIELD_VALUES, compile_template, contact_field_values, find_missing_fields
+)
 
 class EmailManager:
     """Manages email generation, approval, and sending workflows"""
@@ -15,71 +35,402 @@ class EmailManager:
     def __init__(self, create_inbox_toggle: bool, selected_inbox: Optional[str] = None):
         self.create_inbox_toggle = create_inbox_toggle
         self.selected_inbox = selected_inbox
+        self.suppression_list = get_suppression_list()
+        self.router = get_model_router()
+        self.checkpoint = None
+        self.failed_recipients = []
+        self.cancel_token = CancellationToken()
     
-    def generate_email_data(self, recipients: List[str], email_config: Dict, json_contacts: List[Dict] = None) -> List[Dict]:
-        """Generate email data for all recipients"""
-        email_data = []
-        
-        # Get signature from session state if available
+    def generate_email_data(self, recipients: List[str], email_config: Dict, json_contacts: List[Dict] = None,
+                            previous_email_data: Optional[List[Dict]] = None,
+                            max_workers: int = GENERATION_MAX_WORKERS) -> List[Dict]:
+        """
+        Generate email data for all recipients
+        Unsent emails from previous_email_data whose input fingerprint is unchanged
+        (including reviewer edits) are reused instead of being generated again.
+        AI emails are generated concurrently with up to max_workers requests in flight,
+        checkpointed per recipient so an interrupted run resumes where it stopped.
+        The run stops taking new work once it is stopped or its stage deadline
+        passes; unfinished recipients are left in the retry queue.
+        """
+        # Get signature and sender info from session state if available
         signature = st.session_state.get('email_signature', '')
+        sender_info = st.session_state.get('sender_info', '')
+        
+        # Finished AI emails are checkpointed to disk as they complete
+        self.checkpoint = None
+        self.failed_recipients = []
+        self.cancel_token = CancellationToken(GENERATION_STAGE_DEADLINE_SECONDS)
+        completed_emails = {}
+        resumed = []
+        route_models = None
+        if email_config['email_type'] != "regular":
+            # The configured candidates, not this run's pick: routing shifts with load and stats
+            route_models = MODEL_ROUTES[request_class_for(email_config)]['models']
+            self.checkpoint = GenerationCheckpoint(campaign_checkpoint_id(email_config, sender_info, signature))
+            completed_emails = self.checkpoint.completed()
+        
+        previous_by_recipient = {
+            email['recipient']: email for email in previous_email_data or []
+            if email.get('fingerprint') and not email.get('sent', False)
+        }
+        reused_count = 0
         
         # Create a mapping from email to contact info if JSON contacts provided
-        contact_mapping = {}
-        if json_contacts:
-            for contact in json_contacts:
-                contact_mapping[contact['email']] = contact
+        contact_mapping = build_contact_mapping(json_contacts)
+        
+        # Drop unsubscribed/bounced addresses before spending any generation on them
+        suppressed = [recipient for recipient in recipients if self.suppression_list.is_suppressed(recipient)]
+        if suppressed:
+            st.info(f"Skipping {len(suppressed)} suppressed recipients: " + ", ".join(suppressed[:10]))
+            suppressed_set = set(suppressed)
+            recipients = [recipient for recipient in recipients if recipient not in suppressed_set]
+        
+        if email_config['email_type'] == "regular":
+            # Parse subject/body once; each recipient is then a cheap render
+            subject_template = compile_template(email_config['subject'])
+            body_template = compile_template(email_config['body'])
+            merge_values = build_merge_values(recipients, contact_mapping)
+            for warning in missing_field_warnings([subject_template, body_template], merge_values):
+                st.warning(warning)
+        
+        # Slots keep the output in recipient order even though AI results arrive out of order
+        email_slots = [None] * len(recipients)
+        pending = []
         
         for i, recipient in enumerate(recipients):
-            try:
-                if email_config['email_type'] == "regular":
-                    current_subject = email_config['subject']
-                    current_body = email_config['body']
+            fingerprint = fingerprint_email_inputs(
+                recipient, email_config, contact_mapping.get(recipient), sender_info, signature, route_models
+            )
+            previous_email = previous_by_recipient.get(recipient)
+            if previous_email and previous_email['fingerprint'] == fingerprint:
+                email_slots[i] = previous_email
+                reused_count += 1
+            elif fingerprint in completed_emails:
+                # Finished before an interruption; resume without another LLM call
+                email_slots[i] = completed_emails[fingerprint]
+                resumed.append((i, recipient, fingerprint))
+            elif email_config['email_type'] == "regular":
+                email_slots[i] = new_email_entry(
+                    recipient,
+                    subject_template.render(merge_values[recipient]),
+                    body_template.render(merge_values[recipient]),
+                    fingerprint
+                )
+            else:
+                pending.append((i, recipient, fingerprint))
+        
+        if resumed:
+            st.info(f"Resumed {len(resumed)} emails from an interrupted run")
+        
+        stop_button = st.empty()
+        if pending:
+            # Clicking reruns the script, which interrupts this run; the handler below keeps what finished
+            stop_button.button("⏹ Stop generation", key="stop_generation")
+        try:
+            if pending:
+                segment_count = email_config.get('segment_count') or 0
+                if segment_count and len(pending) > segment_count:
+                    self._generate_segmented_emails(pending, email_slots, email_config, contact_mapping,
+                                                    sender_info, signature, max_workers, segment_count)
                 else:
-                    # AI Email generation
-                    with st.spinner(f"Generating personalized email for {recipient}..."):
-                        # Get contact context if available
-                        contact_context = contact_mapping.get(recipient, None)
-                        
-                        # Get sender info from session state
-                        sender_info = st.session_state.get('sender_info', '')
+                    self._generate_ai_emails(pending, email_slots, email_config, contact_mapping,
+                                             sender_info, signature, max_workers)
+            if pending or resumed:
+                self._apply_quality_gate(pending + resumed, email_slots, email_config, contact_mapping,
+                                         sender_info, signature, max_workers)
+        except BaseException:
+            # Streamlit stops a run by raising into it; stop the workers and keep what finished
+            self.cancel_token.cancel("stopped")
+            if not get_sample_stage():
+                save_partial_email_data([email for email in email_slots if email is not None])
+                set_generation_retry_queue([r for i, r, _ in pending if email_slots[i] is None], email_config)
+            raise
+        stop_button.empty()
+        
+        unfinished = []
+        if self.cancel_token.cancelled:
+            failed = set(self.failed_recipients)
+            unfinished = [r for i, r, _ in pending if email_slots[i] is None and r not in failed]
+            st.warning(f"Generation {self.cancel_token.reason}: {len(pending) - len(unfinished)} of "
+                       f"{len(pending)} emails finished, {len(unfinished)} left in the retry queue")
+        
+        # Recipients that failed every attempt stay queued for a manual retry instead of vanishing
+        if self.failed_recipients:
+            st.error(f"{len(self.failed_recipients)} emails failed after {GENERATION_MAX_ATTEMPTS} attempts: "
+                     + ", ".join(self.failed_recipients[:10]))
+        if self.failed_recipients or unfinished:
+            set_generation_retry_queue(self.failed_recipients + unfinished, email_config)
+        
+        email_data = [email for email in email_slots if email is not None]
+        if reused_count:
+            st.info(f"Reused {reused_count} unchanged emails, generated {len(email_data) - reused_count} new ones")
+        
+        return email_data
+    
+    def _generate_ai_emails(self, pending: List[Tuple[int, str, str]], email_slots: List[Optional[Dict]],
+                            email_config: Dict, contact_mapping: Dict[str, Dict], sender_info: str,
+                            signature: str, max_workers: int) -> None:
+        """Generate AI emails on a worker pool, filling email_slots; Streamlit calls stay on this thread"""
+        request_class = request_class_for(email_config)
+        # Hedges need their own threads: the generation workers block waiting on them
+        hedge_budget = HedgeBudget(HEDGE_MAX_FRACTION)
+        hedge_pool = ThreadPoolExecutor(max_workers=max(1, max_workers) * 2) \
+            if st.session_state.get('hedge_requests', False) else None
+        
+        def call(recipient, model_name, on_start=None):
+            self.cancel_token.raise_if_cancelled()
+            with self.router.slot(model_name):
+                # A hedge may no longer be needed by the time it gets a slot
+                if on_start is not None and not on_start():
+                    raise OperationCancelled("hedge not needed")
+                started = time.time()
+                ai_result = generate_personalized_email(
+                    recipient_email=recipient,
+                    template=email_config.get('template'),
+                    prompt=email_config.get('prompt'),
+                    subject=email_config.get('subject'),
+                    customize_per_recipient=email_config.get('customize_per_recipient', False),
+                    contact_context=contact_mapping.get(recipient, None),
+                    sender_info=sender_info,
+                    model_name=model_name,
+                    cancel_token=self.cancel_token
+                )
+            if ai_result.get('throttled'):
+                self.router.record_call(model_name, 0.0, throttled=True)
+            elif not ai_result.get('fallback'):
+                self.router.record_call(model_name, time.time() - started)
+            return ai_result, model_name
+        
+        def generate(recipient):
+            # Routed per call so a throttled model is swapped out for the retries
+            model_name = self.router.choose(request_class)
+            if hedge_pool is None:
+                ai_result, model_name = call(recipient, model_name)
+            else:
+                ai_result, model_name = self._hedged_call(call, recipient, model_name, request_class,
+                                                          hedge_budget, hedge_pool)
+            body = ai_result['body']
+            # Add signature to AI-generated email if signature exists
+            if signature:
+                body = f"{body}\n\n{signature}"
+            return ai_result['subject'], body, ai_result.get('fallback', False), model_name
+        
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        completed = 0
+        attempts: Dict[int, int] = {}
+        queue = list(pending)
+        
+        try:
+            while queue and not self.cancel_token.cancelled:
+                retry_queue = []
+                executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+                try:
+                    futures = {
+                        executor.submit(generate, recipient): (i, recipient, fingerprint)
+                        for i, recipient, fingerprint in queue
+                    }
+                    for future in as_completed(futures, timeout=self.cancel_token.remaining()):
+                        i, recipient, fingerprint = futures[future]
+                        error = None
+                        try:
+                            subject, body, fallback, model_name = future.result()
+                            email_slots[i] = new_email_entry(recipient, subject, body, fingerprint)
+                            email_slots[i]['model'] = model_name
+                            if fallback:
+                                # Keep the fallback text in case retries fail too, but retry it
+                                email_slots[i]['fallback'] = True
+                                error = "model call failed and fallback text was used"
+                        except OperationCancelled:
+                            continue
+                        except Exception as e:
+                            error = str(e)
+                        attempts[i] = attempts.get(i, 0) + 1
                         
-                        ai_result = generate_personalized_email(
-                            recipient_email=recipient,
-                            template=email_config.get('template'),
-                            prompt=email_config.get('prompt'),
-                            subject=email_config.get('subject'),
-                            customize_per_recipient=email_config.get('customize_per_recipient', False),
-                            contact_context=contact_context,
-                            sender_info=sender_info
-                        )
-                        current_subject = ai_result['subject']
-                        current_body = ai_result['body']
+                        if error is None:
+                            if self.checkpoint:
+                                self.checkpoint.record_done(email_slots[i])
+                        elif attempts[i] < GENERATION_MAX_ATTEMPTS:
+                            retry_queue.append((i, recipient, fingerprint))
+                            continue
+                        else:
+                            if self.checkpoint:
+                                self.checkpoint.record_failed(recipient, fingerprint, attempts[i], error)
+                            if email_slots[i] is None:
+                                self.failed_recipients.append(recipient)
                         
-                        # Add signature to AI-generated email if signature exists
-                        if signature:
-                            current_body = f"{current_body}\n\n{signature}"
-                
-                email_data.append({
-                    'recipient': recipient,
-                    'subject': current_subject,
-                    'body': current_body,
-                    'approved': False,
-                    'sent': False
-                })
+                        completed += 1
+                        progress_bar.progress(completed / len(pending))
+                        status_text.text(f"Generated {completed}/{len(pending)} personalized emails...")
+                except FuturesTimeout:
+                    self.cancel_token.cancel("deadline exceeded")
+                except BaseException:
+                    self.cancel_token.cancel("stopped")
+                    raise
+                finally:
+                    # Queued requests are dropped and in-flight ones are not awaited once cancelled;
+                    # each is bounded by its own call timeout
+                    executor.shutdown(wait=False, cancel_futures=True)
                 
-            except Exception as e:
-                st.error(f"Failed to generate email for {recipient}: {e}")
+                queue = retry_queue
+                if queue and not self.cancel_token.cancelled:
+                    status_text.text(f"Retrying {len(queue)} failed generations...")
+                    self.cancel_token.sleep(GENERATION_RETRY_BACKOFF_SECONDS * max(attempts[i] for i, _, _ in queue))
+        finally:
+            if hedge_pool is not None:
+                # Losing duplicates may still be running; their results are not needed
+                hedge_pool.shutdown(wait=False, cancel_futures=True)
         
-        return email_data
+        status_text.empty()
+        if hedge_budget.hedges:
+            st.caption(f"Hedged {hedge_budget.hedges} slow requests; "
+                       f"the duplicate finished first {hedge_budget.wins} times")
     
-    def send_single_email(self, email_info: Dict) -> bool:
-        """Send a single email"""
+    def _hedged_call(self, call, recipient: str, model_name: str, request_class: str,
+                     budget: HedgeBudget, pool: ThreadPoolExecutor) -> Tuple[Dict, str]:
+        """
+        Run call(recipient, model), duplicating it once it outlives the model's tail latency
+        The hedge goes to another model in the route, never the same one. The first
+        result that isn't fallback text wins; a losing hedge still waiting for a
+        slot gives it up without calling the model, and a call already in flight
+        is left to finish in the background within its call timeout.
+        """
+        budget.record_call()
+        primary = pool.submit(call, recipient, model_name)
+        delay = self.router.latency_percentile(model_name, HEDGE_LATENCY_PERCENTILE, HEDGE_MIN_SAMPLES)
+        # A hedge to the same model would queue behind the slow calls holding its slots
+        alternate = self.router.alternate_model(request_class, model_name)
+        if alternate is None or delay is None or wait([primary], timeout=delay).done or not budget.can_hedge():
+            return primary.result()
+        
+        def start_hedge():
+            # Only counted against the budget once it holds a slot and is still needed
+            if primary.done() and primary.exception() is None and not primary.result()[0].get('fallback'):
+                return False
+            return budget.try_hedge()
+        
+        hedge = pool.submit(call, recipient, alternate, start_hedge)
+        outstanding = {primary, hedge}
+        fallback_result = None
+        while outstanding:
+            done, outstanding = wait(outstanding, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception:
+                    continue
+                if not result[0].get('fallback'):
+                    if future is hedge:
+                        budget.record_win()
+                    for other in outstanding:
+                        other.cancel()
+                    return result
+                fallback_result = fallback_result or result
+        # Neither produced real content: surface the primary's error or fallback text
+        return fallback_result or primary.result()
+    
+    def _apply_quality_gate(self, pending: List[Tuple[int, str, str]], email_slots: List[Optional[Dict]],
+                            email_config: Dict, contact_mapping: Dict[str, Dict], sender_info: str,
+                            signature: str, max_workers: int) -> None:
+        """Score freshly generated emails, regenerate failures, and optionally auto-approve the rest"""
+        request_class = request_class_for(email_config)
+        recipient_names = {
+            recipient: values.get('name')
+            for recipient, values in build_merge_values([r for _, r, _ in pending], contact_mapping).items()
+        }
+        
+        to_check = pending
+        for attempt in range(QUALITY_MAX_REGENERATIONS + 1):
+            generated = [(i, r, f) for i, r, f in to_check if email_slots[i] is not None]
+            results = check_email_batch([email_slots[i] for i, _, _ in generated], recipient_names, signature)
+            # Pass rates feed back into which model the router picks next time
+            for (i, _, _), result in zip(generated, results):
+                if email_slots[i].get('model'):
+                    self.router.record_quality(request_class, email_slots[i]['model'], result['passed'])
+            failed = [entry for entry, result in zip(generated, results) if not result['passed']]
+            if not failed or attempt == QUALITY_MAX_REGENERATIONS or self.cancel_token.cancelled:
+                break
+            st.info(f"Regenerating {len(failed)} emails that failed the quality check...")
+            self._generate_ai_emails(failed, email_slots, email_config, contact_mapping,
+                                     sender_info, signature, max_workers)
+            to_check = failed
+        
+        self.router.save()
+        
+        checked = [email_slots[i] for i, _, _ in pending if email_slots[i] is not None]
+        summary = summarize_quality([email['quality'] for email in checked])
+        if summary['failed']:
+            st.warning(f"Quality check: {summary['passed']} emails passed, "
+                       f"{summary['failed']} flagged for review")
+        
+        # A review setting, not a generation input, so it stays out of email_config and its fingerprints
+        if st.session_state.get('auto_approve_passing', False):
+            for email in checked:
+                if email['quality']['passed']:
+                    email['approved'] = True
+    
+    def _generate_segmented_emails(self, pending: List[Tuple[int, str, str]], email_slots: List[Optional[Dict]],
+                                   email_config: Dict, contact_mapping: Dict[str, Dict], sender_info: str,
+                                   signature: str, max_workers: int, segment_count: int) -> None:
+        """Generate one AI draft per persona segment and adapt it to every other member"""
+        pending_by_recipient = {recipient: (i, fingerprint) for i, recipient, fingerprint in pending}
+        segments = segment_recipients(list(pending_by_recipient), contact_mapping, segment_count)
+        st.info(f"Grouped {len(pending)} recipients into {len(segments)} segments; "
+                f"generating {len(segments)} drafts instead of {len(pending)}")
+        
+        representatives = []
+        for segment in segments:
+            i, fingerprint = pending_by_recipient[segment['representative']]
+            representatives.append((i, segment['representative'], fingerprint))
+        self._generate_ai_emails(representatives, email_slots, email_config, contact_mapping,
+                                 sender_info, signature, max_workers)
+        
+        merge_values = build_merge_values(list(pending_by_recipient), contact_mapping)
+        unsegmented = []
+        for segment in segments:
+            representative = segment['representative']
+            draft = email_slots[pending_by_recipient[representative][0]]
+            for member in segment['members']:
+                if member == representative:
+                    continue
+                i, fingerprint = pending_by_recipient[member]
+                if draft is None:
+                    # The segment draft failed, so fall back to generating members individually
+                    unsegmented.append((i, member, fingerprint))
+                    continue
+                email_slots[i] = new_email_entry(
+                    member,
+                    personalize_segment_draft(draft['subject'], merge_values[representative], merge_values[member]),
+                    personalize_segment_draft(draft['body'], merge_values[representative], merge_values[member]),
+                    fingerprint
+                )
+                if draft.get('fallback'):
+                    email_slots[i]['fallback'] = True
+                if self.checkpoint:
+                    self.checkpoint.record_done(email_slots[i])
+        
+        if unsegmented:
+            self._generate_ai_emails(unsegmented, email_slots, email_config, contact_mapping,
+                                     sender_info, signature, max_workers)
+    
+    def send_single_email(self, email_info: Dict, cancel_token: Optional[CancellationToken] = None) -> bool:
+        """Send a single email; every AgentMail call is bounded by the call timeout and cancel_token's deadline"""
+        cancel_token = cancel_token or CancellationToken()
+        # Re-check at send time; the list may have changed since generation
+        if self.suppression_list.is_suppressed(email_info['recipient']):
+            email_info['suppressed'] = True
+            st.warning(f"Not sending to {email_info['recipient']}: address is on the suppression list")
+            return False
+        
         try:
+            cancel_token.raise_if_cancelled()
             # Create or use existing inbox
             if self.create_inbox_toggle:
-                inbox = create_inbox()
+                inbox = create_inbox(timeout=cancel_token.timeout(SEND_CALL_TIMEOUT_SECONDS))
                 current_inbox_id = inbox.inbox_id
-                time.sleep(1)
+                if not cancel_token.sleep(1):
+                    return False
             else:
                 current_inbox_id = self.selected_inbox
                 if not current_inbox_id:
@@ -91,28 +442,54 @@ class EmailManager:
                 current_inbox_id, 
                 email_info['recipient'], 
                 email_info['subject'], 
-                email_info['body']
+                email_info['body'],
+                timeout=cancel_token.timeout(SEND_CALL_TIMEOUT_SECONDS)
             )
             return True
-            
+        
+        except OperationCancelled:
+            return False
         except Exception as e:
             st.error(f"Failed to send to {email_info['recipient']}: {e}")
             return False
     
-    def send_multiple_emails(self, emails_to_send: List[Dict]) -> Dict[str, int]:
-        """Send multiple emails with progress tracking"""
+    def send_multiple_emails(self, emails_to_send: List[Dict]) -> Dict:
+        """
+        Send multiple emails with progress tracking
+        Stops at the stage deadline; emails never attempted are counted as
+        'cancelled'. 'sent_recipients' lists exactly the recipients that were
+        sent, so callers never mark failed, suppressed or skipped emails as sent.
+        """
+        sent_recipients = []
         success_count = 0
         failed_count = 0
+        suppressed_count = 0
+        cancelled_count = 0
+        self.cancel_token = CancellationToken(SEND_STAGE_DEADLINE_SECONDS)
         
         # Progress tracking
+        stop_button = st.empty()
         if len(emails_to_send) > 1:
             progress_bar = st.progress(0)
             status_text = st.empty()
+            # Clicking reruns the script, which interrupts sending between emails
+            stop_button.button("⏹ Stop sending", key="stop_sending")
         
         for i, email_info in enumerate(emails_to_send):
+            if self.cancel_token.cancelled:
+                cancelled_count = len(emails_to_send) - i
+                break
             with st.spinner(f"Sending to {email_info['recipient']}..."):
-                if self.send_single_email(email_info):
+                if self.send_single_email(email_info, self.cancel_token):
                     success_count += 1
+                    sent_recipients.append(email_info['recipient'])
+                    # Recorded right away so a run interrupted by the stop button never resends it
+                    email_info['sent'] = True
+                elif self.cancel_token.cancelled:
+                    cancelled_count = len(emails_to_send) - i
+                    break
+                elif email_info.get('suppressed', False):
+                    suppressed_count += 1
                 else:
                     failed_count += 1
             
@@ -122,7 +499,9 @@ class EmailManager:
                 progress_bar.progress(progress)
                 status_text.text(f"Processing {i + 1}/{len(emails_to_send)} emails...")
         
-        return {'success': success_count, 'failed': failed_count}
+        stop_button.empty()
+        return {'success': success_count, 'failed': failed_count, 'suppressed': suppressed_count,
+                'cancelled': cancelled_count, 'sent_recipients': sent_recipients}
     
     def get_approved_emails(self, email_data: List[Dict]) -> List[Dict]:
         """Get list of approved but not sent emails"""
@@ -135,6 +514,97 @@ class EmailManager:
             st.success(f"Successfully sent {results['success']} emails!")
         if results['failed'] > 0:
             st.error(f"{results['failed']} emails failed to send")
+        if results.get('suppressed', 0) > 0:
+            st.info(f"{results['suppressed']} emails skipped because the recipient is suppressed")
+        if results.get('cancelled', 0) > 0:
+            st.warning(f"Sending {self.cancel_token.reason}: {results['cancelled']} emails were not sent")
+
+def new_email_entry(recipient: str, subject: str, body: str, fingerprint: str) -> Dict:
+    """Create a fresh, unapproved email record"""
+    return {
+        'recipient': recipient,
+        'subject': subject,
+        'body': body,
+        'approved': False,
+        'sent': False,
+        'fingerprint': fingerprint
+    }
+
+def build_contact_mapping(json_contacts: Optional[List[Dict]]) -> Dict[str, Dict]:
+    """Map each email address to its JSON contact"""
+    return {contact['email']: contact for contact in json_contacts or []}
+
+def select_sample_recipients(recipients: List[str], json_contacts: Optional[List[Dict]] = None,
+                             sample_size: int = SAMPLE_FIRST_SIZE) -> List[str]:
+    """
+    Pick a small stratified sample for prompt review
+    Recipients are grouped by (company, title); the largest groups are sampled
+    first, one recipient at a time, so the drafts cover the most common personas.
+    """
+    contact_mapping = build_contact_mapping(json_contacts)
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for recipient in recipients:
+        contact = contact_mapping.get(recipient)
+        if contact:
+            # JSON imports can carry explicit nulls
+            key = ((contact.get('company') or '').lower(), (contact.get('title') or '').lower())
+        else:
+            key = (extract_name_and_company(recipient)[1].lower(), '')
+        groups.setdefault(key, []).append(recipient)
+    
+    ordered_groups = sorted(groups.values(), key=len, reverse=True)
+    sample = []
+    depth = 0
+    while len(sample) < min(sample_size, len(recipients)):
+        for group in ordered_groups:
+            if depth < len(group) and len(sample) < sample_size:
+                sample.append(group[depth])
+        depth += 1
+    return sample
+
+def fingerprint_email_inputs(recipient: str, email_config: Dict, contact: Optional[Dict],
+                             sender_info: str, signature: str, models: Optional[List[str]] = None) -> str:
+    """
+    Hash everything that determines a generated email, so unchanged ones can be reused
+    models is the route's candidate list; which of them wrote an email is
+    stored on the email itself.
+    """
+    inputs = {
+        'recipient': recipient,
+        'config': email_config,
+        'contact': contact,
+        'signature': signature,
+    }
+    if email_config.get('email_type') != "regular":
+        inputs['sender_info'] = sender_info
+        inputs['models'] = models or [MODEL_NAME]
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def build_merge_values(recipients: List[str], contact_mapping: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Flatten each recipient's contact data into template merge fields"""
+    merge_values = {}
+    for recipient in recipients:
+        contact = contact_mapping.get(recipient)
+        fallback = None
+        if not contact:
+            # No JSON data for this address, so derive what we can from it
+            name, company = extract_name_and_company(recipient)
+            fallback = {'name': name, 'company': company}
+        merge_values[recipient] = contact_field_values(recipient, contact, fallback)
+    return merge_values
+
+def missing_field_warnings(templates: List[CompiledTemplate], merge_values: Dict[str, Dict]) -> List[str]:
+    """Describe template fields that some recipients have no data for"""
+    warnings = []
+    for field, missing_recipients in find_missing_fields(templates, merge_values).items():
+        outcome = f"'{DEFAULT_FIELD_VALUES[field]}'" if field in DEFAULT_FIELD_VALUES else "blank"
+        warnings.append(
+            f"{len(missing_recipients)} recipients have no value for {{{field}}} "
+            f"(e.g. {', '.join(missing_recipients[:3])}) and will get {outcome}. "
+            f"Set your own fallback with {{{field}|default text}}."
+        )
+    return warnings
 
 def create_email_config(email_type: str, **kwargs) -> Dict:
     """Create email configuration dictionary"""
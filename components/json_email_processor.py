@@ -5,7 +5,8 @@ Handles JSON input with flexible field mapping for email generation
 import streamlit as st
 import json
 from typing import List, Dict, Optional, Any
-import re
+from utils.validators import validate_email
+from utils.prompt_context import serialize_contact_context
 
 def extract_contact_info_from_json(json_data: List[Dict[str, Any]]) -> List[Dict[str, str]]:
     """
@@ -61,8 +62,7 @@ def extract_field_value(entry: Dict[str, Any], possible_fields: List[str], defau
 
 def is_valid_email(email: str) -> bool:
     """Validate email address format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return validate_email(email)
 
 def display_json_email_input() -> Optional[List[Dict[str, str]]]:
     """Display JSON input interface and return extracted contact data"""
@@ -118,22 +118,8 @@ def create_recipients_from_json(contacts: List[Dict[str, str]]) -> List[str]:
 
 def enhance_ai_prompt_with_json_context(base_prompt: str, contact: Dict[str, str]) -> str:
     """Enhance AI prompt with additional context from JSON data"""
-    context_additions = []
-    
-    # Add LinkedIn if available
-    original_data = contact.get('original_data', {})
-    if 'linkedin' in original_data:
-        context_additions.append(f"LinkedIn: {original_data['linkedin']}")
-    
-    # Add any other relevant fields
-    relevant_fields = ['location', 'experience', 'skills', 'department', 'years_experience']
-    for field in relevant_fields:
-        if field in original_data and original_data[field]:
-            context_additions.append(f"{field.replace('_', ' ').title()}: {original_data[field]}")
-    
-    if context_additions:
-        enhanced_prompt = f"{base_prompt}\n\nAdditional context about {contact['name']}:\n"
-        enhanced_prompt += "\n".join(f"- {addition}" for addition in context_additions)
-        return enhanced_prompt
+    context = serialize_contact_context(contact)
+    if context:
+        return f"{base_prompt}\n\nAdditional context about {contact['name']}:\n{context}"
     
     return base_prompt
@@ -0,0 +1,215 @@
+"""
+Cost/latency-aware model routing for LLM requests
+Each request class (consistent campaign, customized campaign, reply drafting)
+lists candidate models cheapest first together with latency, cost and quality
+targets. The router picks the cheapest candidate that meets the targets given
+observed latency and quality-gate pass rates, caps concurrent requests per
+model, and steps down to a cheaper model of the same provider while a model
+is being rate limited.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+from config import (
+    MODEL_PROFILES, MODEL_ROUTES, MODEL_THROTTLE_COOLDOWN_SECONDS,
+    MODEL_QUALITY_WINDOW, MODEL_QUALITY_MIN_SAMPLES, MODEL_STATS_PATH, MODEL_LATENCY_WINDOW
+)
+
+LATENCY_SMOOTHING = 0.2  # weight of the newest call in the latency moving average
+
+def request_class_for(email_config: Dict) -> str:
+    """Route campaigns by whether every recipient gets custom content"""
+    return 'customized' if email_config.get('customize_per_recipient') else 'consistent'
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an LLM client error means the model is throttling us"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ('429', 'resourceexhausted', 'ratelimit', 'rate limit', 'quota'))
+
+class ModelRouter:
+    """Chooses a model per request class and tracks how each model performs"""
+
+    def __init__(self, profiles: Dict[str, Dict] = MODEL_PROFILES, routes: Dict[str, Dict] = MODEL_ROUTES,
+                 stats_path: Optional[str] = MODEL_STATS_PATH):
+        self.profiles = profiles
+        self.routes = routes
+        self.stats_path = stats_path
+        self._lock = threading.Lock()
+        self._pools = {name: threading.BoundedSemaphore(profile['max_concurrency'])
+                       for name, profile in profiles.items()}
+        self._throttled_until: Dict[str, float] = {}
+        # Smoothed seconds per successful call, by model
+        self.latency: Dict[str, float] = {}
+        # Recent raw latencies by model, for tail percentiles
+        self._latency_samples: Dict[str, Deque[float]] = {}
+        # request class -> model -> [passed, total], decayed so old results fade out
+        self.quality: Dict[str, Dict[str, List[float]]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.latency = stats.get('latency', {})
+        self.quality = stats.get('quality', {})
+
+    def save(self) -> None:
+        """Persist observed latency and pass rates so routing survives restarts"""
+        if not self.stats_path:
+            return
+        with self._lock:
+            stats = {'latency': dict(self.latency),
+                     'quality': {cls: dict(models) for cls, models in self.quality.items()}}
+        directory = os.path.dirname(self.stats_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, self.stats_path)
+
+    def pass_rate(self, request_class: str, model: str) -> Optional[float]:
+        """Observed quality-gate pass rate, or None until there are enough results"""
+        passed, total = self.quality.get(request_class, {}).get(model, (0.0, 0.0))
+        if total < MODEL_QUALITY_MIN_SAMPLES:
+            return None
+        return passed / total
+
+    def is_throttled(self, model: str) -> bool:
+        return self._throttled_until.get(model, 0.0) > time.time()
+
+    def _meets_targets(self, request_class: str, model: str) -> bool:
+        route = self.routes[request_class]
+        rate = self.pass_rate(request_class, model)
+        latency = self.latency.get(model)
+        # Models without enough history get the benefit of the doubt
+        return ((rate is None or rate >= route['min_pass_rate'])
+                and (latency is None or latency <= route['max_latency_seconds']))
+
+    def choose(self, request_class: str) -> str:
+        """Cheapest model meeting the class's targets, or a cheaper stand-in while it is throttled"""
+        route = self.routes[request_class]
+        candidates = [model for model in route['models']
+                      if self.profiles[model]['cost'] <= route['max_cost']] or route['models'][:1]
+        chosen = next((model for model in candidates if self._meets_targets(request_class, model)), None)
+        if chosen is None:
+            # Nothing meets every target: go with the best observed quality
+            chosen = max(candidates, key=lambda model: self.pass_rate(request_class, model) or 0.0)
+        # Under throttling step down in cost rather than up
+        return self.fallback_model(chosen) if self.is_throttled(chosen) else chosen
+
+    def alternate_model(self, request_class: str, model: str) -> Optional[str]:
+        """Another unthrottled candidate for the class to send a hedge to, or None if there is none"""
+        for candidate in self.routes[request_class]['models']:
+            if candidate != model and not self.is_throttled(candidate):
+                return candidate
+        return None
+
+    def fallback_model(self, model: str) -> str:
+        """The closest cheaper, unthrottled model from the same provider (or model itself)"""
+        profile = self.profiles[model]
+        cheaper = [
+            (candidate['cost'], name) for name, candidate in self.profiles.items()
+            if candidate['provider'] == profile['provider'] and candidate['cost'] < profile['cost']
+            and not self.is_throttled(name)
+        ]
+        return max(cheaper)[1] if cheaper else model
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        """Hold one of the model's concurrency slots for the duration of a call"""
+        pool = self._pools.get(model)
+        if pool is None:
+            yield
+            return
+        with pool:
+            yield
+
+    def record_call(self, model: str, seconds: float, throttled: bool = False) -> None:
+        """Record a call's latency, or put a rate-limited model on cooldown"""
+        with self._lock:
+            if throttled:
+                self._throttled_until[model] = time.time() + MODEL_THROTTLE_COOLDOWN_SECONDS
+                return
+            self._latency_samples.setdefault(model, deque(maxlen=MODEL_LATENCY_WINDOW)).append(seconds)
+            previous = self.latency.get(model)
+            self.latency[model] = seconds if previous is None else (
+                LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous)
+
+    def latency_percentile(self, model: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Observed latency percentile in seconds, or None with too few recent calls"""
+        with self._lock:
+            samples = sorted(self._latency_samples.get(model, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+    def record_quality(self, request_class: str, model: str, passed: bool) -> None:
+        """Record whether a model's email passed the quality gate"""
+        decay = 1 - 1 / MODEL_QUALITY_WINDOW
+        with self._lock:
+            counts = self.quality.setdefault(request_class, {}).setdefault(model, [0.0, 0.0])
+            counts[0] = counts[0] * decay + (1.0 if passed else 0.0)
+            counts[1] = counts[1] * decay + 1.0
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per-model latency, throttling and pass rate per request class"""
+        return {
+            model: {
+                'latency_seconds': self.latency.get(model),
+                'throttled': self.is_throttled(model),
+                'pass_rates': {cls: self.pass_rate(cls, model) for cls in self.routes},
+            }
+            for model in self.profiles
+        }
+
+class HedgeBudget:
+    """Caps duplicate (hedged) requests at a fraction of a campaign's calls"""
+
+    def __init__(self, max_fraction: float):
+        self.max_fraction = max_fraction
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def can_hedge(self) -> bool:
+        """Whether the budget has room for another hedge, without claiming it"""
+        with self._lock:
+            return self.hedges + 1 <= self.calls * self.max_fraction
+
+    def try_hedge(self) -> bool:
+        """Claim one hedge if the budget allows it; called as the hedge starts"""
+        with self._lock:
+            if self.hedges + 1 > self.calls * self.max_fraction:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide router, loading saved stats on first use"""
+    global _model_router
+    with _model_router_lock:
+        if _model_router is None:
+            _model_router = ModelRouter()
+    return _model_router
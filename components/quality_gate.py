@@ -0,0 +1,103 @@
+"""
+Rule-based quality gate for generated emails
+Scores a whole batch in one pass with precompiled checks so obvious failures
+(canned fallback text, placeholder residue, unparsed SUBJECT:/BODY: blobs,
+wrong length, missing greeting name, bad subjects) never reach a reviewer.
+"""
+import re
+from typing import Dict, List, Optional
+from config import QUALITY_MIN_BODY_WORDS, QUALITY_MAX_BODY_WORDS, QUALITY_MAX_SUBJECT_CHARS
+
+# One alternation for every kind of leftover placeholder, so each body is scanned once
+PLACEHOLDER_RE = re.compile(
+    r'\[[^\]\n]{1,40}\]'                      # [Your Name], [Company]
+    r'|\{[^}\n]{1,40}\}'                      # {name}, {company}
+    r'|\b(?:your|insert|add|put|mention|describe) (?:name|major|details|experience|background|'
+    r'qualifications|skills|information)(?: about yourself)? here\b'
+    r'|\b(?:lorem ipsum|TODO|TBD|XXX)\b',
+    re.IGNORECASE
+)
+FORMAT_RESIDUE_RE = re.compile(r'^\s*\**\s*(?:SUBJECT|BODY)\s*\**\s*:', re.IGNORECASE | re.MULTILINE)
+WORD_RE = re.compile(r'\S+')
+
+# Issue name -> score penalty (a perfect email scores 1.0)
+PENALTIES = {
+    'fallback': 1.0,
+    'format_residue': 1.0,
+    'placeholder': 0.6,
+    'empty_subject': 0.6,
+    'subject_format': 0.4,
+    'too_short': 0.4,
+    'too_long': 0.3,
+    'missing_name': 0.3,
+}
+# Any of these fails the email outright regardless of score
+BLOCKING_ISSUES = {'fallback', 'format_residue', 'placeholder', 'empty_subject'}
+PASSING_SCORE = 0.7
+
+def check_email(email_info: Dict, recipient_name: Optional[str] = None, signature: str = "") -> Dict:
+    """Score one email; returns {'score', 'passed', 'issues': [(issue, detail), ...]}"""
+    issues = []
+    subject = (email_info.get('subject') or '').strip()
+    body = email_info.get('body') or ''
+    # The signature is user-written, so only the generated part is judged
+    if signature and body.endswith(signature):
+        body = body[:-len(signature)]
+
+    # generate_personalized_email flags its canned fallback text; the wording alone proves nothing
+    if email_info.get('fallback'):
+        issues.append(('fallback', "generation failed and the canned fallback text was used"))
+
+    if FORMAT_RESIDUE_RE.search(body) or FORMAT_RESIDUE_RE.search(subject):
+        issues.append(('format_residue', "response was not parsed into subject and body"))
+
+    placeholder = PLACEHOLDER_RE.search(subject) or PLACEHOLDER_RE.search(body)
+    if placeholder:
+        issues.append(('placeholder', f"leftover placeholder '{placeholder.group()}'"))
+
+    if not subject:
+        issues.append(('empty_subject', "subject is empty"))
+    elif len(subject) > QUALITY_MAX_SUBJECT_CHARS or '\n' in subject or subject == body.strip():
+        issues.append(('subject_format', "subject is too long or contains the body"))
+
+    word_count = len(WORD_RE.findall(body))
+    if word_count < QUALITY_MIN_BODY_WORDS:
+        issues.append(('too_short', f"body has {word_count} words"))
+    elif word_count > QUALITY_MAX_BODY_WORDS:
+        issues.append(('too_long', f"body has {word_count} words"))
+
+    if recipient_name and recipient_name.lower() != 'there':
+        first_name = recipient_name.split()[0]
+        if first_name.lower() not in body.lower():
+            issues.append(('missing_name', f"recipient name '{first_name}' not mentioned"))
+
+    score = max(0.0, 1.0 - sum(PENALTIES[issue] for issue, _ in issues))
+    passed = score >= PASSING_SCORE and not any(issue in BLOCKING_ISSUES for issue, _ in issues)
+    return {'score': round(score, 2), 'passed': passed, 'issues': issues}
+
+def check_email_batch(email_data: List[Dict], recipient_names: Optional[Dict[str, str]] = None,
+                      signature: str = "") -> List[Dict]:
+    """
+    Score every email in one pass, storing the result under email['quality']
+    Returns the results in email_data order.
+    """
+    recipient_names = recipient_names or {}
+    results = []
+    for email_info in email_data:
+        result = check_email(email_info, recipient_names.get(email_info['recipient']), signature)
+        email_info['quality'] = result
+        results.append(result)
+    return results
+
+def summarize_quality(results: List[Dict]) -> Dict[str, int]:
+    """Count passing emails and how often each issue occurred"""
+    summary = {'passed': 0, 'failed': 0}
+    for result in results:
+        summary['passed' if result['passed'] else 'failed'] += 1
+        for issue, _ in result['issues']:
+            summary[issue] = summary.get(issue, 0) + 1
+    return summary
+
+def format_issues(quality: Dict) -> str:
+    """Human-readable list of an email's quality issues"""
+    return "; ".join(detail for _, detail in quality.get('issues', []))
@@ -0,0 +1,107 @@
+"""
+Near-duplicate clustering of generated emails for faster review
+Emails are reduced to word-shingle sets and MinHash signatures. Signature bands
+(LSH) find candidate clusters without comparing every pair, and the exact
+Jaccard similarity against the cluster representative decides membership.
+A reviewer then reads one representative and skims a diff for every member.
+"""
+import difflib
+import hashlib
+import random
+import re
+from typing import Dict, List, Set
+from config import REVIEW_MIN_SIMILARITY
+
+WORD_RE = re.compile(r'\w+')
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 32
+# 16 bands of 2 rows: a pair at similarity s becomes a candidate with probability
+# 1 - (1 - s^2)^16, over 99.9% at the 0.6 threshold; exact Jaccard then weeds out
+# the extra low-similarity candidates
+MINHASH_BANDS = 16
+MINHASH_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Fixed seed so clusters are stable across Streamlit reruns
+_rng = random.Random(1337)
+MINHASH_COEFFICIENTS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+def shingles(text: str) -> Set[int]:
+    """Hashed word 3-shingles of a text"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = [' '.join(words)]
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+            for gram in grams}
+
+def minhash_signature(shingle_set: Set[int]) -> List[int]:
+    """MinHash signature of a shingle set"""
+    return [
+        min((a * value + b) % MERSENNE_PRIME for value in shingle_set)
+        for a, b in MINHASH_COEFFICIENTS
+    ]
+
+def jaccard_similarity(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def _email_text(email_info: Dict) -> str:
+    return f"{email_info.get('subject', '')}\n{email_info.get('body', '')}"
+
+def cluster_emails(email_data: List[Dict], min_similarity: float = REVIEW_MIN_SIMILARITY) -> List[Dict]:
+    """
+    Group emails with near-identical subject and body
+    Returns [{'representative': index, 'members': [indexes...]}, ...] in email order;
+    indexes point into email_data and the representative is also a member.
+    """
+    clusters: List[Dict] = []
+    representative_shingles: List[Set[int]] = []
+    # (band, band values) -> clusters whose representative has that band
+    band_index: Dict[tuple, List[int]] = {}
+
+    for index, email_info in enumerate(email_data):
+        shingle_set = shingles(_email_text(email_info))
+        signature = minhash_signature(shingle_set)
+        bands = [
+            (band, tuple(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]))
+            for band in range(MINHASH_BANDS)
+        ]
+
+        best_cluster, best_similarity = None, min_similarity
+        checked = set()
+        for key in bands:
+            for cluster_id in band_index.get(key, []):
+                if cluster_id in checked:
+                    continue
+                checked.add(cluster_id)
+                similarity = jaccard_similarity(shingle_set, representative_shingles[cluster_id])
+                if similarity >= best_similarity:
+                    best_cluster, best_similarity = cluster_id, similarity
+
+        if best_cluster is None:
+            best_cluster = len(clusters)
+            clusters.append({'representative': index, 'members': []})
+            representative_shingles.append(shingle_set)
+            for key in bands:
+                band_index.setdefault(key, []).append(best_cluster)
+        clusters[best_cluster]['members'].append(index)
+
+    return clusters
+
+def diff_against_representative(representative: Dict, member: Dict) -> str:
+    """Unified diff of a member email against its cluster representative"""
+    diff = difflib.unified_diff(
+        f"Subject: {representative['subject']}\n{representative['body']}".splitlines(),
+        f"Subject: {member['subject']}\n{member['body']}".splitlines(),
+        fromfile=representative['recipient'],
+        tofile=member['recipient'],
+        lineterm='',
+        n=0
+    )
+    return '\n'.join(diff)
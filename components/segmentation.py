@@ -0,0 +1,138 @@
+"""
+Local contact segmentation for segment-level email generation
+Contacts are turned into TF-IDF vectors over title, company and short extra
+JSON fields, then grouped with spherical k-means. One AI draft is generated
+per segment and adapted to each member without another LLM call.
+"""
+import math
+import re
+from typing import Dict, List, Optional
+from config import SEGMENT_KMEANS_ITERATIONS
+from utils.prompt_context import flatten_json
+from utils.template_engine import DEFAULT_FIELD_VALUES
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = {'a', 'an', 'and', 'at', 'for', 'in', 'of', 'on', 'the', 'to', 'with', 'inc', 'llc', 'co', 'corp'}
+# Extra JSON values longer than this are free text, which says little about the persona
+MAX_EXTRA_VALUE_CHARS = 40
+
+def _tokens(text: str, prefix: str) -> List[str]:
+    return [f"{prefix}:{token}" for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+def contact_features(recipient: str, contact: Optional[Dict]) -> List[str]:
+    """Feature tokens describing a contact's persona"""
+    if not contact:
+        # Without JSON data the domain is all we know
+        domain = recipient.split('@')[-1].rsplit('.', 1)[0]
+        return _tokens(domain, 'company')
+
+    # Title words count double: the title family matters most for the message
+    features = _tokens(contact.get('title', ''), 'title') * 2
+    features += _tokens(contact.get('company', ''), 'company')
+    for key, value in flatten_json(contact.get('original_data') or {}):
+        leaf = key.rsplit('.', 1)[-1].lower()
+        if leaf in ('name', 'email', 'company', 'title') or len(value) > MAX_EXTRA_VALUE_CHARS:
+            continue
+        features += _tokens(value, leaf)
+    return features
+
+def _tfidf_vectors(documents: List[List[str]]) -> List[Dict[str, float]]:
+    """Unit-length TF-IDF vectors as sparse dicts"""
+    document_frequency: Dict[str, int] = {}
+    for tokens in documents:
+        for token in set(tokens):
+            document_frequency[token] = document_frequency.get(token, 0) + 1
+
+    count = len(documents)
+    vectors = []
+    for tokens in documents:
+        vector: Dict[str, float] = {}
+        for token in tokens:
+            vector[token] = vector.get(token, 0.0) + 1.0
+        for token, term_frequency in vector.items():
+            vector[token] = term_frequency * (math.log((1 + count) / (1 + document_frequency[token])) + 1)
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({token: weight / norm for token, weight in vector.items()})
+    return vectors
+
+def _similarity(vector: Dict[str, float], centroid: Dict[str, float]) -> float:
+    if len(vector) > len(centroid):
+        vector, centroid = centroid, vector
+    return sum(weight * centroid.get(token, 0.0) for token, weight in vector.items())
+
+def _centroid(vectors: List[Dict[str, float]]) -> Dict[str, float]:
+    centroid: Dict[str, float] = {}
+    for vector in vectors:
+        for token, weight in vector.items():
+            centroid[token] = centroid.get(token, 0.0) + weight
+    norm = math.sqrt(sum(weight * weight for weight in centroid.values())) or 1.0
+    return {token: weight / norm for token, weight in centroid.items()}
+
+def segment_recipients(recipients: List[str], contact_mapping: Dict[str, Dict], num_segments: int,
+                       iterations: int = SEGMENT_KMEANS_ITERATIONS) -> List[Dict]:
+    """
+    Group recipients into at most num_segments personas
+    Returns [{'representative': recipient, 'members': [recipients...]}, ...], where
+    the representative is the member closest to the segment centroid.
+    """
+    if not recipients:
+        return []
+    num_segments = max(1, min(num_segments, len(recipients)))
+    vectors = _tfidf_vectors([contact_features(r, contact_mapping.get(r)) for r in recipients])
+
+    # Deterministic farthest-point seeding spreads the initial centroids across personas
+    centroids = [vectors[0]]
+    closest = [_similarity(vector, centroids[0]) for vector in vectors]
+    while len(centroids) < num_segments:
+        seed = min(range(len(vectors)), key=lambda i: closest[i])
+        if closest[seed] >= 1.0 - 1e-9:
+            break  # everything left is identical to an existing centroid
+        centroids.append(vectors[seed])
+        closest = [max(closest[i], _similarity(vectors[i], vectors[seed])) for i in range(len(vectors))]
+
+    assignments = [-1] * len(vectors)
+    for _ in range(max(1, iterations)):
+        changed = False
+        for i, vector in enumerate(vectors):
+            best = max(range(len(centroids)), key=lambda c: _similarity(vector, centroids[c]))
+            if best != assignments[i]:
+                assignments[i] = best
+                changed = True
+        if not changed:
+            break
+        for c in range(len(centroids)):
+            members = [vectors[i] for i in range(len(vectors)) if assignments[i] == c]
+            if members:
+                centroids[c] = _centroid(members)
+
+    segments = []
+    for c, centroid in enumerate(centroids):
+        member_indexes = [i for i in range(len(vectors)) if assignments[i] == c]
+        if not member_indexes:
+            continue
+        representative = max(member_indexes, key=lambda i: _similarity(vectors[i], centroid))
+        segments.append({
+            'representative': recipients[representative],
+            'members': [recipients[i] for i in member_indexes],
+        })
+    return segments
+
+def personalize_segment_draft(text: str, representative_values: Dict, member_values: Dict) -> str:
+    """Swap the representative's name and company in a segment draft for a member's"""
+    replacements = []
+    for field in ('name', 'company'):
+        old = str(representative_values.get(field) or '').strip()
+        new = str(member_values.get(field) or '').strip()
+        # Generic fallbacks like "there" would also match ordinary words in the draft
+        if old and new and old != new and old != DEFAULT_FIELD_VALUES.get(field):
+            replacements.append((old, new))
+            # Drafts usually greet by first name only
+            if field == 'name' and ' ' in old:
+                replacements.append((old.split()[0], new.split()[0]))
+
+    if not replacements:
+        return text
+    # One pass so a replacement can never be replaced again
+    mapping = dict(replacements)
+    pattern = '|'.join(re.escape(old) for old in sorted(mapping, key=len, reverse=True))
+    return re.sub(rf'\b(?:{pattern})\b', lambda match: mapping[match.group()], text)
@@ -3,8 +3,11 @@ Reusable UI components for Mail Agent
 """
 import streamlit as st
 from typing import List, Dict, Optional, Tuple
-from utils.validators import extract_emails_from_text, create_inbox_mapping
+from utils.validators import validate_email_text, create_inbox_mapping
 from components.agentmail_utils import list_inboxes
+from components.email_manager import build_merge_values, missing_field_warnings
+from utils.template_engine import compile_template
+from config import SAMPLE_FIRST_SIZE, DEFAULT_SEGMENT_COUNT, DEFAULT_HEDGE_REQUESTS, HEDGE_MAX_FRACTION
 
 def display_email_type_selector() -> None:
     """Display email type selection buttons"""
@@ -39,13 +42,18 @@ def display_recipients_input() -> List[str]:
         key="manual_recipients_input"
     )
     
-    recipients = extract_emails_from_text(email_text)
+    # One pass gives both the recipients and the entries that look like addresses but were rejected
+    recipients, invalid_entries = validate_email_text(email_text)
     
     if email_text:
         if recipients:
             st.success(f"Found {len(recipients)} recipients: " + ", ".join(recipients))
         else:
             st.warning("No valid email addresses found")
+        
+        if invalid_entries:
+            st.warning(f"Found {len(invalid_entries)} invalid entries: " +
+                       ", ".join(f"{entry} ({reason})" for entry, reason in invalid_entries[:10]))
     
     return recipients
 
@@ -97,7 +105,8 @@ def display_regular_email_form() -> Tuple[str, str]:
     body = st.text_area(
         "Email Body",
         placeholder="Write your email message here...",
-        height=200
+        height=200,
+        help="Personalize with {name}, {company}, {title} or any field from your JSON import. Use {field|fallback} to set a default."
     )
     
     # Email Signature Section for Regular Emails
@@ -139,16 +148,29 @@ def display_regular_email_form() -> Tuple[str, str]:
     
     return subject, body_with_signature
 
-def display_regular_email_preview(subject: str, body: str, recipients: List[str]) -> None:
-    """Display email preview for regular emails"""
+def display_regular_email_preview(subject: str, body: str, recipients: List[str],
+                                  json_contacts: Optional[List[Dict]] = None) -> None:
+    """Display email preview for regular emails, rendered for the first recipient"""
     if subject and body and recipients:
+        subject_template = compile_template(subject)
+        body_template = compile_template(body)
+        
+        # Flag merge fields without data before anything is sent
+        if not (subject_template.is_static and body_template.is_static):
+            contact_mapping = {contact['email']: contact for contact in json_contacts or []}
+            merge_values = build_merge_values(recipients, contact_mapping)
+            for warning in missing_field_warnings([subject_template, body_template], merge_values):
+                st.warning(warning)
+            subject = subject_template.render(merge_values[recipients[0]])
+            body = body_template.render(merge_values[recipients[0]])
+        
         with st.expander("Email Preview", expanded=False):
             st.write(f"**Subject:** {subject}")
             st.write(f"**Body:**")
             st.write(body)
             st.write(f"**Will be sent to:** {len(recipients)} recipients")
 
-def display_ai_email_settings() -> Tuple[Optional[str], Optional[str], Optional[str], bool, bool, bool]:
+def display_ai_email_settings() -> Tuple[Optional[str], Optional[str], Optional[str], bool, bool, bool, bool]:
     # """Display AI email settings and return configuration"""
     # st.subheader("AI Email Settings")
     
@@ -219,6 +241,21 @@ def display_ai_email_settings() -> Tuple[Optional[str], Optional[str], Optional[
         human_approval = st.checkbox("Require manual approval for each email", value=True, 
                                    help="Review and approve each email individually before sending")
     
+    # Emails that pass the automatic quality check can skip manual approval
+    auto_approve_passing = False
+    if human_approval:
+        auto_approve_passing = st.checkbox(
+            "Auto-approve emails that pass the quality check", value=False,
+            help="Emails without placeholders, fallback text, format problems or a missing recipient name are approved automatically. Flagged emails still need manual approval."
+        )
+    st.session_state.auto_approve_passing = auto_approve_passing
+    
+    sample_first = st.checkbox(
+        f"Review a sample of {SAMPLE_FIRST_SIZE} drafts before generating the rest",
+        value=True,
+        help="Generates a few drafts across different companies/titles first. Approve or tweak the prompt, then the remaining emails are generated with the approved settings."
+    )
+    
     # Advanced AI Settings
     with st.expander("⚙️ Advanced AI Settings", expanded=False):
         customize_per_recipient = st.checkbox(
@@ -230,8 +267,24 @@ def display_ai_email_settings() -> Tuple[Optional[str], Optional[str], Optional[
             st.warning("This option may create inconsistent messaging across recipients and take longer to generate. Use with caution for professional communications.")
         else:
             st.info("💡 Recommended: Keep this disabled for consistent, professional messaging across all recipients.")
+        
+        # Segment-level generation: one AI draft per persona, adapted to each member
+        segment_count = st.number_input(
+            "Persona segments (0 = generate every email individually)",
+            min_value=0, max_value=100, value=DEFAULT_SEGMENT_COUNT,
+            help="Groups recipients by title, company and other JSON fields and generates one draft per group. "
+                 "Fewer segments means fewer AI calls; more segments means more personalized emails."
+        )
+        st.session_state.segment_count = int(segment_count)
+        
+        st.session_state.hedge_requests = st.checkbox(
+            "Hedge slow AI requests",
+            value=st.session_state.get('hedge_requests', DEFAULT_HEDGE_REQUESTS),
+            help=f"When a generation runs longer than usual, send a duplicate request and keep whichever answers first. "
+                 f"Finishes large campaigns sooner at the cost of at most {HEDGE_MAX_FRACTION:.0%} extra AI calls."
+        )
     
-    return template, prompt, subject, preview_emails, human_approval, customize_per_recipient
+    return template, prompt, subject, preview_emails, human_approval, customize_per_recipient, sample_first
 
 def display_send_button(email_type: str, recipients: List[str], subject: str = "", body: str = "", 
                        human_approval: bool = False, preview_emails: bool = False) -> bool:
@@ -254,4 +307,9 @@ def display_send_button(email_type: str, recipients: List[str], subject: str = "
 def display_reset_button() -> bool:
     """Display reset button and return if clicked"""
     st.markdown("---")
-    return st.button("🔄 Generate New Emails", use_container_width=True)
+    return st.button("🔄 Generate New Emails", use_container_width=True,
+                     help="Only emails whose prompt, sender info, contact data or model changed are regenerated")
+
+def display_regenerate_all_button() -> bool:
+    """Display button that discards every previously generated email, and return if clicked"""
+    return st.button("♻️ Regenerate All From Scratch", use_container_width=True)
@@ -14,7 +14,81 @@ EMAIL_TEMPLATE_HEIGHT = 150
 EMAIL_PROMPT_HEIGHT = 100
 
 # Email Validation
-EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+# Single source of truth for address syntax; utils/validators.py compiles these once.
+# The parts are also matched on their own to explain why an address is invalid.
+EMAIL_LOCAL_PART_PATTERN = r'[A-Za-z0-9._%+-]+'
+EMAIL_DOMAIN_PATTERN = r'[A-Za-z0-9.-]+'
+EMAIL_TLD_PATTERN = r'[A-Za-z]{2,}'
+EMAIL_ADDRESS_PATTERN = rf'{EMAIL_LOCAL_PART_PATTERN}@{EMAIL_DOMAIN_PATTERN}\.{EMAIL_TLD_PATTERN}'
+EMAIL_PATTERN = rf'\b{EMAIL_ADDRESS_PATTERN}\b'
+
+# Suppression List (unsubscribed/bounced addresses, one per line)
+SUPPRESSION_LIST_PATH = "data/suppression_list.txt"
+SUPPRESSION_BLOOM_FP_RATE = 0.001
+
+# Local Mailbox Mirror (SQLite + FTS5, synced with python -m utils.mailbox_store sync)
+MAILBOX_DB_PATH = "data/mailbox.db"
+
+# AI Prompt Context (extra JSON fields sent to the model per recipient)
+PROMPT_CONTEXT_TOKEN_BUDGET = 150
+PROMPT_CONTEXT_MAX_VALUE_CHARS = 300
+
+# AI Generation
+GENERATION_MAX_WORKERS = 8  # concurrent LLM requests per campaign
+GENERATION_MAX_ATTEMPTS = 3  # per recipient, before it is left in the retry queue
+GENERATION_RETRY_BACKOFF_SECONDS = 2
+CHECKPOINT_DIR = "data/checkpoints"  # per-campaign JSONL of finished generations
+CHECKPOINT_MAX_AGE_DAYS = 7
+SAMPLE_FIRST_SIZE = 5  # drafts generated for prompt review before the full run
+DEFAULT_SEGMENT_COUNT = 0  # 0 = one LLM call per recipient; N = one draft per persona segment
+SEGMENT_KMEANS_ITERATIONS = 10
+GENERATION_CALL_TIMEOUT_SECONDS = 60  # per LLM request
+GENERATION_STAGE_DEADLINE_SECONDS = 900  # whole generation run, after which the rest is left for later
+
+# Sending
+SEND_CALL_TIMEOUT_SECONDS = 30  # per AgentMail request
+SEND_STAGE_DEADLINE_SECONDS = 1800
+
+# Model Routing
+# Relative cost per call, the most requests each model may have in flight, and
+# whether the backend can be asked for JSON matching a schema
+MODEL_PROFILES = {
+    'gemini-2.0-flash-lite': {'provider': 'gemini', 'cost': 1.0, 'max_concurrency': 8, 'structured_output': True},
+    'gemini-2.0-flash': {'provider': 'gemini', 'cost': 1.5, 'max_concurrency': 6, 'structured_output': True},
+    'gemini-2.5-flash': {'provider': 'gemini', 'cost': 4.0, 'max_concurrency': 4, 'structured_output': True},
+    'Llama-3.3-8B-Instruct': {'provider': 'llama', 'cost': 0.5, 'max_concurrency': 8},
+    'Llama-3.3-70B-Instruct': {'provider': 'llama', 'cost': 2.0, 'max_concurrency': 8},
+}
+# Request class -> candidate models (cheapest first) and the targets a model must meet
+MODEL_ROUTES = {
+    'consistent': {'models': ['gemini-2.0-flash-lite', 'gemini-2.0-flash'],
+                   'max_latency_seconds': 5, 'max_cost': 1.5, 'min_pass_rate': 0.85},
+    'customized': {'models': ['gemini-2.0-flash-lite', 'gemini-2.0-flash', 'gemini-2.5-flash'],
+                   'max_latency_seconds': 12, 'max_cost': 4.0, 'min_pass_rate': 0.9},
+    'reply': {'models': ['Llama-3.3-70B-Instruct'],
+              'max_latency_seconds': 8, 'max_cost': 2.0, 'min_pass_rate': 0.0},
+}
+MODEL_THROTTLE_COOLDOWN_SECONDS = 60  # how long a rate-limited model is skipped
+MODEL_QUALITY_WINDOW = 50  # quality-gate results a pass rate is averaged over
+MODEL_QUALITY_MIN_SAMPLES = 10  # results needed before a pass rate affects routing
+MODEL_STATS_PATH = "data/model_stats.json"
+MODEL_LATENCY_WINDOW = 200  # recent call latencies kept per model for percentiles
+
+# Request Hedging (duplicate a slow generation and keep whichever finishes first)
+DEFAULT_HEDGE_REQUESTS = False
+HEDGE_LATENCY_PERCENTILE = 90  # hedge once a call runs longer than this percentile
+HEDGE_MIN_SAMPLES = 20  # latencies needed before a percentile is trusted
+HEDGE_MAX_FRACTION = 0.1  # hedges allowed per campaign, as a fraction of its calls
+
+# Quality Gate for AI-generated emails
+QUALITY_MIN_BODY_WORDS = 25
+QUALITY_MAX_BODY_WORDS = 400
+QUALITY_MAX_SUBJECT_CHARS = 120
+QUALITY_MAX_REGENERATIONS = 1  # automatic retries for emails that fail the gate
+
+# Review Clustering (minimum shingle similarity for emails to share a review cluster)
+REVIEW_MIN_SIMILARITY = 0.6
+REVIEW_MAX_DIFFS_PER_CLUSTER = 20
 
 # Default Values
 DEFAULT_EMAIL_TYPE = "regular"
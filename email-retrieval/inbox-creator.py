@@ -1,7 +1,12 @@
 # Create a list of inboxes with custom names
-from agentmail import AgentMail
 from dotenv import load_dotenv
 import os
+import sys
+
+# Add the parent directory to the path to import our utilities
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.agentmail_client import create_agentmail_client
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,7 +18,7 @@ if not api_key:
     print("Please add AGENTMAIL_API_KEY=your_key_here to your .env file")
     exit(1)
 
-client = AgentMail(api_key=api_key)
+client = create_agentmail_client(api_key)
 
 # List of custom inbox names to create (unique variations)
 inbox_names = [
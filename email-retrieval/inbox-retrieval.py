@@ -1,31 +1,38 @@
-from agentmail import AgentMail
 from dotenv import load_dotenv
 import os
 import re
+import sys
+
+# Add the parent directory to the path to import our utilities
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.agentmail_client import create_agentmail_client
+from utils.mailbox_store import MailboxStore
 
 # Load environment variables from .env file
 load_dotenv()
 api_key = os.getenv('AGENTMAIL_API_KEY')
 
-client = AgentMail(api_key=api_key)
+client = create_agentmail_client(api_key)
+store = MailboxStore(os.path.join(os.path.dirname(__file__), '..', 'data', 'mailbox.db'))
 
-all_inboxes = client.inboxes.list()
-# print(f"Total Inboxes: {len(all_inboxes)}")
-print(f"Total Inboxes: {len(all_inboxes.inboxes)}")
-all_inboxes = client.inboxes.list()
+# Mirror every page of the inbox list, then read it locally
+store.sync_inboxes(client)
+all_inboxes = store.list_inboxes()
+print(f"Total Inboxes: {len(all_inboxes)}")
 
 # List all inboxes with their email addresses and display names
-# print(f"Total Inboxes: {len(all_inboxes.inboxes)}\n")
-# for inbox in all_inboxes.inboxes:
-#     print(f"Email: {inbox.inbox_id}, Name: {inbox.display_name}")
+# print(f"Total Inboxes: {len(all_inboxes)}\n")
+# for inbox in all_inboxes:
+#     print(f"Email: {inbox['inbox_id']}, Name: {inbox['display_name']}")
     
 # If you only want the email addresses:
 print("\n--- Just Email Addresses ---")
-for inbox in all_inboxes.inboxes:
-    print(inbox.inbox_id)
+for inbox in all_inboxes:
+    print(inbox['inbox_id'])
     
 # # If you only want the display names:
 # print("\n--- Just Display Names ---")
-# for inbox in all_inboxes.inboxes:
-#     print(inbox.display_name)
+# for inbox in all_inboxes:
+#     print(inbox['display_name'])
     
\ No newline at end of file
@@ -2,11 +2,15 @@
 """
 AI-Powered Job Application Agent
 Monitors givemeajob@agentmail.to for emails from hiring@agentmail.to
-and automatically responds with AI-generated job application emails
+and automatically responds with AI-generated job application emails.
+With JOB_AGENTS_CONFIG set, one process serves every inbox/persona listed
+there instead, sharing the API clients, worker pool and thread sync.
 """
 
+import json
 import os
 import sys
+import threading
 import time
 from datetime import datetime
 
@@ -14,8 +18,17 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from dotenv import load_dotenv
-from agentmail import AgentMail
-from openai import OpenAI
+from utils.agentmail_client import create_agentmail_client
+from components.model_router import get_model_router, is_rate_limit_error
+from utils.response_parser import parse_email_response
+from utils.inbound_events import AdaptivePoller, WebhookReceiver, event_message, payload_to_message, register_webhook
+from utils.mailbox_sync import ThreadSync
+from utils.conversation_history import ConversationHistoryCache
+from utils.reply_ledger import ReplyLedger, CLAIMED, SENT, LABELED
+from utils.inbox_scheduler import FairScheduler
+from utils.async_llm import AsyncLLMClient
+from utils.pipeline_metrics import PipelineMetrics, to_epoch
+from utils.mailbox_store import MailboxStore
 
 # Load environment variables
 load_dotenv()
@@ -24,270 +37,583 @@ load_dotenv()
 INBOX_ID = "givemeajob@agentmail.to"
 HIRING_EMAIL = "hiring@agentmail.to"
 POLL_INTERVAL = 4 # Check for new emails every 5 seconds(sweet spot seems like 8)
+POLL_MAX_INTERVAL = 60  # idle polls back off up to this when polling is the only source
+EVENT_POLL_MAX_INTERVAL = 300  # with webhooks delivering events, polling is only a safety net
+# Threads replied to concurrently, across all inboxes; workers mostly wait on the shared
+# LLM event loop, so this can be well above the model router's per-model concurrency
+MAX_WORKERS = 32
+LLM_CALL_TIMEOUT = 60  # seconds per streamed completion
+# Where the agent's state files live; JOB_DATA_DIR moves them (tests use a scratch directory)
+DATA_DIR = os.getenv("JOB_DATA_DIR", os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+# Cursor of what has been seen and handled, so each poll only fetches new activity
+SYNC_CURSOR_PATH = os.path.join(DATA_DIR, 'job_sync_cursor.json')
+# Per-thread history (recent turns plus a rolling summary) fed to reply prompts
+HISTORY_CACHE_PATH = os.path.join(DATA_DIR, 'job_history_cache.json')
+# Which messages have been claimed, replied to and labeled; shared by every agent process
+REPLY_LEDGER_PATH = os.path.join(DATA_DIR, 'job_reply_ledger.db')
+# One JSON line of stage timestamps per handled message; summarize with
+# python -m utils.pipeline_metrics summary data/job_metrics.jsonl --slo-p95 5
+METRICS_LOG_PATH = os.path.join(DATA_DIR, 'job_metrics.jsonl')
+# Local mirror kept by python -m utils.mailbox_store sync; thread history is read from it when complete
+MAILBOX_DB_PATH = os.path.join(DATA_DIR, 'mailbox.db')
+# JSON list of inbox/persona configs; fields left out fall back to DEFAULT_AGENT
+AGENTS_CONFIG_PATH = os.getenv("JOB_AGENTS_CONFIG")
 
-# Initialize AgentMail client
+# Event-driven mode: AgentMail POSTs message.received events to a local receiver.
+# JOB_WEBHOOK_URL is the public URL forwarding to it (e.g. a tunnel); without it the
+# receiver still accepts local POSTs, which is how tests inject events.
+WEBHOOK_HOST = os.getenv("JOB_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("JOB_WEBHOOK_PORT", "8787"))
+WEBHOOK_PUBLIC_URL = os.getenv("JOB_WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("JOB_WEBHOOK_SECRET")
+
+# The original single-inbox persona; also the defaults for every configured inbox.
+# {name} and {counterpart} in any text field are filled in per agent, and
+# {stage_instruction} in the instructions per reply; other braces are left as written.
+DEFAULT_AGENT = {
+    'inbox_id': INBOX_ID,
+    'name': "Alex",
+    'counterpart': "hiring manager",
+    'allowed_senders': [],  # empty: answer anyone but ourselves
+    'description': "an extremely eager job seeker named {name} responding to a {counterpart}'s email",
+    'system_prompt': "You are an extremely pushy, desperate job seeker named {name} who needs this job badly.",
+    'first_message_goal': "This is your first contact - be aggressive about getting an interview.",
+    'continuation_goal': "You are continuing a job conversation - push hard for the next step.",
+    'instructions': [
+        "Be VERY pushy and aggressive about getting this job",
+        "Show you NEED this job and will do ANYTHING to get it",
+        "Be desperate but professional",
+        "{stage_instruction}",
+        "ALWAYS push for an interview, call, or meeting",
+        "Be persistent and convincing",
+        "Keep it SHORT (1-2 short paragraphs ONLY)",
+        "End with urgent action request",
+        "Show you're available IMMEDIATELY",
+        "Make them feel like they'd be crazy not to hire you",
+    ],
+    'first_message_instruction': "Highlight your best skills quickly",
+    'continuation_instruction': "Build on previous discussion, push for next steps",
+    'max_words': 100,
+    'style': "Be direct and pushy.",
+    'fallback_first': """Hi! I'm {name} and I NEED this job. I have exactly what you're looking for and I'm ready to start TODAY.
+
+Can we talk this week? I'm available anytime - literally anytime. This is my dream opportunity and I won't let you down!""",
+    'fallback_continuation': """I'm ready to move forward RIGHT NOW. Whatever you need, I can do it.
+
+When can we schedule an interview? I'm available 24/7 and ready to prove I'm your best choice!""",
+    # LLM settings
+    'route': 'reply',
+    'temperature': 0.9,
+    'max_tokens': 150,
+    # Scheduling: replies started per minute and at once for this inbox
+    'replies_per_minute': 30,
+    'max_concurrency': 4,
+    # Initial outreach (main() offers to send it)
+    'initial_recipient': HIRING_EMAIL,
+    'initial_subject': "Enthusiastic Application - Ready to Contribute!",
+    'initial_system_prompt': "You are writing a compelling initial job application email.",
+    'initial_prompt': """
+    Write an initial job application email from an enthusiastic job seeker named {name}.
+    
+    INSTRUCTIONS:
+    - This is the first contact, so introduce yourself briefly
+    - Express genuine interest in working for their company
+    - Highlight key skills and experience
+    - Be professional but enthusiastic
+    - Ask about available opportunities
+    - Keep it concise (2-3 paragraphs)
+    - End with a strong call to action
+    - Format properly with line breaks
+    
+    Generate both a subject line and email body.
+    Format as:
+    SUBJECT: [subject line]
+    BODY: [email body starting with greeting and blank line]
+    """,
+    'initial_model': "Llama-3.3-70B-Instruct",
+    'reply_labels': ["ai-generated", "job-application"],
+    'initial_labels': ["initial-application", "ai-generated"],
+}
+
+# Fields that are filled in, not templated themselves
+PERSONA_IDENTITY_FIELDS = ('name', 'counterpart')
+
+def fill_persona(text, agent):
+    # replace rather than format: config text may contain other braces
+    return text.replace('{name}', agent['name']).replace('{counterpart}', agent['counterpart'])
+
+def build_agent(config):
+    """DEFAULT_AGENT overlaid with config, with the persona's name filled into every text field"""
+    agent = {**DEFAULT_AGENT, **config}
+    for field, value in agent.items():
+        if field in PERSONA_IDENTITY_FIELDS:
+            continue
+        if isinstance(value, str):
+            agent[field] = fill_persona(value, agent)
+        elif isinstance(value, list):
+            agent[field] = [fill_persona(item, agent) if isinstance(item, str) else item for item in value]
+    return agent
+
+def load_agents(path=AGENTS_CONFIG_PATH):
+    """Inbox/persona configs by inbox ID: the JSON list at path, or just DEFAULT_AGENT"""
+    if not path:
+        return {INBOX_ID: build_agent({})}
+    with open(path, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    agents = {}
+    for config in configs:
+        if not config.get('inbox_id'):
+            raise ValueError(f"Agent config without inbox_id in {path}")
+        agents[config['inbox_id']] = build_agent(config)
+    return agents
+
+agents = load_agents()
+
+# Initialize AgentMail client (shared by every inbox)
 agentmail_api_key = os.getenv("AGENTMAIL_API_KEY")
-if not agentmail_api_key:
+if not agentmail_api_key and not os.getenv("AGENTMAIL_BASE_URL"):
     raise Exception("AGENTMAIL_API_KEY not found in environment variables")
 
-client = AgentMail(api_key=agentmail_api_key)
+client = create_agentmail_client(agentmail_api_key)
+# Single-inbox runs keep their own cursor; multi-inbox runs sync the whole organization in one listing
+thread_sync = ThreadSync(client, INBOX_ID if not AGENTS_CONFIG_PATH else None, SYNC_CURSOR_PATH, labels=["unread"])
+history_cache = ConversationHistoryCache(HISTORY_CACHE_PATH)
+reply_ledger = ReplyLedger(REPLY_LEDGER_PATH)
+metrics = PipelineMetrics(METRICS_LOG_PATH)
+mailbox_store = MailboxStore(MAILBOX_DB_PATH)
 
-# Initialize Llama API client
+scheduler = FairScheduler(MAX_WORKERS)
+for agent_inbox_id, agent_config in agents.items():
+    scheduler.configure(agent_inbox_id, agent_config['max_concurrency'], agent_config['replies_per_minute'])
+
+# Initialize Llama API client: streaming, on one event loop and connection pool shared by all workers
 llama_api_key = os.getenv("LLAMA_API_KEY")
 if not llama_api_key:
     raise Exception("LLAMA_API_KEY not found in environment variables")
 
-llama_client = OpenAI(
+llama_client = AsyncLLMClient(
     api_key=llama_api_key,
     base_url="https://api.llama.com/compat/v1/"
 )
 
-def generate_job_application_response(previous_message, conversation_history=""):
-    """Generate an AI-powered job application response using Llama API"""
-    
+def generate_job_application_response(previous_message, conversation_history="", agent=DEFAULT_AGENT):
+    """Generate an AI-powered reply in the agent's persona using Llama API"""
+
     # Determine if this is the first message or a continuation
     is_first_message = not conversation_history.strip()
-    
+    stage_instruction = agent['first_message_instruction'] if is_first_message else agent['continuation_instruction']
+    instructions = "\n    ".join(f"- {line.replace('{stage_instruction}', stage_instruction)}" for line in agent['instructions'])
+
     prompt = f"""
-    You are an extremely eager job seeker named Alex responding to a hiring manager's email.
-    
+    You are {agent['description']}.
+
     {"This is your FIRST response to their initial outreach." if is_first_message else "This is a CONTINUATION of an ongoing conversation thread."}
-    
-    Latest message from hiring manager:
+
+    Latest message from {agent['counterpart']}:
     {previous_message}
-    
+
     {"" if is_first_message else f'''
     Full conversation history (chronological order):
     {conversation_history}
     '''}
-    
+
     INSTRUCTIONS:
-    - Be VERY pushy and aggressive about getting this job
-    - Show you NEED this job and will do ANYTHING to get it
-    - Be desperate but professional
-    - {"Highlight your best skills quickly" if is_first_message else "Build on previous discussion, push for next steps"}
-    - ALWAYS push for an interview, call, or meeting
-    - Be persistent and convincing
-    - Keep it SHORT (1-2 short paragraphs ONLY)
-    - End with urgent action request
-    - Show you're available IMMEDIATELY
-    - Make them feel like they'd be crazy not to hire you
-    
+    {instructions}
+
     Generate ONLY the email body text (no subject line needed for replies).
-    Keep it under 100 words. Be direct and pushy.
+    Keep it under {agent['max_words']} words. {agent['style']}
     """
-    
+
+    router = get_model_router()
+    model_name = router.choose(agent['route'])
+
     try:
-        completion = llama_client.chat.completions.create(
-            model="Llama-3.3-70B-Instruct",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": f"You are an extremely pushy, desperate job seeker named Alex who needs this job badly. {'This is your first contact - be aggressive about getting an interview.' if is_first_message else 'You are continuing a job conversation - push hard for the next step.'} Keep responses under 100 words and very direct."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=150,
-            temperature=0.9
-        )
-        
-        return completion.choices[0].message.content.strip()
-    
+        with router.slot(model_name):
+            completion = llama_client.complete(
+                model=model_name,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"{agent['system_prompt']} {agent['first_message_goal'] if is_first_message else agent['continuation_goal']} Keep responses under {agent['max_words']} words and very direct."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens=agent['max_tokens'],
+                temperature=agent['temperature'],
+                timeout=LLM_CALL_TIMEOUT
+            )
+        router.record_call(model_name, completion['seconds'])
+
+        return completion['content'].strip()
+
     except Exception as e:
         print(f"Llama API error: {e}")
+        if is_rate_limit_error(e):
+            # Later replies step down to a cheaper model until the cooldown ends
+            router.record_call(model_name, 0.0, throttled=True)
         # Fallback response based on conversation state
         if is_first_message:
-            return """Hi! I'm Alex and I NEED this job. I have exactly what you're looking for and I'm ready to start TODAY. 
-
-Can we talk this week? I'm available anytime - literally anytime. This is my dream opportunity and I won't let you down!"""
+            return agent['fallback_first']
         else:
-            return """I'm ready to move forward RIGHT NOW. Whatever you need, I can do it. 
+            return agent['fallback_continuation']
+
+# One lock per conversation thread so it never gets two replies at once
+thread_locks = {}
+thread_locks_guard = threading.Lock()
+
+def get_thread_lock(thread_id):
+    with thread_locks_guard:
+        if thread_id not in thread_locks:
+            thread_locks[thread_id] = threading.Lock()
+        return thread_locks[thread_id]
 
-When can we schedule an interview? I'm available 24/7 and ready to prove I'm your best choice!"""
+def get_thread_id(thread):
+    return getattr(thread, 'thread_id', getattr(thread, 'id', None))
+
+def get_inbox_id(item):
+    """Inbox of a thread or message, or INBOX_ID in single-inbox mode where threads may not say"""
+    return getattr(item, 'inbox_id', None) or (INBOX_ID if not AGENTS_CONFIG_PATH else None)
+
+def thread_age_key(thread):
+    """Sort key putting the longest-waiting threads first (threads without a timestamp last)"""
+    timestamp = getattr(thread, 'timestamp', None) or getattr(thread, 'updated_at', None) \
+        or getattr(thread, 'created_at', None)
+    return (timestamp is None, str(timestamp) if timestamp is not None else "")
 
 def get_unreplied_threads():
-    """Get unread threads specifically from the givemeajob@agentmail.to inbox"""
+    """Get unread threads of the served inboxes with activity since the last sync, oldest first"""
     try:
-        # Get unread threads (they're already from our inbox context)
-        threads_response = client.threads.list(labels=["unread"])
-        
-        # Access the threads from the response object
-        threads = getattr(threads_response, 'threads', threads_response)
-        if hasattr(threads_response, 'data'):
-            threads = threads_response.data
-        
-        print(f"Debug: Found {len(threads)} unread threads in {INBOX_ID}")
-        
-        if not threads:
-            print(f"No unread threads in {INBOX_ID}")
-            return []
-        
-        # Let's work on the first unread thread
-        thread_to_reply_to = threads[0]
-        thread_id = getattr(thread_to_reply_to, 'thread_id', getattr(thread_to_reply_to, 'id', 'unknown'))
-        print(f"Found unread thread: {thread_id}")
-        
-        # Get the full thread object to access its messages
-        thread_details = client.threads.get(thread_id)
-        
-        if not thread_details.messages:
-            print("Thread has no messages")
-            return []
-        
-        # The last message in the list is the one we want to reply to
-        last_message = thread_details.messages[-1]
-        
-        print(f"Found latest message in thread to reply to")
-        return [last_message]  # Return as list to maintain compatibility
-    
+        # Only threads whose latest message changed since the cursor, across every page
+        threads = thread_sync.changed_threads()
+        print(f"Debug: Found {len(threads)} changed unread threads across {len(agents)} inboxes")
+        served = []
+        for thread in threads:
+            if get_inbox_id(thread) in agents:
+                served.append(thread)
+            else:
+                # Not ours to answer; don't list it again until it changes
+                thread_sync.mark_handled(get_thread_id(thread), getattr(thread, 'last_message_id', None))
+        return sorted(served, key=thread_age_key)
+
     except Exception as e:
-        print(f"Error getting unread threads from {INBOX_ID}: {e}")
+        print(f"Error getting unread threads: {e}")
         return []
 
-def build_conversation_history(thread_details):
-    """Build a conversation history string from thread messages"""
-    history = []
-    
-    # Get all messages except the last one (which is what we're replying to)
-    messages = thread_details.messages[:-1] if len(thread_details.messages) > 1 else []
-    
-    for msg in messages:
-        sender = getattr(msg, 'sender', 'Unknown')
-        text = getattr(msg, 'text', '')
-        
-        # Determine if it's from us or them
-        if sender == HIRING_EMAIL:
-            history.append(f"HIRING MANAGER: {text}")
-        else:
-            history.append(f"ME (Alex): {text}")
-    
-    return "\n\n".join(history)
+def get_message_id(message):
+    return getattr(message, 'message_id', getattr(message, 'id', None))
+
+def needs_reply(message, agent):
+    """Whether a message still needs an answer from the agent"""
+    # The polling fallback can see a message an event already handled
+    if 'replied' in (getattr(message, 'labels', None) or []):
+        return False
+    # Our own reply is the latest message until the other side answers
+    sender = str(getattr(message, 'from_', getattr(message, 'sender', '')) or '')
+    if agent['inbox_id'] in sender:
+        return False
+    if agent['allowed_senders'] and not any(allowed in sender for allowed in agent['allowed_senders']):
+        return False
+    return bool(getattr(message, 'text', '') or getattr(message, 'html', ''))
 
-def send_reply(message_id, reply_text):
+def handle_thread(agent, thread_id, message=None, thread=None, trace=None):
+    """Reply to a thread's latest message unless another worker is already replying in that thread"""
+    lock = get_thread_lock(thread_id)
+    if not lock.acquire(blocking=False):
+        print(f"Thread {thread_id} is already being handled, skipping")
+        metrics.finish(trace, 'busy')
+        return False
+    try:
+        metrics.mark(trace, 'started')
+        message = message or thread_sync.latest_message(thread)
+        metrics.mark(trace, 'fetched', message_id=get_message_id(message) if message else None)
+        if trace is not None and message is not None:
+            # The message's own timestamp is when AgentMail received it
+            received = to_epoch(getattr(message, 'timestamp', None) or getattr(message, 'created_at', None))
+            if received is not None:
+                trace['stages']['received'] = received
+        if message is None or not needs_reply(message, agent):
+            thread_sync.mark_handled(thread_id, get_message_id(message) if message else None)
+            metrics.finish(trace, 'skipped')
+            return False
+        replied = reply_to_message(message, agent, trace, thread)
+        # A failed reply stays pending, so the next sync lists the thread again
+        if replied:
+            thread_sync.mark_handled(thread_id, get_message_id(message))
+        return replied
+    except Exception as e:
+        print(f"Error handling thread {thread_id}: {e}")
+        metrics.finish(trace, 'error')
+        return False
+    finally:
+        lock.release()
+
+def handle_threads(work):
+    """
+    Run handle_thread for (agent, thread_id, message, thread, trace) items on the shared pool
+    Inboxes take turns and each keeps to its own concurrency and rate limits;
+    work over an inbox's rate limit stays pending for the next tick.
+    Returns replies sent.
+    """
+    if not work:
+        return 0
+    queues = {}
+    for item in work:
+        queues.setdefault(item[0]['inbox_id'], []).append(item)
+    results, deferred = scheduler.run(queues, lambda item: handle_thread(*item))
+    for inbox_id, count in deferred.items():
+        print(f"{inbox_id}: {count} threads over its rate limit, deferred to the next poll")
+    return sum(results)
+
+def message_role(message, agent):
+    """Speaker label for a message in the conversation history"""
+    return sender_role(getattr(message, 'from_', None) or getattr(message, 'sender', ''), agent)
+
+def sender_role(sender, agent):
+    return f"ME ({agent['name']})" if agent['inbox_id'] in str(sender or '') else agent['counterpart'].upper()
+
+def thread_messages_before(thread_id, message, agent):
+    """
+    (message_id, role, text) for the thread's messages before message, oldest first
+    From the local mailbox mirror when it has the whole thread, otherwise from the API.
+    """
+    current_id = get_message_id(message)
+    mirrored = mailbox_store.history_before(thread_id, current_id)
+    if mirrored is not None:
+        return [(row['message_id'], sender_role(row['sender'], agent), row['body'] or '') for row in mirrored]
+    thread_details = client.threads.get(thread_id)
+    messages = []
+    for msg in thread_details.messages or []:
+        if get_message_id(msg) == current_id:
+            break
+        messages.append((get_message_id(msg), message_role(msg, agent),
+                         getattr(msg, 'text', '') or getattr(msg, 'html', '') or ''))
+    return messages
+
+def build_conversation_history(thread_id, message, agent, thread=None):
+    """
+    History of the thread before message, from the cache
+    The cache only records exchanges the agent answered, so whenever it can't
+    be shown to hold every earlier message (the thread listing's message count
+    says so) it is reconciled against the thread's messages by message ID.
+    """
+    if not thread_id:
+        return ""
+    message_count = getattr(thread, 'message_count', None)
+    # The listed count includes the message being answered
+    if not message_count or history_cache.message_count(thread_id) < message_count - 1:
+        try:
+            history_cache.reconcile(thread_id, thread_messages_before(thread_id, message, agent))
+        except Exception as e:
+            print(f"Could not load history for thread {thread_id}: {e}")
+    return history_cache.render(thread_id)
+
+# send_reply's result when the API reports a reply for this message already went out
+ALREADY_SENT = "already-sent"
+
+def reply_idempotency_key(message_id):
+    """One key per inbound message, so a retried send can never produce a second reply"""
+    return f"reply-{message_id}"
+
+def send_reply(agent, message_id, reply_text):
     """Send a reply to a specific message"""
     try:
         # Convert plain text to simple HTML
         html_content = reply_text.replace('\n\n', '</p><p>').replace('\n', '<br>')
         html_content = f"<p>{html_content}</p>"
-        
+
         # Send the reply with both text and HTML
-        response = client.inboxes.messages.reply(
-            inbox_id=INBOX_ID,
+        return client.inboxes.messages.reply(
+            inbox_id=agent['inbox_id'],
             message_id=message_id,
             text=reply_text,
             html=html_content,
-            labels=["ai-generated", "job-application"]
+            labels=agent['reply_labels'],
+            idempotency_key=reply_idempotency_key(message_id)
         )
-        
-        # Mark the original message as replied
+
+    except Exception as e:
+        # A retry after a crash regenerates the text, so the key matches an
+        # earlier send with a different body: that reply is already out
+        if getattr(e, 'status_code', None) == 409:
+            print(f"A reply to {message_id} was already sent")
+            return ALREADY_SENT
+        print(f"Error sending reply: {e}")
+        return None
+
+def label_replied(agent, message_id):
+    """Mark the original message as replied; returns whether the update went through"""
+    try:
         client.inboxes.messages.update(
-            inbox_id=INBOX_ID,
+            inbox_id=agent['inbox_id'],
             message_id=message_id,
             add_labels=["replied"],
             remove_labels=["unreplied"]
         )
-        
-        return response
-    
+        reply_ledger.mark_labeled(message_id)
+        mailbox_store.update_labels(message_id, add=["replied"], remove=["unreplied"])
+        return True
     except Exception as e:
-        print(f"Error sending reply: {e}")
-        return None
+        print(f"Error labeling message {message_id}: {e}")
+        return False
 
 def process_conversations():
-    """Main function to process unread threads from givemeajob@agentmail.to"""
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Checking for unread threads in {INBOX_ID}...")
-    
-    unreplied_messages = get_unreplied_threads()
-    
-    if not unreplied_messages:
-        print(f"No unread threads found in {INBOX_ID}.")
-        return
-    
-    print(f"Replying to unread thread from {INBOX_ID}")
-    
-    message = unreplied_messages[0]  # Just get the first (and only) message
-    
+    """Process unread threads of every served inbox; returns whether it replied"""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Checking for unread threads in {len(agents)} inboxes...")
+
+    threads = get_unreplied_threads()
+
+    if not threads:
+        print("No unread threads found.")
+        thread_sync.save()
+        return False
+
+    print(f"Replying to {len(threads)} unread threads with up to {MAX_WORKERS} workers")
+
+    # Oldest threads are queued first, so each inbox answers its oldest first
+    detected = time.time()
+    replied = handle_threads([
+        (agents[get_inbox_id(thread)], get_thread_id(thread), None, thread,
+         metrics.start(getattr(thread, 'last_message_id', None), get_inbox_id(thread), 'poll',
+                       getattr(thread, 'timestamp', None), detected))
+        for thread in threads if get_thread_id(thread)
+    ])
+    thread_sync.save()
+    history_cache.save()
+    print(f"Replied to {replied}/{len(threads)} threads")
+    print(metrics.status_line())
+    return replied > 0
+
+def process_events(events):
+    """Reply straight from webhook payloads, without listing or fetching threads; returns replies sent"""
+    work = []
+    for event in events:
+        payload = event_message(event)
+        if not payload:
+            continue
+        agent = agents.get(payload.get('inbox_id') or INBOX_ID)
+        if agent is None:
+            continue
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Event: new message in {agent['inbox_id']}")
+        trace = metrics.start(payload.get('message_id'), agent['inbox_id'], 'event',
+                              payload.get('timestamp'), event.get('_delivered_at'))
+        work.append((agent, payload.get('thread_id') or payload.get('message_id'), payload_to_message(payload), None, trace))
+    replied = handle_threads(work)
+    thread_sync.save()
+    history_cache.save()
+    return replied
+
+def reply_to_message(message, agent=DEFAULT_AGENT, trace=None, thread=None):
+    """Generate and send a reply to one inbound message (SDK object or event payload)"""
     # Access message attributes directly
     sender = getattr(message, 'from_', getattr(message, 'sender', 'Unknown'))
     subject = getattr(message, 'subject', 'No Subject')
     text = getattr(message, 'text', '')
     html = getattr(message, 'html', '')
     msg_id = getattr(message, 'message_id', getattr(message, 'id', None))
-    
+    thread_id = getattr(message, 'thread_id', None)
+
     # Use HTML content if text is empty
     content = text if text else html
     if not content:
         print("Message has no text or HTML content")
-        return
-    
-    print(f"\nProcessing message from {sender}")
+        metrics.finish(trace, 'skipped')
+        return False
+
+    print(f"\nProcessing message to {agent['inbox_id']} from {sender}")
     print(f"Subject: {subject}")
     print(f"Content type: {'Text' if text else 'HTML'}")
     print(f"Preview: {content[:100]}...")
-    
-    # Generate AI response
-    print("Generating AI response...")
-    ai_response = generate_job_application_response(content, "")
-    
-    # Send the reply
-    print("Sending reply...")
-    reply_result = send_reply(msg_id, ai_response)
-    
-    if reply_result:
-        print(f"✅ Successfully replied to message {msg_id}")
-        print(f"Reply preview: {ai_response[:100]}...")
-    else:
+
+    # Claim the message before spending an LLM call on it; another worker,
+    # process or an earlier run may already have answered it
+    state = reply_ledger.claim(msg_id, thread_id)
+    if state == SENT:
+        print(f"Message {msg_id} was already answered; finishing its labels")
+        metrics.finish(trace, 'duplicate')
+        return label_replied(agent, msg_id)
+    if state == LABELED:
+        print(f"Message {msg_id} was already answered, skipping")
+        metrics.finish(trace, 'duplicate')
+        return True
+    if state != CLAIMED:
+        print(f"Message {msg_id} is being answered by another worker, skipping")
+        metrics.finish(trace, 'busy')
+        return False
+
+    try:
+        # Generate AI response
+        print("Generating AI response...")
+        conversation_history = build_conversation_history(thread_id, message, agent, thread)
+        ai_response = generate_job_application_response(content, conversation_history, agent)
+        metrics.mark(trace, 'generated')
+
+        # Send the reply
+        print("Sending reply...")
+        reply_result = send_reply(agent, msg_id, ai_response)
+        metrics.mark(trace, 'sent')
+    except Exception as e:
+        reply_ledger.mark_failed(msg_id, str(e))
+        raise
+
+    if not reply_result:
+        # Releases the claim so the next poll retries
+        reply_ledger.mark_failed(msg_id, "send failed")
+        metrics.finish(trace, 'failed')
         print(f"❌ Failed to reply to message {msg_id}")
+        return False
 
-def send_initial_job_application():
-    """Send the initial job application email to hiring@agentmail.to"""
-    
-    initial_prompt = """
-    Write an initial job application email from an enthusiastic job seeker named Alex.
-    
-    INSTRUCTIONS:
-    - This is the first contact, so introduce yourself briefly
-    - Express genuine interest in working for their company
-    - Highlight key skills and experience
-    - Be professional but enthusiastic
-    - Ask about available opportunities
-    - Keep it concise (2-3 paragraphs)
-    - End with a strong call to action
-    - Format properly with line breaks
-    
-    Generate both a subject line and email body.
-    Format as:
-    SUBJECT: [subject line]
-    BODY: [email body starting with greeting and blank line]
-    """
+    if reply_result == ALREADY_SENT:
+        # The earlier reply's text comes into the history from the thread on the next reconcile
+        reply_ledger.mark_sent(msg_id, None)
+        label_replied(agent, msg_id)
+        metrics.finish(trace, 'duplicate')
+        return True
+
+    # Recorded straight after the send: from here on a retry only relabels
+    reply_ledger.mark_sent(msg_id, get_message_id(reply_result))
+    if label_replied(agent, msg_id):
+        metrics.mark(trace, 'labeled')
+    metrics.finish(trace, 'replied')
+    # Only a sent exchange joins the history, so a failed reply is retried without duplicating it
+    if thread_id:
+        history_cache.append(thread_id, msg_id, message_role(message, agent), content)
+        history_cache.append(thread_id, get_message_id(reply_result), f"ME ({agent['name']})", ai_response)
+    print(f"✅ Successfully replied to message {msg_id}")
+    print(f"Reply preview: {ai_response[:100]}...")
+    return True
+
+def send_initial_job_application(agent=DEFAULT_AGENT):
+    """Send the agent's initial outreach email (by default, the job application to hiring@agentmail.to)"""
     
     try:
-        completion = llama_client.chat.completions.create(
-            model="Llama-3.3-70B-Instruct",
+        completion = llama_client.complete(
+            model=agent['initial_model'],
             messages=[
                 {
                     "role": "system",
-                    "content": "You are writing a compelling initial job application email."
+                    "content": agent['initial_system_prompt']
                 },
                 {
                     "role": "user", 
-                    "content": initial_prompt
+                    "content": agent['initial_prompt']
                 }
             ],
             max_tokens=600,
-            temperature=0.7
+            temperature=0.7,
+            timeout=LLM_CALL_TIMEOUT
         )
         
-        response = completion.choices[0].message.content
+        response = completion['content']
         
-        if "SUBJECT:" in response and "BODY:" in response:
-            subject = response.split("SUBJECT:")[1].split("BODY:")[0].strip()
-            body = response.split("BODY:")[1].strip()
+        parsed = parse_email_response(response)
+        if parsed:
+            subject = parsed['subject'] or agent['initial_subject']
+            body = parsed['body']
         else:
-            subject = "Enthusiastic Application - Ready to Contribute!"
+            subject = agent['initial_subject']
             body = response
         
         # Convert to HTML
@@ -296,15 +622,15 @@ def send_initial_job_application():
         
         # Send initial application
         result = client.inboxes.messages.send(
-            inbox_id=INBOX_ID,
-            to=[HIRING_EMAIL],
+            inbox_id=agent['inbox_id'],
+            to=[agent['initial_recipient']],
             subject=subject,
             text=body,
             html=html_body,
-            labels=["initial-application", "ai-generated"]
+            labels=agent['initial_labels']
         )
         
-        print(f"✅ Sent initial job application!")
+        print(f"✅ Sent initial email from {agent['inbox_id']}!")
         print(f"Subject: {subject}")
         print(f"Preview: {body[:150]}...")
         
@@ -314,12 +640,32 @@ def send_initial_job_application():
         print(f"Error sending initial application: {e}")
         return None
 
+def start_event_receiver():
+    """Start the local webhook receiver and register it; returns (receiver or None, webhooks registered)"""
+    try:
+        receiver = WebhookReceiver(WEBHOOK_HOST, WEBHOOK_PORT, secret=WEBHOOK_SECRET).start()
+    except OSError as e:
+        print(f"Could not start webhook receiver ({e}); polling only")
+        return None, False
+    print(f"Webhook receiver listening on {receiver.url}")
+    
+    registered = False
+    if WEBHOOK_PUBLIC_URL:
+        url = f"{WEBHOOK_PUBLIC_URL}?token={WEBHOOK_SECRET}" if WEBHOOK_SECRET else WEBHOOK_PUBLIC_URL
+        registered = register_webhook(client, url, list(agents)) is not None
+    return receiver, registered
+
 def main():
     """Main application loop"""
     print("🤖 AI Job Application Agent Starting...")
-    print(f"Monitoring: {INBOX_ID}")
-    print(f"Responding to: {HIRING_EMAIL}")
-    print(f"Poll interval: {POLL_INTERVAL} seconds")
+    for agent in agents.values():
+        senders = ", ".join(agent['allowed_senders']) or "anyone"
+        print(f"Monitoring: {agent['inbox_id']} as {agent['name']} (replying to {senders})")
+    
+    receiver, webhooks_registered = start_event_receiver()
+    max_interval = EVENT_POLL_MAX_INTERVAL if webhooks_registered else POLL_MAX_INTERVAL
+    poller = AdaptivePoller(POLL_INTERVAL, max_interval)
+    print(f"Poll interval: {POLL_INTERVAL}-{max_interval} seconds (backs off while idle)")
     print("-" * 50)
     
     # Ask if user wants to send initial application
@@ -327,7 +673,9 @@ def main():
     
     if send_initial:
         print("\nSending initial job application...")
-        send_initial_job_application()
+        for agent in agents.values():
+            if agent.get('initial_recipient'):
+                send_initial_job_application(agent)
         print("\nWaiting 10 seconds before starting monitoring loop...")
         time.sleep(10)
     
@@ -336,14 +684,27 @@ def main():
     
     try:
         while True:
-            process_conversations()
-            print(f"Sleeping for {POLL_INTERVAL} seconds...")
-            time.sleep(POLL_INTERVAL)
+            interval = poller.record(process_conversations())
+            print(f"Next poll in {interval:.0f} seconds...")
+            if not receiver:
+                time.sleep(interval)
+                continue
+            # Until the next poll is due, reply to events as soon as they arrive
+            next_poll = time.time() + interval
+            while time.time() < next_poll:
+                events = receiver.wait(max(0.0, next_poll - time.time()))
+                if events:
+                    process_events(events)
             
     except KeyboardInterrupt:
         print("\n🛑 Job application agent stopped by user")
     except Exception as e:
         print(f"\n❌ Error in main loop: {e}")
+    finally:
+        if receiver:
+            receiver.stop()
+        scheduler.shutdown()
+        llama_client.close()
 
 if __name__ == "__main__":
     main()
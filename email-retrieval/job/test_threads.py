@@ -10,7 +10,8 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from dotenv import load_dotenv
-from agentmail import AgentMail
+from utils.agentmail_client import create_agentmail_client
+from utils.mailbox_store import MailboxStore
 
 # Load environment variables
 load_dotenv()
@@ -21,10 +22,11 @@ HIRING_EMAIL = "hiring@agentmail.to"
 
 # Initialize AgentMail client
 agentmail_api_key = os.getenv("AGENTMAIL_API_KEY")
-if not agentmail_api_key:
+if not agentmail_api_key and not os.getenv("AGENTMAIL_BASE_URL"):
     raise Exception("AGENTMAIL_API_KEY not found in environment variables")
 
-client = AgentMail(api_key=agentmail_api_key)
+client = create_agentmail_client(agentmail_api_key)
+store = MailboxStore(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'mailbox.db'))
 
 def test_unreplied_threads():
     """Test function to check unread threads specifically from givemeajob@agentmail.to"""
@@ -33,13 +35,10 @@ def test_unreplied_threads():
     print("-" * 50)
     
     try:
-        # Get unread threads (they're already from our inbox context)
-        threads = client.threads.list(labels=["unread"])
-        
-        print(f"Raw response type: {type(threads)}")
-        
-        # Access the threads from the response object
-        actual_threads = threads.threads
+        # Incrementally mirror the inbox (every page), then query the local copy
+        stats = store.sync_inbox(client, INBOX_ID)
+        print(f"Synced: {stats}")
+        actual_threads = store.list_threads(INBOX_ID, label="unread")
         print(f"Found {len(actual_threads)} unread threads in {INBOX_ID}")
         
         if not actual_threads:
@@ -49,32 +48,26 @@ def test_unreplied_threads():
             
             # Let's work on the first unread thread
             thread_to_reply_to = actual_threads[0]
-            print(f"First unread thread ID: {getattr(thread_to_reply_to, 'thread_id', 'N/A')}")
-            print(f"Thread labels: {getattr(thread_to_reply_to, 'labels', 'N/A')}")
+            print(f"First unread thread ID: {thread_to_reply_to['thread_id']}")
+            print(f"Thread labels: {thread_to_reply_to['labels']}")
             
-            # Get thread details
-            thread_details = client.threads.get(actual_threads[0].thread_id)
-            print(f"Thread details retrieved: {thread_details}")
-            print(f"Thread has {len(thread_details.messages) if thread_details.messages else 0} messages")
+            # Get thread messages
+            messages = store.thread_messages(thread_to_reply_to['thread_id'])
+            print(f"Thread has {len(messages)} messages")
             
-            if thread_details.messages:
+            if messages:
                 print("Messages in thread:")
-                for i, msg in enumerate(thread_details.messages):
-                    print(f"  Message {i}: {type(msg)} - {msg}")
-                    if hasattr(msg, 'id'):
-                        print(f"    ID: {msg.id}")
-                    if hasattr(msg, 'sender'):
-                        print(f"    Sender: {msg.sender}")
-                    if hasattr(msg, 'subject'):
-                        print(f"    Subject: {msg.subject}")
+                for i, msg in enumerate(messages):
+                    print(f"  Message {i}: {msg['message_id']}")
+                    print(f"    Sender: {msg['sender']}")
+                    print(f"    Subject: {msg['subject']}")
                         
-                last_message = thread_details.messages[-1]
-                print(f"Last message: {last_message}")
-                print(f"Last message ID: {getattr(last_message, 'id', 'N/A')}")
-                print(f"Last message sender: {getattr(last_message, 'sender', 'N/A')}")
-                print(f"Last message subject: {getattr(last_message, 'subject', 'N/A')}")
+                last_message = messages[-1]
+                print(f"Last message ID: {last_message['message_id']}")
+                print(f"Last message sender: {last_message['sender']}")
+                print(f"Last message subject: {last_message['subject']}")
                 
-                text = getattr(last_message, 'text', '')
+                text = last_message['body']
                 if text:
                     print(f"Last message preview: {text[:100]}...")
                 else:
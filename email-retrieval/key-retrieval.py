@@ -1,13 +1,18 @@
-from agentmail import AgentMail
 from dotenv import load_dotenv
 import os
 import re
+import sys
+
+# Add the parent directory to the path to import our utilities
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.agentmail_client import create_agentmail_client
 
 # Load environment variables from .env file
 load_dotenv()
 api_key = os.getenv('AGENTMAIL_API_KEY')
 
-client = AgentMail(api_key=api_key)
+client = create_agentmail_client(api_key)
 
 # Retrieve all messages
 all_messages = client.inboxes.messages.list(inbox_id='hello@agentmail.to')
@@ -4,15 +4,19 @@ A Streamlit app for sending personalized emails with AI assistance
 """
 import streamlit as st
 from config import *
-from utils.session_manager import init_session_state, reset_email_data, is_email_data_generated, set_email_data, get_email_data
+from utils.session_manager import (
+    init_session_state, reset_email_data, is_email_data_generated, set_email_data, get_email_data,
+    get_previous_email_data, start_sample_stage, get_sample_stage
+)
 from components.ui_components import (
     display_email_type_selector, display_email_type_info, display_recipients_input,
     display_inbox_settings, display_regular_email_form, display_regular_email_preview,
-    display_ai_email_settings, display_send_button, display_reset_button
+    display_ai_email_settings, display_send_button, display_reset_button, display_regenerate_all_button
 )
-from components.email_manager import EmailManager, create_email_config
+from components.email_manager import EmailManager, create_email_config, select_sample_recipients
 from components.email_approval import EmailApprovalManager, display_auto_send_workflow
 from components.json_email_processor import display_json_email_input, create_recipients_from_json
+from utils.checkpoint import clear_checkpoints
 
 # Page configuration
 st.set_page_config(page_title=APP_TITLE, page_icon=APP_ICON, layout="wide")
@@ -69,16 +73,17 @@ st.markdown("---")
 if st.session_state.email_type == "regular":
     # Regular Email UI
     subject, body = display_regular_email_form()
-    display_regular_email_preview(subject, body, recipients)
+    display_regular_email_preview(subject, body, recipients, json_contacts)
     
     # Initialize AI settings for regular emails
     preview_emails = False
     human_approval = False
     customize_per_recipient = False
+    sample_first = False
     template, prompt = None, None
 else:
     # AI Email UI
-    template, prompt, subject, preview_emails, human_approval, customize_per_recipient = display_ai_email_settings()
+    template, prompt, subject, preview_emails, human_approval, customize_per_recipient, sample_first = display_ai_email_settings()
     body = ""  # AI will generate the body
 
 st.markdown("---")
@@ -103,11 +108,21 @@ if display_send_button(st.session_state.email_type, recipients, subject, body, h
                 body=body,
                 template=template,
                 prompt=prompt,
-                customize_per_recipient=customize_per_recipient
+                customize_per_recipient=customize_per_recipient,
+                segment_count=st.session_state.get('segment_count', 0) if st.session_state.email_type == "ai" else 0
             )
             
-            # Generate email data
-            email_data = email_manager.generate_email_data(recipients, email_config, json_contacts)
+            if sample_first and len(recipients) > SAMPLE_FIRST_SIZE:
+                # Generate a few drafts first; the rest waits until the prompt is approved
+                sample_recipients = select_sample_recipients(recipients, json_contacts)
+                sample_set = set(sample_recipients)
+                start_sample_stage(email_config, [r for r in recipients if r not in sample_set])
+                recipients = sample_recipients
+            
+            # Generate email data, reusing emails whose inputs have not changed
+            email_data = email_manager.generate_email_data(
+                recipients, email_config, json_contacts, get_previous_email_data()
+            )
             set_email_data(email_data)
             st.rerun()
 
@@ -116,8 +131,15 @@ if is_email_data_generated():
     email_data = get_email_data()
     email_manager = EmailManager(create_inbox_toggle, selected_inbox)
     
+    # Recipients whose generation failed every attempt can be retried without redoing the rest
+    EmailApprovalManager(email_manager).display_retry_controls(email_data, json_contacts)
+    
+    # Sample-first mode: approve the prompt on a few drafts before generating the rest
+    if get_sample_stage():
+        EmailApprovalManager(email_manager).display_sample_review(email_data, json_contacts)
+    
     # Handle AI emails with preview/approval
-    if st.session_state.email_type == "ai" and (preview_emails or human_approval):
+    elif st.session_state.email_type == "ai" and (preview_emails or human_approval):
         approval_manager = EmailApprovalManager(email_manager)
         approval_manager.display_email_previews(email_data, preview_emails, human_approval)
         
@@ -125,15 +147,19 @@ if is_email_data_generated():
             approval_manager.display_bulk_send_controls(email_data)
     
     # Handle auto-send mode (no approval required)
-    if not human_approval:
+    if not human_approval and not get_sample_stage():
         display_auto_send_workflow(email_manager, email_data)
         # Clear session state after sending
         reset_email_data()
     
-    # Reset button
+    # Reset buttons
     if display_reset_button():
         reset_email_data()
         st.rerun()
+    if display_regenerate_all_button():
+        reset_email_data(keep_previous=False)
+        clear_checkpoints()
+        st.rerun()
 
 # Footer
 st.markdown("---")
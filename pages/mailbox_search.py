@@ -0,0 +1,41 @@
+import streamlit as st
+from components.agentmail_utils import client
+from utils.mailbox_store import MailboxStore
+
+st.title("Mailbox Search")
+st.write("Search and browse a local copy of your inboxes.")
+
+store = MailboxStore()
+
+if st.button("🔄 Sync Now"):
+    with st.spinner("Syncing inboxes..."):
+        results = store.sync_all(client)
+    new_messages = sum(stats['messages'] for stats in results.values())
+    st.success(f"Synced {len(results)} inboxes, {new_messages} new messages")
+
+stats = store.get_stats()
+st.caption(f"{stats['inboxes']} inboxes, {stats['threads']} threads, {stats['messages']} messages stored locally")
+
+inbox_ids = [inbox['inbox_id'] for inbox in store.list_inboxes()]
+inbox_filter = st.selectbox("Inbox:", ["All inboxes"] + inbox_ids)
+inbox_id = None if inbox_filter == "All inboxes" else inbox_filter
+
+query = st.text_input("Search:", placeholder='hiring@agentmail.to "job offer"')
+raw_query = st.checkbox("Advanced search syntax", help='SQLite FTS5 queries: interview OR offer, sender:hiring, "job offer" NEAR salary')
+if query:
+    try:
+        results = store.search(query, inbox_id=inbox_id, limit=50, raw=raw_query)
+    except Exception as e:
+        st.error(f"Invalid search: {e}")
+        results = []
+    st.write(f"{len(results)} results")
+    for result in results:
+        with st.expander(f"{result['subject'] or '(no subject)'} — {result['sender']}"):
+            st.caption(f"{result['timestamp']} · {result['inbox_id']}")
+            st.write(result['snippet'])
+            for message in store.thread_messages(result['thread_id']) if result['thread_id'] else []:
+                st.markdown(f"**{message['sender']}** · {message['timestamp']}")
+                st.text(message['body'] or '')
+elif inbox_id:
+    for thread in store.list_threads(inbox_id, limit=50):
+        st.write(f"**{thread['subject'] or '(no subject)'}** · {thread['message_count'] or 0} messages · {thread['timestamp']}")
@@ -0,0 +1,33 @@
+import streamlit as st
+from utils.suppression import get_suppression_list
+from utils.validators import validate_email_text
+
+st.title("Suppression List")
+st.write("Addresses that are never generated for or sent to: unsubscribes and bounces.")
+
+suppression_list = get_suppression_list()
+
+stats = suppression_list.get_stats()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Suppressed addresses", f"{len(suppression_list):,}")
+col2.metric("Lookups", f"{stats['checks']:,}")
+col3.metric("Suppressed hits", f"{stats['suppressed']:,}")
+col4.metric("Bloom false positives", f"{stats['bloom_false_positives']:,}")
+st.caption("Lookup counters cover this app process since it started.")
+
+st.subheader("Add Addresses")
+new_addresses = st.text_area("Addresses to suppress (one per line or comma separated):", height=120)
+if st.button("➕ Add to Suppression List") and new_addresses:
+    valid, invalid = validate_email_text(new_addresses)
+    added = suppression_list.add(valid)
+    st.success(f"Added {added} new addresses ({len(valid) - added} were already suppressed)")
+    if invalid:
+        st.warning(f"Skipped {len(invalid)} invalid entries: " + ", ".join(entry for entry, _ in invalid[:10]))
+
+st.subheader("Check Addresses")
+check_address = st.text_input("Address to check:")
+if check_address:
+    if suppression_list.is_suppressed(check_address):
+        st.error(f"{check_address} is suppressed")
+    else:
+        st.success(f"{check_address} is not suppressed")
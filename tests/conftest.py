@@ -0,0 +1,11 @@
+"""
+Shared pytest setup
+Tests run from the repo root with plain imports (config, utils.*, components.*),
+the same way the app and the benchmarks import them.
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
@@ -0,0 +1,53 @@
+from utils.conversation_history import ConversationHistoryCache, strip_quoted_text
+
+def make_cache(tmp_path, **kwargs):
+    return ConversationHistoryCache(str(tmp_path / "history.json"), **kwargs)
+
+def test_strip_quoted_text():
+    text = "Sounds good!\n\nOn Mon, Jan 1, 2024 at 9:00 AM Hiring <h@x.com> wrote:\n> Are you free?"
+    assert strip_quoted_text(text) == "Sounds good!"
+    assert strip_quoted_text("Yes\n> quoted\nThanks") == "Yes\nThanks"
+
+def test_append_is_idempotent_by_message_id(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.append("t1", "m1", "HIRING MANAGER", "Are you free?")
+    cache.append("t1", "m1", "HIRING MANAGER", "Are you free?")
+    cache.append("t1", "r1", "ME (Alex)", "Yes!")
+    assert cache.render("t1") == "HIRING MANAGER: Are you free?\n\nME (Alex): Yes!"
+    assert cache.message_count("t1") == 2
+    assert cache.render("unknown") == ""
+
+def test_old_turns_fold_into_a_bounded_summary(tmp_path):
+    cache = make_cache(tmp_path, token_budget=60, summary_budget=25)
+    for n in range(20):
+        cache.append("t1", f"m{n}", "HIRING MANAGER", f"Message number {n}. More detail follows here.")
+    rendered = cache.render("t1")
+    assert rendered.startswith("Earlier in the thread (summarized):\n- (")
+    assert rendered.endswith("HIRING MANAGER: Message number 19. More detail follows here.")
+    assert len(rendered) < 60 * 4 + 100
+
+def test_reconcile_seeds_and_appends_missing_tail(tmp_path):
+    cache = make_cache(tmp_path)
+    thread = [("m1", "HM", "One"), ("r1", "ME", "Two"), ("m2", "HM", "Three")]
+    assert cache.reconcile("t1", thread[:2]) == 2
+    assert cache.reconcile("t1", thread) == 1
+    assert cache.reconcile("t1", thread) == 0
+    assert cache.render("t1") == "HM: One\n\nME: Two\n\nHM: Three"
+
+def test_reconcile_rebuilds_when_a_message_is_missing_from_the_middle(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.append("t1", "m1", "HM", "One")
+    cache.append("t1", "m3", "HM", "Three")
+    assert cache.reconcile("t1", [("m1", "HM", "One"), ("m2", "ME", "Two"), ("m3", "HM", "Three")]) == 3
+    assert cache.render("t1") == "HM: One\n\nME: Two\n\nHM: Three"
+    assert cache.message_count("t1") == 3
+
+def test_cache_persists(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.append("t1", "m1", "HM", "One")
+    cache.save()
+    reloaded = make_cache(tmp_path)
+    assert "t1" in reloaded
+    assert reloaded.render("t1") == "HM: One"
+    (tmp_path / "history.json").write_text("not json", encoding='utf-8')
+    assert "t1" not in make_cache(tmp_path)
@@ -0,0 +1,39 @@
+import pytest
+
+from utils.fake_agentmail import FakeAgentMail, FakeAgentMailServer, FakeApiError, FakeMailbox
+
+INBOX = "agent@agentmail.to"
+
+def test_reply_with_a_repeated_idempotency_key_is_sent_once():
+    client = FakeAgentMail(FakeMailbox())
+    inbound = client.mailbox.deliver(INBOX, "hr@example.com", "Role", "Hello")
+    first = client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                          text="Hi", idempotency_key="reply-1")
+    again = client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                          text="Hi", idempotency_key="reply-1")
+    assert again.message_id == first.message_id
+    with pytest.raises(FakeApiError) as conflict:
+        client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                      text="Different", idempotency_key="reply-1")
+    assert conflict.value.status_code == 409
+    assert len(client.mailbox.threads[inbound['thread_id']]['message_ids']) == 2
+
+def test_server_reads_the_idempotency_key_header():
+    agentmail = pytest.importorskip('agentmail')
+    from agentmail.environment import AgentMailEnvironment
+    server = FakeAgentMailServer().start()
+    try:
+        client = agentmail.AgentMail(api_key="local", environment=AgentMailEnvironment(http=server.url, websockets=server.url))
+        inbound = server.mailbox.deliver(INBOX, "hr@example.com", "Role", "Hello")
+        first = client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                              text="Hi", idempotency_key="reply-1")
+        again = client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                              text="Hi", idempotency_key="reply-1")
+        assert again.message_id == first.message_id
+        with pytest.raises(agentmail.core.api_error.ApiError) as conflict:
+            client.inboxes.messages.reply(inbox_id=INBOX, message_id=inbound['message_id'],
+                                          text="Different", idempotency_key="reply-1",
+                                          request_options={'max_retries': 0})
+        assert conflict.value.status_code == 409
+    finally:
+        server.stop()
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from utils.inbox_scheduler import FairScheduler, RateLimiter
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+    def make(max_workers):
+        scheduler = FairScheduler(max_workers)
+        schedulers.append(scheduler)
+        return scheduler
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+def test_inboxes_take_turns(make_scheduler):
+    scheduler = make_scheduler(1)
+    queues = {'busy': [f"busy-{n}" for n in range(5)], 'quiet': ["quiet-0", "quiet-1"]}
+    results, deferred = scheduler.run(queues, lambda item: item)
+    assert results == ["busy-0", "quiet-0", "busy-1", "quiet-1", "busy-2", "busy-3", "busy-4"]
+    assert deferred == {}
+
+def test_per_inbox_concurrency_cap(make_scheduler):
+    scheduler = make_scheduler(6)
+    scheduler.configure('capped', max_concurrency=2)
+    lock = threading.Lock()
+    running = {'capped': 0, 'free': 0}
+    peak = {'capped': 0, 'free': 0}
+    def handler(key):
+        with lock:
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+        time.sleep(0.02)
+        with lock:
+            running[key] -= 1
+        return key
+    results, _ = scheduler.run({'capped': ['capped'] * 6, 'free': ['free'] * 4}, handler)
+    assert len(results) == 10
+    assert peak['capped'] == 2
+    assert peak['free'] > 2
+
+def test_rate_limited_work_is_deferred_without_holding_up_other_inboxes(make_scheduler):
+    scheduler = make_scheduler(2)
+    scheduler.configure('limited', max_concurrency=4, per_minute=2)
+    results, deferred = scheduler.run({'limited': ['limited'] * 5, 'open': ['open'] * 3}, lambda item: item)
+    assert results.count('limited') == 2 and results.count('open') == 3
+    assert deferred == {'limited': 3}
+
+def test_rate_limiter_refills_over_time(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    limiter = RateLimiter(per_minute=60, burst=2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    clock[0] += 1.0
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert RateLimiter(None).try_acquire()
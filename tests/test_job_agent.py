@@ -0,0 +1,143 @@
+"""
+Job agent end to end against the in-process AgentMail fake
+The agent module is loaded fresh per test with its state in a scratch
+directory and a canned LLM, so each test sees an empty mailbox and ledger.
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+import components.model_router as model_router
+import utils.fake_agentmail as fake_agentmail
+from components.model_router import ModelRouter
+from utils.fake_agentmail import FakeMailbox
+
+JOB_MAIN = os.path.join(os.path.dirname(__file__), '..', 'email-retrieval', 'job', 'main.py')
+INBOX = "givemeajob@agentmail.to"
+HIRING = "hiring@agentmail.to"
+
+@pytest.fixture
+def load_job_agent(tmp_path, monkeypatch):
+    pytest.importorskip('dotenv')
+    pytest.importorskip('openai')
+    loaded = []
+
+    def load(agent_configs=None):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('AGENTMAIL_BASE_URL', 'inprocess')
+        monkeypatch.setenv('LLAMA_API_KEY', 'test')
+        monkeypatch.setenv('JOB_DATA_DIR', str(tmp_path / 'data'))
+        if agent_configs is None:
+            monkeypatch.delenv('JOB_AGENTS_CONFIG', raising=False)
+        else:
+            config_path = tmp_path / 'agents.json'
+            config_path.write_text(json.dumps(agent_configs), encoding='utf-8')
+            monkeypatch.setenv('JOB_AGENTS_CONFIG', str(config_path))
+        monkeypatch.setattr(fake_agentmail, '_default_mailbox', FakeMailbox())
+        monkeypatch.setattr(model_router, '_model_router', ModelRouter(stats_path=None))
+
+        spec = importlib.util.spec_from_file_location('job_agent_main', JOB_MAIN)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        loaded.append(module)
+
+        module.prompts = []
+        def complete(model, messages, max_tokens, temperature, timeout=None):
+            module.prompts.append(messages)
+            return {'content': f"Reply {len(module.prompts)}", 'first_token_seconds': 0.0, 'seconds': 0.01}
+        monkeypatch.setattr(module.llama_client, 'complete', complete)
+        return module
+
+    yield load
+    for module in loaded:
+        module.scheduler.shutdown()
+        module.llama_client.close()
+
+@pytest.fixture
+def job_agent(load_job_agent):
+    return load_job_agent()
+
+def replies_in(mailbox, thread_id):
+    return [message for message in mailbox.messages.values()
+            if message['thread_id'] == thread_id and 'sent' in message['labels']]
+
+def test_replies_once_and_labels_the_message(job_agent):
+    mailbox = job_agent.client.mailbox
+    inbound = mailbox.deliver(INBOX, HIRING, "Role", "Are you interested?")
+    assert job_agent.process_conversations()
+    [reply] = replies_in(mailbox, inbound['thread_id'])
+    assert reply['text'] == "Reply 1" and reply['in_reply_to'] == inbound['message_id']
+    assert "replied" in mailbox.messages[inbound['message_id']]['labels']
+    # The agent's own reply is now the latest message: nothing more to do
+    assert not job_agent.process_conversations()
+    assert len(replies_in(mailbox, inbound['thread_id'])) == 1
+
+def test_history_includes_messages_the_agent_never_answered(job_agent):
+    mailbox = job_agent.client.mailbox
+    first = mailbox.deliver(INBOX, HIRING, "Role", "Are you interested?")
+    assert job_agent.process_conversations()
+    # Two messages before the next poll: only the latest is answered
+    mailbox.deliver(INBOX, HIRING, "Re: Role", "We also need references.", thread_id=first['thread_id'])
+    mailbox.deliver(INBOX, HIRING, "Re: Role", "Can you start Monday?", thread_id=first['thread_id'])
+    assert job_agent.process_conversations()
+
+    prompt = job_agent.prompts[-1][1]['content']
+    history = prompt[prompt.index("Full conversation history"):prompt.index("INSTRUCTIONS")]
+    assert history.index("Are you interested?") < history.index("Reply 1") < history.index("We also need references.")
+    assert "Can you start Monday?" not in history
+
+def test_event_for_a_thread_new_to_the_cache_seeds_its_history(job_agent):
+    mailbox = job_agent.client.mailbox
+    first = mailbox.deliver(INBOX, HIRING, "Role", "Are you interested?")
+    latest = mailbox.deliver(INBOX, HIRING, "Re: Role", "Hello again?", thread_id=first['thread_id'])
+    payload = {key: value for key, value in latest.items()}
+    assert job_agent.process_events([{'event_type': 'message.received', 'message': payload}]) == 1
+    prompt = job_agent.prompts[-1][1]['content']
+    assert "HIRING MANAGER: Are you interested?" in prompt
+
+def test_a_send_retried_after_a_crash_does_not_reply_twice(job_agent, monkeypatch):
+    mailbox = job_agent.client.mailbox
+    inbound = mailbox.deliver(INBOX, HIRING, "Role", "Are you interested?")
+    event = {'event_type': 'message.received', 'message': dict(inbound)}
+
+    # The process dies after the API accepted the reply but before the ledger recorded it
+    def crash(*args, **kwargs):
+        raise SystemExit("killed")
+    with monkeypatch.context() as patch:
+        patch.setattr(job_agent.reply_ledger, 'mark_sent', crash)
+        with pytest.raises(SystemExit):
+            job_agent.reply_to_message(job_agent.payload_to_message(event['message']))
+    assert job_agent.reply_ledger.get(inbound['message_id'])['state'] == 'claimed'
+
+    # The claim's lease runs out and the redelivered event is handled with a freshly generated reply
+    job_agent.reply_ledger.lease_seconds = 0
+    assert job_agent.process_events([event]) == 1
+    assert len(job_agent.prompts) == 2
+    [reply] = replies_in(mailbox, inbound['thread_id'])
+    assert reply['text'] == "Reply 1"
+    assert job_agent.reply_ledger.get(inbound['message_id'])['state'] == 'labeled'
+    assert "replied" in mailbox.messages[inbound['message_id']]['labels']
+
+def test_persona_text_is_templated_without_str_format(load_job_agent):
+    job_agent = load_job_agent([{
+        'inbox_id': INBOX, 'name': "Sam", 'counterpart': "recruiter",
+        'instructions': ["Sign off as {name}", "Thank the {counterpart}", "{stage_instruction}",
+                         "Reply in JSON like {\"body\": ...}", "Never write {placeholders}"],
+        'continuation_goal': "Keep {name} top of mind",
+        'fallback_continuation': "Thanks, {counterpart}! - {name} {sic}",
+    }])
+    agent = job_agent.agents[INBOX]
+    assert agent['instructions'][:2] == ["Sign off as Sam", "Thank the recruiter"]
+    assert agent['continuation_goal'] == "Keep Sam top of mind"
+    assert agent['fallback_continuation'] == "Thanks, recruiter! - Sam {sic}"
+
+    mailbox = job_agent.client.mailbox
+    inbound = mailbox.deliver(INBOX, HIRING, "Role", "Are you interested?")
+    assert job_agent.process_conversations()
+    prompt = job_agent.prompts[-1][1]['content']
+    assert "- Sign off as Sam" in prompt
+    assert f"- {agent['first_message_instruction']}" in prompt
+    assert "- Reply in JSON like {\"body\": ...}" in prompt and "- Never write {placeholders}" in prompt
+    assert job_agent.reply_ledger.get(inbound['message_id'])['state'] == 'labeled'
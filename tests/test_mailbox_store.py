@@ -0,0 +1,93 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+import utils.mailbox_store as mailbox_store
+from utils.fake_agentmail import FakeAgentMail, FakeMailbox
+from utils.mailbox_store import MailboxStore, fts_query
+
+INBOX = "agent@agentmail.to"
+
+@pytest.fixture
+def mailbox():
+    return FakeMailbox()
+
+@pytest.fixture
+def client(mailbox):
+    return FakeAgentMail(mailbox)
+
+@pytest.fixture
+def store(tmp_path):
+    return MailboxStore(str(tmp_path / "mailbox.db"))
+
+def test_sync_fetches_each_message_once(mailbox, client, store):
+    first = mailbox.deliver(INBOX, "hiring@agentmail.to", "Backend role", "Are you a full-stack engineer?")
+    stats = store.sync_inbox(client, INBOX)
+    assert (stats['messages'], stats['fetched'], stats['threads']) == (1, 1, 1)
+
+    client.inboxes.messages.reply(inbox_id=INBOX, message_id=first['message_id'], text="Yes!")
+    stats = store.sync_inbox(client, INBOX)
+    # The overlap re-lists the first message, but only the reply is fetched
+    assert (stats['messages'], stats['fetched']) == (1, 1)
+    assert [m['body'] for m in store.thread_messages(first['thread_id'])] == ["Are you a full-stack engineer?", "Yes!"]
+    assert store.sync_inbox(client, INBOX)['fetched'] == 0
+
+def test_sync_inboxes_and_list_threads(mailbox, client, store):
+    mailbox.deliver(INBOX, "a@x.com", "One", "Hi")
+    mailbox.deliver("other@agentmail.to", "b@x.com", "Two", "Hi")
+    results = store.sync_all(client)
+    assert sorted(results) == ["agent@agentmail.to", "other@agentmail.to"]
+    assert [inbox['inbox_id'] for inbox in store.list_inboxes()] == sorted(results)
+    assert [thread['subject'] for thread in store.list_threads(INBOX, label="unread")] == ["One"]
+    assert store.list_threads(INBOX, label="replied") == []
+
+def test_labels_of_older_messages_refresh_when_their_thread_moves(mailbox, client, store, monkeypatch):
+    monkeypatch.setattr(mailbox_store, 'SYNC_OVERLAP', timedelta(0))
+    first = mailbox.deliver(INBOX, "a@x.com", "Role", "Hi")
+    mailbox.deliver(INBOX, "b@x.com", "Other", "Hi")
+    store.sync_inbox(client, INBOX)
+    # Labelled outside this process; the message is now behind the sync cursor
+    client.inboxes.messages.update(inbox_id=INBOX, message_id=first['message_id'],
+                                   add_labels=["replied"], remove_labels=["unread"])
+    mailbox.deliver(INBOX, "a@x.com", "Re: Role", "Any news?", thread_id=first['thread_id'])
+    stats = store.sync_inbox(client, INBOX)
+    assert stats['relabeled'] == 1
+    assert json.loads(store.get_message(first['message_id'])['labels']) == ["received", "replied"]
+
+def test_update_labels_writes_through(mailbox, client, store):
+    message = mailbox.deliver(INBOX, "a@x.com", "Role", "Hi")
+    store.sync_inbox(client, INBOX)
+    store.update_labels(message['message_id'], add=["replied"], remove=["unread"])
+    assert json.loads(store.get_message(message['message_id'])['labels']) == ["received", "replied"]
+    store.update_labels("<unknown@x>", add=["replied"])
+
+def test_history_before_needs_the_whole_thread(mailbox, client, store):
+    first = mailbox.deliver(INBOX, "a@x.com", "Role", "One")
+    second = mailbox.deliver(INBOX, "a@x.com", "Re: Role", "Two", thread_id=first['thread_id'])
+    assert store.history_before(first['thread_id'], second['message_id']) is None
+    store.sync_inbox(client, INBOX)
+    assert [m['body'] for m in store.history_before(first['thread_id'], second['message_id'])] == ["One"]
+
+    # A message the mirror hasn't seen yet means the history may be incomplete
+    third = mailbox.deliver(INBOX, "a@x.com", "Re: Role", "Three", thread_id=first['thread_id'])
+    assert store.history_before(first['thread_id'], third['message_id']) is None
+
+def test_fts_query_quotes_terms():
+    assert fts_query('hiring@agentmail.to full-stack') == '"hiring@agentmail.to" "full-stack"'
+    assert fts_query('"job offer" interv* OR') == '"job offer" "interv"* "OR"'
+    assert fts_query('say "hi') == '"say" """hi"'
+    assert fts_query('  ') == ''
+
+def test_search_by_address_and_hyphenated_words(mailbox, client, store):
+    mailbox.deliver(INBOX, "hiring@agentmail.to", "Backend role", "We need a full-stack engineer")
+    mailbox.deliver(INBOX, "someone@else.com", "Newsletter", "Stack overflow digest")
+    store.sync_inbox(client, INBOX)
+
+    assert [r['sender'] for r in store.search("hiring@agentmail.to")] == ["hiring@agentmail.to"]
+    assert [r['subject'] for r in store.search("full-stack")] == ["Backend role"]
+    assert [r['subject'] for r in store.search("back*")] == ["Backend role"]
+    assert store.search("") == []
+    assert len(store.search("role OR digest", raw=True)) == 2
+    assert store.search("role OR digest") == []
+    assert [r['subject'] for r in store.search("engineer", inbox_id="other@agentmail.to")] == []
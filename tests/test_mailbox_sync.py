@@ -0,0 +1,74 @@
+import utils.mailbox_sync as mailbox_sync
+from utils.fake_agentmail import FakeAgentMail, FakeMailbox
+from utils.mailbox_sync import ThreadSync
+
+INBOX = "agent@agentmail.to"
+
+def make_sync(client, tmp_path):
+    return ThreadSync(client, INBOX, str(tmp_path / "cursor.json"), labels=["unread"])
+
+def thread_ids(threads):
+    return sorted(thread.thread_id for thread in threads)
+
+def test_changed_threads_pages_through_every_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(mailbox_sync, 'SYNC_PAGE_SIZE', 2)
+    mailbox = FakeMailbox()
+    delivered = [mailbox.deliver(INBOX, "hr@x.com", f"Role {n}", "Interested?") for n in range(5)]
+    sync = make_sync(FakeAgentMail(mailbox), tmp_path)
+
+    assert thread_ids(sync.changed_threads()) == sorted(message['thread_id'] for message in delivered)
+    assert sync.api_calls == 3
+
+def test_handled_threads_are_skipped_until_they_change(tmp_path):
+    mailbox = FakeMailbox()
+    client = FakeAgentMail(mailbox)
+    first = mailbox.deliver(INBOX, "hr@x.com", "Role", "Interested?")
+    sync = make_sync(client, tmp_path)
+
+    [thread] = sync.changed_threads()
+    latest = sync.latest_message(thread)
+    assert latest.message_id == first['message_id']
+    sync.mark_handled(thread.thread_id, latest.message_id)
+    sync.save()
+    assert sync.changed_threads() == []
+
+    follow_up = mailbox.deliver(INBOX, "hr@x.com", "Re: Role", "Still there?", thread_id=first['thread_id'])
+    [thread] = sync.changed_threads()
+    assert thread.last_message_id == follow_up['message_id']
+
+def test_cursor_survives_restart_and_keeps_unhandled_threads(tmp_path):
+    mailbox = FakeMailbox()
+    client = FakeAgentMail(mailbox)
+    handled = mailbox.deliver(INBOX, "a@x.com", "One", "Hi")
+    unhandled = mailbox.deliver(INBOX, "b@x.com", "Two", "Hi")
+    sync = make_sync(client, tmp_path)
+    sync.changed_threads()
+    sync.mark_handled(handled['thread_id'], handled['message_id'])
+    sync.save()
+
+    restarted = make_sync(client, tmp_path)
+    assert restarted.last_message_ids == {handled['thread_id']: handled['message_id']}
+    # The high-water mark stayed at the unhandled thread, so a restart still lists it
+    assert restarted.high_water <= mailbox_sync._thread_timestamp(
+        client.threads.get(unhandled['thread_id']))
+    assert thread_ids(restarted.changed_threads()) == [unhandled['thread_id']]
+
+def test_listing_starts_just_before_the_high_water_mark(tmp_path):
+    mailbox = FakeMailbox()
+    client = FakeAgentMail(mailbox)
+    message = mailbox.deliver(INBOX, "a@x.com", "One", "Hi")
+    sync = make_sync(client, tmp_path)
+    sync.changed_threads()
+    sync.mark_handled(message['thread_id'], message['message_id'])
+
+    calls = []
+    original_list = client.threads.list
+    client.threads.list = lambda **kwargs: calls.append(kwargs) or original_list(**kwargs)
+    sync.changed_threads()
+    assert calls[0]['after'] == sync.high_water - mailbox_sync.SYNC_OVERLAP
+    assert calls[0]['labels'] == ["unread"]
+
+def test_corrupt_cursor_starts_fresh(tmp_path):
+    (tmp_path / "cursor.json").write_text("{not json", encoding='utf-8')
+    sync = make_sync(FakeAgentMail(FakeMailbox()), tmp_path)
+    assert sync.high_water is None and sync.last_message_ids == {}
@@ -0,0 +1,40 @@
+import threading
+
+from utils.reply_ledger import ReplyLedger, CLAIMED, SENT, LABELED, FAILED
+
+def test_only_one_of_many_workers_claims_a_message(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    results = []
+    def worker(n):
+        results.append(ReplyLedger(path, owner=f"worker-{n}").claim("m1", "t1"))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == ['busy'] * 7 + [CLAIMED]
+
+def test_answered_messages_are_not_claimed_again(tmp_path):
+    ledger = ReplyLedger(str(tmp_path / "ledger.db"))
+    assert ledger.claim("m1") == CLAIMED
+    ledger.mark_sent("m1", "r1")
+    assert ledger.claim("m1") == SENT
+    ledger.mark_labeled("m1")
+    assert ledger.claim("m1") == LABELED
+    assert ledger.get("m1")['reply_id'] == "r1"
+    assert ledger.get_stats()[LABELED] == 1
+
+def test_failed_claims_are_released(tmp_path):
+    ledger = ReplyLedger(str(tmp_path / "ledger.db"))
+    assert ledger.claim("m1") == CLAIMED
+    ledger.mark_failed("m1", "send failed")
+    assert ledger.get("m1")['state'] == FAILED
+    assert ledger.claim("m1") == CLAIMED
+    assert ledger.get("m1")['attempts'] == 2
+
+def test_a_dead_worker_claim_is_taken_over_after_the_lease(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    assert ReplyLedger(path, owner="dead", lease_seconds=0).claim("m1") == CLAIMED
+    assert ReplyLedger(path, owner="alive", lease_seconds=300).claim("m1") == 'busy'
+    assert ReplyLedger(path, owner="alive", lease_seconds=0).claim("m1") == CLAIMED
+    assert ReplyLedger(path).get("m1")['owner'] == "alive"
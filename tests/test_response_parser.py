@@ -0,0 +1,43 @@
+import json
+
+from utils.response_parser import parse_email_response
+
+def test_json_and_fenced_json():
+    payload = {'Subject': "Data work", 'body': "Hi Ada,\n\nThanks."}
+    expected = {'subject': "Data work", 'body': "Hi Ada,\n\nThanks."}
+    assert parse_email_response(json.dumps(payload)) == expected
+    assert parse_email_response("```json\n" + json.dumps(payload) + "\n```") == expected
+
+def test_invalid_json_falls_back_to_labels():
+    assert parse_email_response('{"subject": broken\nSUBJECT: Hi\nBODY: text') == {'subject': "Hi", 'body': "text"}
+
+def test_plain_and_markdown_labels():
+    expected = {'subject': "Data work at Acme", 'body': "Hi Ada,\n\nParagraph two."}
+    for text in [
+        "SUBJECT: Data work at Acme\nBODY: Hi Ada,\n\nParagraph two.",
+        "**Subject:** Data work at Acme\n\n**Body:**\nHi Ada,\n\nParagraph two.",
+        "## Subject: \"Data work at Acme\"\n## body:\nHi Ada,\n\nParagraph two.",
+        "Here is your email:\nsubject: [Data work at Acme]\nbody: Hi Ada,\n\nParagraph two.",
+    ]:
+        assert parse_email_response(text) == expected, text
+
+def test_subject_and_body_on_one_line():
+    assert parse_email_response("SUBJECT: Quick question BODY: Hi Ada, short one.") == {
+        'subject': "Quick question", 'body': "Hi Ada, short one."}
+
+def test_label_words_inside_text_are_not_labels():
+    assert parse_email_response("SUBJECT: Re: body: check\nBODY: hi") == {'subject': "Re: body: check", 'body': "hi"}
+    assert parse_email_response("SUBJECT: Hello\nBODY: Hi Bob, I saw your body: of work.") == {
+        'subject': "Hello", 'body': "Hi Bob, I saw your body: of work."}
+    assert parse_email_response("Hi Bob, I saw your body: of work.") is None
+
+def test_body_mentioning_subject_stays_in_body():
+    assert parse_email_response("SUBJECT: Hi\nBODY: First line\nSubject: not a label here") == {
+        'subject': "Hi", 'body': "First line\nSubject: not a label here"}
+
+def test_body_without_subject():
+    assert parse_email_response("BODY: Just the body") == {'subject': "", 'body': "Just the body"}
+
+def test_no_body():
+    assert parse_email_response("") is None
+    assert parse_email_response("SUBJECT: only a subject") is None
@@ -0,0 +1,49 @@
+import random
+
+from components.review_clustering import (
+    MINHASH_BANDS, MINHASH_ROWS, cluster_emails, diff_against_representative, jaccard_similarity, shingles,
+)
+from config import REVIEW_MIN_SIMILARITY
+
+WORDS = ("data platform pipeline team scale warehouse streaming latency batch model feature store quality "
+         "review growth hiring product roadmap customers analytics infrastructure reliability").split()
+
+def make_email(recipient, words):
+    return {'recipient': recipient, 'subject': "Quick question", 'body': ' '.join(words)}
+
+def test_band_layout_makes_threshold_pairs_candidates():
+    assert MINHASH_BANDS * MINHASH_ROWS == 32
+    candidate_probability = 1 - (1 - REVIEW_MIN_SIMILARITY ** MINHASH_ROWS) ** MINHASH_BANDS
+    assert candidate_probability > 0.99
+
+def test_near_duplicates_share_a_cluster():
+    rng = random.Random(7)
+    base = [rng.choice(WORDS) for _ in range(120)]
+    emails = [make_email("rep@x.com", base)]
+    for n in range(40):
+        words = list(base)
+        # Change one word in every stretch of ~20, keeping similarity just above the threshold
+        for position in range(n % 7, len(words), 20):
+            words[position] = f"name{n}"
+        emails.append(make_email(f"member{n}@x.com", words))
+
+    base_shingles = shingles(emails[0]['subject'] + "\n" + emails[0]['body'])
+    similarities = [jaccard_similarity(base_shingles, shingles(e['subject'] + "\n" + e['body'])) for e in emails[1:]]
+    assert min(similarities) >= REVIEW_MIN_SIMILARITY
+
+    clusters = cluster_emails(emails)
+    assert clusters == [{'representative': 0, 'members': list(range(len(emails)))}]
+
+def test_different_emails_stay_apart():
+    rng = random.Random(11)
+    emails = [make_email(f"r{n}@x.com", [f"{rng.choice(WORDS)}{n}" for _ in range(60)]) for n in range(5)]
+    clusters = cluster_emails(emails)
+    assert [cluster['members'] for cluster in clusters] == [[0], [1], [2], [3], [4]]
+
+def test_diff_against_representative():
+    representative = {'recipient': "a@x.com", 'subject': "Hi", 'body': "Hi Ada,\nSame line"}
+    member = {'recipient': "b@x.com", 'subject': "Hi", 'body': "Hi Bo,\nSame line"}
+    diff = diff_against_representative(representative, member)
+    assert "-Hi Ada," in diff and "+Hi Bo," in diff
+    assert "Same line" not in diff
+    assert diff_against_representative(representative, dict(representative, recipient="c@x.com")) == ""
@@ -0,0 +1,89 @@
+import os
+
+from utils.suppression import BloomFilter, SuppressionList, BLOOM_HEADROOM
+
+def make_list(tmp_path, lines):
+    path = tmp_path / "suppression_list.txt"
+    path.write_text("".join(f"{line}\n" for line in lines), encoding='utf-8')
+    return SuppressionList(str(path))
+
+def test_lookups_are_normalized_and_skip_comments(tmp_path):
+    suppression_list = make_list(tmp_path, ["# unsubscribes", "Bounced@Example.com ", "", "gone@x.org"])
+    assert suppression_list.is_suppressed("bounced@example.com")
+    assert " GONE@X.ORG" in suppression_list
+    assert not suppression_list.is_suppressed("# unsubscribes")
+    assert not suppression_list.is_suppressed("someone@else.com")
+    assert len(suppression_list) == 2
+    assert suppression_list.get_stats()['suppressed'] == 2
+
+def test_missing_list_suppresses_nothing_until_added(tmp_path):
+    suppression_list = SuppressionList(str(tmp_path / "data" / "missing.txt"))
+    assert not suppression_list.is_suppressed("a@x.com")
+    assert suppression_list.add(["a@x.com", "A@x.com", "b@x.com"]) == 2
+    assert suppression_list.is_suppressed("a@x.com")
+    assert suppression_list.add(["b@x.com"]) == 0
+    assert len(suppression_list) == 2
+
+def test_adds_within_capacity_update_the_files_in_place(tmp_path, monkeypatch):
+    suppression_list = make_list(tmp_path, [f"user{i}@example.com" for i in range(100)])
+    assert suppression_list._bloom.capacity == 100 * BLOOM_HEADROOM
+
+    def fail_rebuild():
+        raise AssertionError("add within capacity rebuilt the filter")
+    monkeypatch.setattr(suppression_list, 'rebuild', fail_rebuild)
+    for i in range(50):
+        assert suppression_list.add([f"new{i}@example.com"]) == 1
+    assert len(suppression_list) == 150
+    assert all(suppression_list.is_suppressed(f"new{i}@example.com") for i in range(50))
+
+    # The in-place updates are persisted: a fresh instance reuses them without rebuilding
+    reopened = SuppressionList(suppression_list.path)
+    assert reopened._bloom.count == 150
+    assert reopened.is_suppressed("new49@example.com")
+
+def test_outgrowing_capacity_rebuilds_a_larger_filter(tmp_path):
+    suppression_list = make_list(tmp_path, [f"user{i}@example.com" for i in range(10)])
+    old_bloom = suppression_list._bloom
+    suppression_list.add([f"new{i}@example.com" for i in range(20)])
+    assert suppression_list._bloom is not old_bloom
+    assert old_bloom.bits.closed
+    assert suppression_list._bloom.capacity == 30 * BLOOM_HEADROOM
+    assert all(suppression_list.is_suppressed(f"user{i}@example.com") for i in range(10))
+
+def test_reload_picks_up_other_writers_and_unmaps_the_old_filter(tmp_path):
+    reader = make_list(tmp_path, ["a@x.com"])
+    old_bloom = reader._bloom
+    with open(reader.path, 'a', encoding='utf-8') as f:
+        f.write("b@x.com\n")
+    # Another process appended to the list without touching the derived files
+    os.utime(reader.path, (os.path.getmtime(reader.bloom_path) + 5,) * 2)
+    reader.reload_if_changed()
+    assert reader.is_suppressed("b@x.com")
+    assert old_bloom.bits.closed
+
+def test_bloom_false_positives_are_settled_by_the_index(tmp_path):
+    suppression_list = make_list(tmp_path, ["a@x.com"])
+    # A saturated filter answers 'maybe' for everything
+    suppression_list._bloom.bits[suppression_list._bloom._offset:] = b'\xff' * (
+        len(suppression_list._bloom.bits) - suppression_list._bloom._offset)
+    assert not suppression_list.is_suppressed("b@x.com")
+    assert suppression_list.get_stats()['bloom_false_positives'] == 1
+
+def test_bloom_filter_round_trip(tmp_path):
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"user{i}@example.com")
+    path = str(tmp_path / "filter.bloom")
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert (loaded.num_bits, loaded.num_hashes, loaded.capacity, loaded.count) == (
+        bloom.num_bits, bloom.num_hashes, 1000, 1000)
+    assert all(f"user{i}@example.com" in loaded for i in range(1000))
+    false_positives = sum(f"other{i}@example.org" in loaded for i in range(10000))
+    assert false_positives < 300
+    loaded.close()
+
+def test_malformed_filter_is_ignored(tmp_path):
+    path = tmp_path / "bad.bloom"
+    path.write_bytes(b"MABF" + b"\0" * 64)
+    assert BloomFilter.load(str(path)) is None
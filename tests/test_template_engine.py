@@ -0,0 +1,45 @@
+from utils.template_engine import compile_template, contact_field_values, find_missing_fields
+
+def test_render_fields_defaults_and_literal_braces():
+    template = compile_template("Hi {name}, {{not a field}} at {company|your team}. { } {a b}")
+    assert template.fields == ('name', 'company')
+    assert template.required_fields == ('name',)
+    assert template.render({'name': "Ada", 'company': "Acme"}) == "Hi Ada, {not a field} at Acme. { } {a b}"
+    assert template.render({'company': ""}) == "Hi there, {not a field} at your team. { } {a b}"
+
+def test_static_template():
+    template = compile_template("No fields {{here}}")
+    assert template.is_static
+    assert template.render({}) == "No fields {here}"
+    assert compile_template(None).render({}) == ""
+
+def test_unknown_field_without_default_renders_empty():
+    assert compile_template("[{hobby}]").render({}) == "[]"
+
+def test_contact_field_values_flattens_original_data():
+    contact = {
+        'name': "Ada", 'company': "", 'title': None,
+        'original_data': {'team': "Data", 'company': "Raw Co", 'tags': ["x"], 'id': 7, 'blank': ""},
+    }
+    values = contact_field_values("ada@x.com", contact, fallback={'title': "Professional"})
+    assert values == {'title': "Professional", 'team': "Data", 'company': "Raw Co", 'id': 7,
+                      'name': "Ada", 'email': "ada@x.com"}
+
+def test_contact_field_values_tolerates_null_original_data():
+    values = contact_field_values("ada@x.com", {'name': "Ada", 'original_data': None})
+    assert values == {'name': "Ada", 'email': "ada@x.com"}
+    assert contact_field_values("bo@x.com") == {'email': "bo@x.com"}
+
+def test_find_missing_fields_across_templates():
+    subject = compile_template("Hello {name}")
+    body = compile_template("{name} at {company} ({title|team})")
+    contacts = {
+        "a@x.com": {'name': "A", 'company': "Acme"},
+        "b@x.com": {'company': "Beta"},
+        "c@x.com": {},
+    }
+    assert find_missing_fields([subject, body], contacts) == {
+        'name': ["b@x.com", "c@x.com"],
+        'company': ["c@x.com"],
+    }
+    assert find_missing_fields([compile_template("static")], contacts) == {}
@@ -0,0 +1,40 @@
+from utils.validators import (
+    extract_emails_from_text, invalid_email_reason, iter_text_entries, validate_email, validate_email_text,
+    validate_emails,
+)
+
+def test_validate_email():
+    assert validate_email("first.last+tag@sub.example.co")
+    assert not validate_email("")
+    assert not validate_email("no-at-sign.example.com")
+    assert not validate_email("a@b@example.com")
+
+def test_invalid_email_reason():
+    assert invalid_email_reason("ok@example.com") is None
+    assert invalid_email_reason("example.com") == "missing @"
+    assert invalid_email_reason("a@b@example.com") == "more than one @"
+    assert invalid_email_reason("@example.com") == "empty local part"
+    assert invalid_email_reason("user@") == "empty domain"
+    assert invalid_email_reason("user@localhost") == "domain has no top-level domain"
+    assert invalid_email_reason("user@example.c0m") == "invalid top-level domain 'c0m'"
+
+def test_validate_emails_skips_blanks_and_reports_reasons():
+    valid, invalid = validate_emails(["a@x.com", "  ", None, " b@y.org ", "broken@nodomain"])
+    assert valid == ["a@x.com", "b@y.org"]
+    assert invalid == [("broken@nodomain", "domain has no top-level domain")]
+
+def test_entries_split_on_separators_and_strip_wrapping():
+    text = 'John <john@x.com>, "mary@y.org"; (bob@z.io).\nmailto:e@f.com not-an-address'
+    assert list(iter_text_entries(text)) == ["john@x.com", "mary@y.org", "bob@z.io", "e@f.com"]
+
+def test_every_entry_is_either_valid_or_invalid():
+    text = "a@x.com, mailto:e@f.com, broken@nodomain, MAILTO:g@h.net, user@@x.com"
+    valid, invalid = validate_email_text(text)
+    assert valid == ["a@x.com", "e@f.com", "g@h.net"]
+    assert [entry for entry, _ in invalid] == ["broken@nodomain", "user@@x.com"]
+    assert not set(valid) & {entry for entry, _ in invalid}
+
+def test_extraction_agrees_with_validation():
+    text = "a@x.com\nmailto:e@f.com\nbroken@nodomain, b@y.org."
+    assert extract_emails_from_text(text) == validate_email_text(text)[0]
+    assert extract_emails_from_text("") == []
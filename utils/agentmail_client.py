@@ -0,0 +1,24 @@
+"""
+AgentMail client construction shared by the app, the job agent and scripts
+AGENTMAIL_BASE_URL points the SDK at another server, such as the local fake
+from utils.fake_agentmail; AGENTMAIL_BASE_URL=inprocess skips HTTP entirely
+and returns the in-process fake client.
+"""
+import os
+from typing import Optional
+
+def create_agentmail_client(api_key: Optional[str] = None):
+    """AgentMail client for api_key (default AGENTMAIL_API_KEY), honoring AGENTMAIL_BASE_URL"""
+    api_key = api_key or os.getenv("AGENTMAIL_API_KEY")
+    base_url = os.getenv("AGENTMAIL_BASE_URL")
+    if base_url == "inprocess":
+        from utils.fake_agentmail import FakeAgentMail
+        return FakeAgentMail()
+
+    from agentmail import AgentMail
+    if not base_url:
+        return AgentMail(api_key=api_key)
+    from agentmail.environment import AgentMailEnvironment
+    environment = AgentMailEnvironment(http=base_url.rstrip('/'), websockets=base_url.rstrip('/').replace('http', 'ws', 1))
+    # A stand-in server doesn't check the key, but the SDK wants one
+    return AgentMail(api_key=api_key or "local", environment=environment)
@@ -0,0 +1,85 @@
+"""
+Asynchronous, streaming OpenAI-compatible chat client
+One AsyncOpenAI client runs on a background event loop, so every
+completion in the process shares its connection pool and any number can be
+in flight at once without holding a thread each. Responses are streamed and
+assembled as chunks arrive, which also gives the time to first token.
+Threaded callers use complete() or submit(); async code awaits acomplete().
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
+
+# Used for the blocking wait when a call gives no timeout (the OpenAI client's own default)
+DEFAULT_CALL_TIMEOUT = 600
+# Extra time complete() waits past the request timeout before giving up on the loop
+RESULT_TIMEOUT_MARGIN = 5
+
+class AsyncLLMClient:
+    """Streaming chat completions on a shared event loop and connection pool"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, max_connections: int = 64):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-event-loop", daemon=True)
+        self._thread.start()
+        # Keep-alive connections are reused across every completion
+        http_client = DefaultAsyncHttpxClient(limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        ))
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+
+    async def acomplete(self, model: str, messages: List[Dict], max_tokens: int,
+                        temperature: float, timeout: Optional[float] = None) -> Dict:
+        """Stream one completion; returns {'content', 'first_token_seconds', 'seconds'}"""
+        started = time.monotonic()
+        first_token = None
+        parts = []
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                parts.append(delta)
+        return {
+            'content': "".join(parts),
+            'first_token_seconds': first_token,
+            'seconds': time.monotonic() - started,
+        }
+
+    def submit(self, *args, **kwargs) -> Future:
+        """Start acomplete on the event loop from any thread; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self.acomplete(*args, **kwargs), self._loop)
+
+    def complete(self, model: str, messages: List[Dict], max_tokens: int,
+                 temperature: float, timeout: Optional[float] = None) -> Dict:
+        """
+        Blocking acomplete for threaded callers
+        The wait is bounded too, so a stalled or dead event loop can't hang the
+        caller; on timeout the request is cancelled and FuturesTimeout raised.
+        """
+        future = self.submit(model, messages, max_tokens, temperature, timeout)
+        try:
+            return future.result(timeout=(timeout or DEFAULT_CALL_TIMEOUT) + RESULT_TIMEOUT_MARGIN)
+        except FuturesTimeout:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
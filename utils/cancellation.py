@@ -0,0 +1,55 @@
+"""
+Cooperative cancellation with deadlines for long-running campaign stages
+A token is shared by the Streamlit thread and the worker threads of one stage
+(generation or sending). Workers check it before every external call and
+size the call's timeout from the time left, so a stopped or overdue stage
+stops taking new work and never waits on more than one call per worker.
+"""
+import threading
+import time
+from typing import Optional
+
+class OperationCancelled(Exception):
+    """Raised by a worker when its stage was stopped or ran out of time"""
+
+class CancellationToken:
+    """Cancelled explicitly with cancel() or implicitly once the deadline passes"""
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "stopped") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timeout(self, call_timeout: float) -> float:
+        """Timeout for one call: its own limit, cut short by the stage deadline"""
+        remaining = self.remaining()
+        return call_timeout if remaining is None else max(0.1, min(call_timeout, remaining))
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def sleep(self, seconds: float) -> bool:
+        """Sleep unless cancelled first; returns False if the token was cancelled"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        self._event.wait(seconds)
+        return not self.cancelled
@@ -0,0 +1,97 @@
+"""
+Incremental checkpoints for email generation
+Every finished recipient is appended to a per-campaign JSONL file as soon as
+it completes, so a Streamlit rerun, exception or timeout halfway through a
+long campaign only loses the in-flight requests. Records are keyed by the
+email's input fingerprint, so resuming never reuses stale content.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+from config import CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_DAYS
+
+def campaign_checkpoint_id(email_config: Dict, sender_info: str, signature: str) -> str:
+    """Stable ID for a campaign's settings (recipients excluded, they are per record)"""
+    payload = json.dumps({'config': email_config, 'sender_info': sender_info, 'signature': signature},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+class GenerationCheckpoint:
+    """Append-only log of per-recipient generation results for one campaign"""
+
+    def __init__(self, campaign_id: str, checkpoint_dir: str = CHECKPOINT_DIR):
+        self.path = os.path.join(checkpoint_dir, f"{campaign_id}.jsonl")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        prune_checkpoints(checkpoint_dir)
+        self._terminate_torn_line()
+
+    def _terminate_torn_line(self) -> None:
+        """A crash mid-write can leave a partial last line; end it so new records start cleanly"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def load(self) -> Dict[str, Dict]:
+        """Return the latest record per fingerprint; a torn final line from a crash is ignored"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record['fingerprint']] = record
+        return records
+
+    def completed(self) -> Dict[str, Dict]:
+        """Finished emails by fingerprint"""
+        return {fingerprint: record['email'] for fingerprint, record in self.load().items()
+                if record.get('status') == 'done'}
+
+    def _append(self, record: Dict) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+            f.flush()
+
+    def record_done(self, email_info: Dict) -> None:
+        self._append({
+            'fingerprint': email_info['fingerprint'],
+            'recipient': email_info['recipient'],
+            'status': 'done',
+            'email': email_info,
+        })
+
+    def record_failed(self, recipient: str, fingerprint: str, attempts: int, error: Optional[str]) -> None:
+        self._append({
+            'fingerprint': fingerprint,
+            'recipient': recipient,
+            'status': 'failed',
+            'attempts': attempts,
+            'error': error,
+        })
+
+def prune_checkpoints(checkpoint_dir: str = CHECKPOINT_DIR, max_age_days: int = CHECKPOINT_MAX_AGE_DAYS) -> None:
+    """Delete checkpoint files nobody has written to recently"""
+    cutoff = time.time() - max_age_days * 86400
+    for name in os.listdir(checkpoint_dir):
+        path = os.path.join(checkpoint_dir, name)
+        if name.endswith('.jsonl') and os.path.getmtime(path) < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def clear_checkpoints(checkpoint_dir: str = CHECKPOINT_DIR) -> None:
+    """Delete all generation checkpoints, forcing the next run to generate from scratch"""
+    if not os.path.isdir(checkpoint_dir):
+        return
+    for name in os.listdir(checkpoint_dir):
+        if name.endswith('.jsonl'):
+            os.remove(os.path.join(checkpoint_dir, name))
@@ -0,0 +1,147 @@
+"""
+Per-thread conversation history for reply prompts, kept within a token budget
+Each thread's messages are appended once as they are seen (quoted replies
+stripped), keyed by message ID; reconcile fills in messages the cache never saw
+(skipped, answered elsewhere, or older than the cache) from the thread itself. When the recent turns outgrow the budget, the oldest turns are
+folded into a rolling one-line-per-message summary, itself capped, so the
+rendered history stays a fixed size however long the thread gets. The cache
+is written to disk so a restart doesn't refetch whole threads.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from utils.prompt_context import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = 600  # whole rendered history, summary included
+HISTORY_SUMMARY_TOKEN_BUDGET = 150
+HISTORY_SUMMARY_LINE_CHARS = 160
+HISTORY_TURN_MAX_CHARS = 1500  # a single long message can't take the whole budget
+
+# "On Mon, Jan 1, 2024 at 9:00 AM Someone <a@b.c> wrote:" and everything after it
+QUOTE_HEADER_RE = re.compile(r'^\s*On .{0,200}wrote:\s*$', re.MULTILINE)
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+def strip_quoted_text(text: str) -> str:
+    """Drop the quoted earlier messages email clients append to replies"""
+    header = QUOTE_HEADER_RE.search(text)
+    if header:
+        text = text[:header.start()]
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith('>')]
+    return "\n".join(lines).strip()
+
+def _summary_line(turn: Dict) -> str:
+    text = " ".join(turn['text'].split())
+    first_sentence = SENTENCE_END_RE.split(text, 1)[0]
+    if len(first_sentence) > HISTORY_SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:HISTORY_SUMMARY_LINE_CHARS].rsplit(' ', 1)[0] + "..."
+    return f"- {turn['role']}: {first_sentence}"
+
+class ConversationHistoryCache:
+    """Thread ID -> rolling summary plus recent turns, persisted as JSON"""
+
+    def __init__(self, path: str, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_budget: int = HISTORY_SUMMARY_TOKEN_BUDGET):
+        self.path = path
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.threads: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.threads = json.load(f)
+        except (OSError, ValueError):
+            self.threads = {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.threads)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self.threads
+
+    def message_count(self, thread_id: str) -> int:
+        """How many messages with IDs the thread's history holds, summarized ones included"""
+        with self._lock:
+            entry = self.threads.get(thread_id)
+            return len(entry['message_ids']) if entry else 0
+
+    def reconcile(self, thread_id: str, messages: List[Tuple[Optional[str], str, str]]) -> int:
+        """
+        Bring a thread's history in line with its messages, given oldest first as (message_id, role, text)
+        Missing messages after everything cached are appended; one missing from
+        the middle means the history is out of order, so it is rebuilt from
+        messages. Returns how many messages were added.
+        """
+        with self._lock:
+            entry = self.threads.get(thread_id)
+            known = set(entry['message_ids']) if entry else set()
+            missing = [index for index, (message_id, _, _) in enumerate(messages)
+                       if message_id and message_id not in known]
+            if not missing:
+                return 0
+            if any(message_id in known for message_id, _, _ in messages[missing[0]:]):
+                del self.threads[thread_id]
+                missing = list(range(len(messages)))
+        for index in missing:
+            self.append(thread_id, *messages[index])
+        return len(missing)
+
+    def append(self, thread_id: str, message_id: Optional[str], role: str, text: str) -> None:
+        """Add one message to the end of a thread's history (no-op if already added)"""
+        text = strip_quoted_text(text or '')
+        if len(text) > HISTORY_TURN_MAX_CHARS:
+            text = text[:HISTORY_TURN_MAX_CHARS].rsplit(' ', 1)[0] + "..."
+        with self._lock:
+            entry = self.threads.setdefault(thread_id, {'summary': [], 'omitted': 0, 'turns': [], 'message_ids': []})
+            if message_id and message_id in entry['message_ids']:
+                return
+            if message_id:
+                entry['message_ids'].append(message_id)
+            if text:
+                entry['turns'].append({'role': role, 'text': text})
+                self._compact(entry)
+
+    def _compact(self, entry: Dict) -> None:
+        """Fold the oldest turns into the summary until the history fits the budget"""
+        def tokens(lines: List[str]) -> int:
+            return sum(estimate_tokens(line) + 1 for line in lines)
+
+        turns_tokens = sum(estimate_tokens(f"{turn['role']}: {turn['text']}") + 2 for turn in entry['turns'])
+        # Always keep the latest turn verbatim
+        while len(entry['turns']) > 1 and turns_tokens + tokens(entry['summary']) > self.token_budget:
+            turn = entry['turns'].pop(0)
+            turns_tokens -= estimate_tokens(f"{turn['role']}: {turn['text']}") + 2
+            entry['summary'].append(_summary_line(turn))
+            while len(entry['summary']) > 1 and tokens(entry['summary']) > self.summary_budget:
+                entry['summary'].pop(0)
+                entry['omitted'] += 1
+
+    def render(self, thread_id: str) -> str:
+        """The history as prompt text: summary of older messages, then recent ones verbatim"""
+        with self._lock:
+            entry = self.threads.get(thread_id)
+            if not entry:
+                return ""
+            parts = []
+            if entry['summary'] or entry['omitted']:
+                summary = list(entry['summary'])
+                if entry['omitted']:
+                    summary.insert(0, f"- ({entry['omitted']} earlier messages)")
+                parts.append("Earlier in the thread (summarized):\n" + "\n".join(summary))
+            parts.extend(f"{turn['role']}: {turn['text']}" for turn in entry['turns'])
+            return "\n\n".join(parts)
@@ -0,0 +1,570 @@
+"""
+Local stand-in for the AgentMail API, for offline and load testing
+FakeMailbox holds inboxes, threads and messages in memory and injects
+latency, errors and rate limiting per request. It is served two ways:
+FakeAgentMailServer speaks the REST endpoints the app and job agent use
+(point the real SDK at it with AGENTMAIL_BASE_URL=http://host:port), and
+FakeAgentMail is an in-process client with the SDK's attribute surface
+(AGENTMAIL_BASE_URL=inprocess) for benchmarks that shouldn't pay for HTTP.
+Inbound mail is simulated with FakeMailbox.deliver or POST /_fake/deliver.
+
+Usage: python -m utils.fake_agentmail serve [--port 8900] [--latency 0.05] [--error-rate 0.01] ...
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_PAGE_SIZE = 100
+
+class FakeApiError(Exception):
+    """Error response from the fake, shaped like the SDK's ApiError"""
+
+    def __init__(self, status_code: int, body: Any = None):
+        super().__init__(f"status_code: {status_code}, body: {body}")
+        self.status_code = status_code
+        self.body = body
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat().replace('+00:00', 'Z')
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+class FakeMailbox:
+    """In-memory AgentMail data plus per-request latency, error and rate-limit injection"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, seed: Optional[int] = None, domain: str = "agentmail.to"):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per second across all clients
+        self.domain = domain
+        self.random = random.Random(seed)
+        self.inboxes: Dict[str, Dict] = {}
+        self.messages: Dict[str, Dict] = {}
+        self.threads: Dict[str, Dict] = {}
+        self.webhooks: List[Dict] = []
+        self.idempotent_sends: Dict[str, Dict] = {}  # Idempotency-Key -> request and first response
+        self.stats = {'requests': 0, 'errors_injected': 0, 'rate_limited': 0}
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+        self._clock = datetime.now(timezone.utc)
+        self._lock = threading.RLock()
+
+    # Fault injection
+
+    def admit(self) -> None:
+        """Apply latency, then raise FakeApiError for a rate-limited or randomly failed request"""
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate and self.random.random() < self.error_rate
+            limited = False
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    limited = True
+                else:
+                    self._tokens -= 1
+        if delay:
+            time.sleep(delay)
+        if limited:
+            with self._lock:
+                self.stats['rate_limited'] += 1
+            raise FakeApiError(429, {'name': 'RateLimitError', 'message': 'Too many requests'})
+        if fail:
+            with self._lock:
+                self.stats['errors_injected'] += 1
+            raise FakeApiError(500, {'name': 'ServerError', 'message': 'Injected failure'})
+
+    # Data
+
+    def _now(self) -> datetime:
+        """Strictly increasing timestamps so ordering and 'after' filters are deterministic"""
+        now = datetime.now(timezone.utc)
+        self._clock = max(now, self._clock + timedelta(microseconds=1))
+        return self._clock
+
+    def create_inbox(self, username: Optional[str] = None, display_name: Optional[str] = None,
+                     domain: Optional[str] = None, **_) -> Dict:
+        with self._lock:
+            inbox_id = f"{username or uuid.uuid4().hex[:12]}@{domain or self.domain}"
+            if inbox_id in self.inboxes:
+                raise FakeApiError(409, {'name': 'AlreadyExistsError', 'message': f"{inbox_id} already exists"})
+            now = _iso(self._now())
+            inbox = {'inbox_id': inbox_id, 'email': inbox_id, 'pod_id': 'fake-pod', 'display_name': display_name,
+                     'client_id': None, 'updated_at': now, 'created_at': now}
+            self.inboxes[inbox_id] = inbox
+            return dict(inbox)
+
+    def _inbox(self, inbox_id: str) -> Dict:
+        if inbox_id not in self.inboxes:
+            raise FakeApiError(404, {'name': 'NotFoundError', 'message': f"Inbox {inbox_id} not found"})
+        return self.inboxes[inbox_id]
+
+    def _page(self, items: List[Dict], field: str, limit: Optional[int], page_token: Optional[str]) -> Dict:
+        limit = int(limit or DEFAULT_PAGE_SIZE)
+        start = int(page_token or 0)
+        page = items[start:start + limit]
+        return {'count': len(page), 'limit': limit, field: page,
+                'next_page_token': str(start + limit) if start + limit < len(items) else None}
+
+    def _filter(self, items: List[Dict], labels: Any, after: Any, before: Any) -> List[Dict]:
+        labels = _as_list(labels)
+        after, before = _parse_time(after), _parse_time(before)
+        selected = []
+        for item in items:
+            moment = _parse_time(item['timestamp'])
+            if labels and not all(label in item['labels'] for label in labels):
+                continue
+            if (after and moment < after) or (before and moment >= before):
+                continue
+            selected.append(item)
+        # Newest first, like the API
+        return sorted(selected, key=lambda item: item['timestamp'], reverse=True)
+
+    def list_inboxes(self, limit: Optional[int] = None, page_token: Optional[str] = None, **_) -> Dict:
+        with self._lock:
+            inboxes = sorted(self.inboxes.values(), key=lambda inbox: inbox['created_at'], reverse=True)
+            return self._page([dict(inbox) for inbox in inboxes], 'inboxes', limit, page_token)
+
+    def list_messages(self, inbox_id: str, limit: Optional[int] = None, page_token: Optional[str] = None,
+                      labels: Any = None, after: Any = None, before: Any = None, **_) -> Dict:
+        with self._lock:
+            self._inbox(inbox_id)
+            messages = [message for message in self.messages.values() if message['inbox_id'] == inbox_id]
+            items = [self._message_item(message) for message in self._filter(messages, labels, after, before)]
+            return self._page(items, 'messages', limit, page_token)
+
+    def _message_item(self, message: Dict) -> Dict:
+        return {key: value for key, value in message.items() if key not in ('text', 'html')}
+
+    def get_message(self, inbox_id: str, message_id: str) -> Dict:
+        with self._lock:
+            message = self.messages.get(message_id)
+            if not message or message['inbox_id'] != inbox_id:
+                raise FakeApiError(404, {'name': 'NotFoundError', 'message': f"Message {message_id} not found"})
+            return dict(message)
+
+    def _add_message(self, inbox_id: str, thread_id: Optional[str], sender: str, to: List[str],
+                     subject: Optional[str], text: Optional[str], html: Optional[str], labels: List[str],
+                     in_reply_to: Optional[str] = None) -> Dict:
+        now = _iso(self._now())
+        thread_id = thread_id or f"thread-{uuid.uuid4().hex[:16]}"
+        message = {
+            'inbox_id': inbox_id, 'thread_id': thread_id, 'message_id': f"<{uuid.uuid4().hex}@{self.domain}>",
+            'labels': labels, 'timestamp': now, 'from': sender, 'to': to, 'cc': None, 'bcc': None,
+            'subject': subject, 'preview': (text or '')[:100], 'text': text, 'html': html,
+            'attachments': None, 'in_reply_to': in_reply_to, 'references': None,
+            'size': len(text or '') + len(html or ''), 'updated_at': now, 'created_at': now,
+        }
+        self.messages[message['message_id']] = message
+        thread = self.threads.setdefault(thread_id, {
+            'inbox_id': inbox_id, 'thread_id': thread_id, 'message_ids': [], 'subject': subject, 'created_at': now,
+        })
+        thread['message_ids'].append(message['message_id'])
+        return message
+
+    def _thread_item(self, thread: Dict) -> Dict:
+        messages = [self.messages[message_id] for message_id in thread['message_ids']]
+        last = messages[-1]
+        labels = sorted({label for message in messages for label in message['labels']})
+        return {
+            'inbox_id': thread['inbox_id'], 'thread_id': thread['thread_id'], 'labels': labels,
+            'timestamp': last['timestamp'], 'senders': sorted({message['from'] for message in messages}),
+            'recipients': sorted({address for message in messages for address in message['to']}),
+            'subject': thread['subject'], 'preview': last['preview'], 'attachments': None,
+            'last_message_id': last['message_id'], 'message_count': len(messages),
+            'size': sum(message['size'] for message in messages),
+            'updated_at': last['timestamp'], 'created_at': thread['created_at'],
+        }
+
+    def send_message(self, inbox_id: str, to: Any = None, subject: Optional[str] = None, text: Optional[str] = None,
+                     html: Optional[str] = None, labels: Any = None, idempotency_key: Optional[str] = None,
+                     **_) -> Dict:
+        with self._lock:
+            request = ('send', inbox_id, _as_list(to), subject, text, html)
+            replayed = self._replay(idempotency_key, request)
+            if replayed:
+                return replayed
+            self._inbox(inbox_id)
+            message = self._add_message(inbox_id, None, inbox_id, _as_list(to), subject, text, html,
+                                        ['sent'] + _as_list(labels))
+            return self._remember(idempotency_key, request,
+                                  {'message_id': message['message_id'], 'thread_id': message['thread_id']})
+
+    def reply(self, inbox_id: str, message_id: str, text: Optional[str] = None, html: Optional[str] = None,
+              labels: Any = None, idempotency_key: Optional[str] = None, **_) -> Dict:
+        with self._lock:
+            request = ('reply', inbox_id, message_id, text, html)
+            replayed = self._replay(idempotency_key, request)
+            if replayed:
+                return replayed
+            original = self.get_message(inbox_id, message_id)
+            subject = original['subject'] or ''
+            message = self._add_message(
+                inbox_id, original['thread_id'], inbox_id, [original['from']],
+                subject if subject.lower().startswith('re:') else f"Re: {subject}", text, html,
+                ['sent'] + _as_list(labels), in_reply_to=message_id
+            )
+            return self._remember(idempotency_key, request,
+                                  {'message_id': message['message_id'], 'thread_id': message['thread_id']})
+
+    def _replay(self, idempotency_key: Optional[str], request: tuple) -> Optional[Dict]:
+        """The first response for a repeated Idempotency-Key; 409 if the key was used for a different send"""
+        seen = self.idempotent_sends.get(idempotency_key) if idempotency_key else None
+        if seen is None:
+            return None
+        if seen['request'] != request:
+            raise FakeApiError(409, {'name': 'IdempotencyConflictError',
+                                     'message': f"Idempotency key {idempotency_key} was used for a different request"})
+        return dict(seen['response'])
+
+    def _remember(self, idempotency_key: Optional[str], request: tuple, response: Dict) -> Dict:
+        if idempotency_key:
+            self.idempotent_sends[idempotency_key] = {'request': request, 'response': dict(response)}
+        return response
+
+    def update_message(self, inbox_id: str, message_id: str, add_labels: Any = None,
+                       remove_labels: Any = None, **_) -> Dict:
+        with self._lock:
+            self.get_message(inbox_id, message_id)
+            message = self.messages[message_id]
+            removed = set(_as_list(remove_labels))
+            message['labels'] = [label for label in message['labels'] if label not in removed]
+            message['labels'] += [label for label in _as_list(add_labels) if label not in message['labels']]
+            message['updated_at'] = _iso(self._now())
+            return self._message_item(message)
+
+    def list_threads(self, inbox_id: Optional[str] = None, limit: Optional[int] = None,
+                     page_token: Optional[str] = None, labels: Any = None, after: Any = None,
+                     before: Any = None, **_) -> Dict:
+        with self._lock:
+            if inbox_id:
+                self._inbox(inbox_id)
+            items = [self._thread_item(thread) for thread in self.threads.values()
+                     if not inbox_id or thread['inbox_id'] == inbox_id]
+            return self._page(self._filter(items, labels, after, before), 'threads', limit, page_token)
+
+    def get_thread(self, thread_id: str, inbox_id: Optional[str] = None) -> Dict:
+        with self._lock:
+            thread = self.threads.get(thread_id)
+            if not thread or (inbox_id and thread['inbox_id'] != inbox_id):
+                raise FakeApiError(404, {'name': 'NotFoundError', 'message': f"Thread {thread_id} not found"})
+            messages = [dict(self.messages[message_id]) for message_id in thread['message_ids']]
+            return {**self._thread_item(thread), 'count': len(messages), 'messages': messages}
+
+    def create_webhook(self, url: str, event_types: Any = None, inbox_ids: Any = None, **_) -> Dict:
+        with self._lock:
+            now = _iso(self._now())
+            webhook = {'webhook_id': f"webhook-{uuid.uuid4().hex[:12]}", 'url': url,
+                       'event_types': _as_list(event_types), 'inbox_ids': _as_list(inbox_ids),
+                       'secret': uuid.uuid4().hex, 'enabled': True, 'updated_at': now, 'created_at': now}
+            self.webhooks.append(webhook)
+            return dict(webhook)
+
+    def deliver(self, inbox_id: str, sender: str, subject: str, text: str, thread_id: Optional[str] = None) -> Dict:
+        """Simulate inbound mail to inbox_id (creating the inbox if needed); returns the message"""
+        with self._lock:
+            if inbox_id not in self.inboxes:
+                username, _, domain = inbox_id.partition('@')
+                self.create_inbox(username=username, domain=domain or None)
+            message = self._add_message(inbox_id, thread_id, sender, [inbox_id], subject, text, None,
+                                        ['received', 'unread'])
+            return dict(message)
+
+    def seed(self, inboxes: int = 0, inbound_per_inbox: int = 0, sender: str = "hiring@example.com") -> List[str]:
+        """Create inboxes, each with inbound threads; returns the inbox IDs"""
+        inbox_ids = []
+        for index in range(inboxes):
+            inbox_id = f"fake-{index}@{self.domain}"
+            if inbox_id not in self.inboxes:
+                self.create_inbox(username=f"fake-{index}", display_name=f"Fake {index}")
+            for number in range(inbound_per_inbox):
+                self.deliver(inbox_id, sender, f"Opening #{number}", f"Hi, are you interested in role {number}?")
+            inbox_ids.append(inbox_id)
+        return inbox_ids
+
+# In-process client
+
+def _to_object(value: Any) -> Any:
+    """API JSON -> attribute objects like the SDK's models ('from' becomes from_)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{('from_' if key == 'from' else key): _to_object(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_object(item) for item in value]
+    return value
+
+def _call(mailbox: FakeMailbox, method, *args, **kwargs) -> Any:
+    kwargs.pop('request_options', None)
+    mailbox.admit()
+    return _to_object(method(*args, **kwargs))
+
+class _FakeMessages:
+    def __init__(self, mailbox: FakeMailbox):
+        self._mailbox = mailbox
+
+    def list(self, inbox_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.list_messages, inbox_id, **kwargs)
+
+    def get(self, inbox_id, message_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.get_message, inbox_id, message_id, **kwargs)
+
+    def send(self, inbox_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.send_message, inbox_id, **kwargs)
+
+    def reply(self, inbox_id, message_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.reply, inbox_id, message_id, **kwargs)
+
+    def update(self, inbox_id, message_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.update_message, inbox_id, message_id, **kwargs)
+
+class _FakeInboxThreads:
+    def __init__(self, mailbox: FakeMailbox):
+        self._mailbox = mailbox
+
+    def list(self, inbox_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.list_threads, inbox_id, **kwargs)
+
+    def get(self, inbox_id, thread_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.get_thread, thread_id, inbox_id, **kwargs)
+
+class _FakeInboxes:
+    def __init__(self, mailbox: FakeMailbox):
+        self._mailbox = mailbox
+        self.messages = _FakeMessages(mailbox)
+        self.threads = _FakeInboxThreads(mailbox)
+
+    def list(self, **kwargs):
+        return _call(self._mailbox, self._mailbox.list_inboxes, **kwargs)
+
+    def create(self, request=None, **kwargs):
+        # Newer SDKs take the fields wrapped in a CreateInboxRequest
+        if request is not None:
+            fields = request if isinstance(request, dict) else vars(request)
+            kwargs.update({key: value for key, value in fields.items() if value is not None})
+        return _call(self._mailbox, self._mailbox.create_inbox, **kwargs)
+
+class _FakeThreads:
+    def __init__(self, mailbox: FakeMailbox):
+        self._mailbox = mailbox
+
+    def list(self, **kwargs):
+        return _call(self._mailbox, self._mailbox.list_threads, None, **kwargs)
+
+    def get(self, thread_id, **kwargs):
+        return _call(self._mailbox, self._mailbox.get_thread, thread_id, **kwargs)
+
+class _FakeWebhooks:
+    def __init__(self, mailbox: FakeMailbox):
+        self._mailbox = mailbox
+
+    def create(self, **kwargs):
+        return _call(self._mailbox, self._mailbox.create_webhook, **kwargs)
+
+class FakeAgentMail:
+    """In-process client with the parts of the AgentMail SDK surface this repo uses"""
+
+    def __init__(self, mailbox: Optional[FakeMailbox] = None, **_):
+        self.mailbox = mailbox or get_default_mailbox()
+        self.inboxes = _FakeInboxes(self.mailbox)
+        self.threads = _FakeThreads(self.mailbox)
+        self.webhooks = _FakeWebhooks(self.mailbox)
+
+_default_mailbox: Optional[FakeMailbox] = None
+_default_mailbox_lock = threading.Lock()
+
+def get_default_mailbox() -> FakeMailbox:
+    """The process-wide mailbox behind AGENTMAIL_BASE_URL=inprocess"""
+    global _default_mailbox
+    with _default_mailbox_lock:
+        if _default_mailbox is None:
+            _default_mailbox = FakeMailbox()
+        return _default_mailbox
+
+# HTTP server
+
+ROUTES = [
+    ('GET', r'/v0/inboxes', 'list_inboxes'),
+    ('POST', r'/v0/inboxes', 'create_inbox'),
+    ('GET', r'/v0/inboxes/(?P<inbox_id>[^/]+)/messages', 'list_messages'),
+    ('POST', r'/v0/inboxes/(?P<inbox_id>[^/]+)/messages/send', 'send_message'),
+    ('GET', r'/v0/inboxes/(?P<inbox_id>[^/]+)/messages/(?P<message_id>[^/]+)', 'get_message'),
+    ('PATCH', r'/v0/inboxes/(?P<inbox_id>[^/]+)/messages/(?P<message_id>[^/]+)', 'update_message'),
+    ('POST', r'/v0/inboxes/(?P<inbox_id>[^/]+)/messages/(?P<message_id>[^/]+)/reply', 'reply'),
+    ('GET', r'/v0/inboxes/(?P<inbox_id>[^/]+)/threads', 'list_threads'),
+    ('GET', r'/v0/inboxes/(?P<inbox_id>[^/]+)/threads/(?P<thread_id>[^/]+)', 'get_thread'),
+    ('GET', r'/v0/threads', 'list_threads'),
+    ('GET', r'/v0/threads/(?P<thread_id>[^/]+)', 'get_thread'),
+    ('POST', r'/v0/webhooks', 'create_webhook'),
+]
+COMPILED_ROUTES = [(method, re.compile(f"^{pattern}$"), name) for method, pattern, name in ROUTES]
+# Query parameters holding lists, sent repeated or as one JSON array depending on SDK version
+LIST_PARAMS = {'labels'}
+
+def _list_param(values: List[str]) -> List[str]:
+    items = []
+    for value in values:
+        if value.startswith('['):
+            try:
+                items.extend(json.loads(value))
+                continue
+            except ValueError:
+                pass
+        items.append(value)
+    return items
+
+class FakeAgentMailServer:
+    """Serves a FakeMailbox over the AgentMail REST paths; start() with port 0 picks a free port"""
+
+    def __init__(self, mailbox: Optional[FakeMailbox] = None, host: str = "127.0.0.1", port: int = 0):
+        self.mailbox = mailbox or FakeMailbox()
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _make_handler(self):
+        mailbox = self.mailbox
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Any = None):
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                except ValueError:
+                    self._reply(400, {'name': 'ValidationError', 'message': 'Invalid JSON'})
+                    return
+                query = {key: _list_param(values) if key in LIST_PARAMS else values[-1]
+                         for key, values in parse_qs(parsed.query).items()}
+
+                # Test hooks, outside fault injection
+                if parsed.path == '/_fake/deliver' and method == 'POST':
+                    self._reply(200, mailbox.deliver(body['inbox_id'], body.get('from', 'sender@example.com'),
+                                                     body.get('subject', ''), body.get('text', ''),
+                                                     body.get('thread_id')))
+                    return
+                if parsed.path == '/_fake/stats' and method == 'GET':
+                    self._reply(200, mailbox.stats)
+                    return
+
+                for route_method, pattern, name in COMPILED_ROUTES:
+                    match = pattern.match(parsed.path)
+                    if route_method == method and match:
+                        break
+                else:
+                    self._reply(404, {'name': 'NotFoundError', 'message': f"No route {method} {parsed.path}"})
+                    return
+                try:
+                    mailbox.admit()
+                    path_args = {key: unquote(value) for key, value in match.groupdict().items()}
+                    if name == 'get_thread':
+                        result = mailbox.get_thread(path_args['thread_id'], path_args.get('inbox_id'))
+                    else:
+                        idempotency_key = self.headers.get('Idempotency-Key')
+                        if idempotency_key:
+                            body['idempotency_key'] = idempotency_key
+                        result = getattr(mailbox, name)(**path_args, **query, **body)
+                except FakeApiError as e:
+                    self._reply(e.status_code, e.body)
+                    return
+                except (TypeError, KeyError, ValueError) as e:
+                    self._reply(400, {'name': 'ValidationError', 'message': str(e)})
+                    return
+                self._reply(200, result)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeAgentMailServer":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def main(argv):
+    """Run the fake server in the foreground"""
+    parser = argparse.ArgumentParser(prog="python -m utils.fake_agentmail")
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="requests per second before 429s (0: none)")
+    parser.add_argument('--inboxes', type=int, default=0, help="inboxes to create at start")
+    parser.add_argument('--inbound', type=int, default=0, help="inbound threads per seeded inbox")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    mailbox = FakeMailbox(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit=args.rate_limit or None, seed=args.seed)
+    mailbox.seed(args.inboxes, args.inbound)
+    server = FakeAgentMailServer(mailbox, args.host, args.port).start()
+    print(f"Fake AgentMail on {server.url} (set AGENTMAIL_BASE_URL={server.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\nStopped after {mailbox.stats['requests']} requests")
+    finally:
+        server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
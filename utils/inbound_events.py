@@ -0,0 +1,131 @@
+"""
+Event-driven inbound mail for long-running agents
+WebhookReceiver is a small local HTTP server that AgentMail webhooks (or a
+test, with a plain JSON POST) deliver message events to. AdaptivePoller is
+the fallback: while no events arrive the agent polls, and the interval grows
+as the inbox stays idle and snaps back as soon as there is activity.
+"""
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+class AdaptivePoller:
+    """Poll interval that backs off while idle and resets on activity"""
+
+    def __init__(self, min_interval: float, max_interval: float, backoff: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+
+    def record(self, activity: bool) -> float:
+        """Update after a poll; returns the interval to wait before the next one"""
+        if activity:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+class WebhookReceiver:
+    """Queues JSON events POSTed to path; an optional secret must be sent as ?token= or X-Webhook-Token"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8787, path: str = "/webhooks/agentmail",
+                 secret: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.events: "queue.Queue[Dict]" = queue.Queue()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                if parsed.path != receiver.path:
+                    self.send_error(404)
+                    return
+                token = self.headers.get('X-Webhook-Token') or parse_qs(parsed.query).get('token', [None])[0]
+                if receiver.secret and token != receiver.secret:
+                    self.send_error(401)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    event = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self.send_error(400)
+                    return
+                # Acknowledge first; the agent handles the event on its own thread
+                self.send_response(204)
+                self.end_headers()
+                if isinstance(event, dict):
+                    # Arrival time, for measuring how long events wait before a worker starts them
+                    event['_delivered_at'] = time.time()
+                    receiver.events.put(event)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "WebhookReceiver":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        # Port 0 picks a free port
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def wait(self, timeout: float) -> List[Dict]:
+        """Block up to timeout for an event, then return it with any others already queued"""
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+def event_message(event: Dict) -> Optional[Dict]:
+    """The message payload of a message.received event, if that is what the event is"""
+    event_type = event.get('event_type') or event.get('type')
+    if event_type not in (None, 'message.received'):
+        return None
+    message = event.get('message') or event.get('data')
+    return message if isinstance(message, dict) else None
+
+def payload_to_message(value: Any) -> Any:
+    """Webhook JSON -> an attribute object shaped like the SDK's Message ('from' becomes from_)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{('from_' if key == 'from' else key): payload_to_message(item)
+                                  for key, item in value.items()})
+    if isinstance(value, list):
+        return [payload_to_message(item) for item in value]
+    return value
+
+def register_webhook(client, url: str, inbox_ids: List[str], event_types=('message.received',)) -> Optional[str]:
+    """Subscribe url to inbox events; returns the webhook ID, or None if the account can't use webhooks"""
+    try:
+        webhook = client.webhooks.create(url=url, event_types=list(event_types), inbox_ids=inbox_ids)
+    except Exception as e:
+        print(f"Webhook registration failed, falling back to polling: {e}")
+        return None
+    return getattr(webhook, 'webhook_id', getattr(webhook, 'id', None))
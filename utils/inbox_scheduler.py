@@ -0,0 +1,99 @@
+"""
+Fair dispatch of per-inbox work onto one shared worker pool
+Work is queued per inbox and handed to the pool round-robin, so a busy inbox
+can't starve the others. Each inbox has its own concurrency cap and a token
+bucket on how fast its work starts; whatever an inbox can't start this tick
+is left for the next one instead of holding a worker while it waits.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class RateLimiter:
+    """Token bucket: up to per_minute starts a minute, with bursts of up to burst"""
+
+    def __init__(self, per_minute: Optional[float], burst: Optional[int] = None):
+        self.rate = per_minute / 60.0 if per_minute else None
+        self.capacity = float(burst or max(1, int(per_minute or 1)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        if self.rate is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class FairScheduler:
+    """Round-robin over inbox queues with per-inbox concurrency and rate limits"""
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_workers = max_workers
+        self.max_concurrency: Dict[str, int] = {}
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    def configure(self, key: str, max_concurrency: int, per_minute: Optional[float] = None) -> None:
+        self.max_concurrency[key] = max(1, max_concurrency)
+        self.limiters[key] = RateLimiter(per_minute)
+
+    def run(self, queues: Dict[str, List[Any]], handler: Callable[[Any], Any]) -> Tuple[List[Any], Dict[str, int]]:
+        """
+        Run handler over every queued item that the limits allow this tick
+        Returns the handler results and, per inbox, how many items were left
+        over because of its rate limit.
+        """
+        pending = {key: list(items) for key, items in queues.items() if items}
+        in_flight: Dict[Any, str] = {}
+        running = {key: 0 for key in pending}
+        results = []
+        rate_limited = set()
+
+        # Inboxes in turn order; each round resumes after the last inbox served
+        turns = deque(pending)
+
+        while True:
+            # One item per inbox per round, skipping inboxes at their concurrency cap
+            for _ in range(len(turns)):
+                if not turns or len(in_flight) >= self.max_workers:
+                    break
+                key = turns[0]
+                turns.rotate(-1)
+                if running[key] >= self.max_concurrency.get(key, self.max_workers):
+                    continue
+                limiter = self.limiters.get(key)
+                if limiter and not limiter.try_acquire():
+                    rate_limited.add(key)
+                    continue
+                future = self.executor.submit(handler, pending[key].pop(0))
+                in_flight[future] = key
+                running[key] += 1
+                if not pending[key]:
+                    del pending[key]
+                    turns.remove(key)
+
+            # Inboxes out of rate budget wait for the next tick rather than hold up this one
+            dispatchable = [key for key in pending if key not in rate_limited]
+            if not in_flight and not dispatchable:
+                break
+            if in_flight and (len(in_flight) >= self.max_workers or not dispatchable
+                              or all(running[key] >= self.max_concurrency.get(key, self.max_workers)
+                                     for key in dispatchable)):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running[in_flight.pop(future)] -= 1
+                    results.append(future.result())
+
+        return results, {key: len(items) for key, items in pending.items()}
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,374 @@
+"""
+Local SQLite mirror of AgentMail inboxes, threads and messages
+sync_inbox pages through everything created since the inbox's last sync
+(with a small overlap) and fetches full bodies only for messages not mirrored
+yet. Threads with new activity have their messages' labels refreshed, and
+label changes the agent makes itself are written through with update_labels.
+An FTS5 index over subject, body and sender makes search a local query.
+The query methods are what the job agent and the Streamlit app read from
+instead of listing the API every time.
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from config import MAILBOX_DB_PATH
+
+SYNC_PAGE_SIZE = 100
+# Re-list a little before each cursor so clock skew can't hide an item; known IDs are skipped
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# A "quoted phrase" or a bare word, with an optional trailing * for prefix search
+QUERY_TERM_RE = re.compile(r'"([^"]*)"(\*?)|(\S+?)(\*?)(?=\s|$)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inboxes (
+    inbox_id TEXT PRIMARY KEY,
+    display_name TEXT,
+    messages_after TEXT,
+    threads_after TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    inbox_id TEXT NOT NULL,
+    subject TEXT,
+    labels TEXT,
+    last_message_id TEXT,
+    message_count INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS threads_by_inbox ON threads (inbox_id, timestamp);
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    message_id TEXT UNIQUE NOT NULL,
+    thread_id TEXT,
+    inbox_id TEXT NOT NULL,
+    sender TEXT,
+    recipients TEXT,
+    subject TEXT,
+    body TEXT,
+    labels TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_by_thread ON messages (thread_id, timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, body, sender, content='messages', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, body, sender) VALUES (new.rowid, new.subject, new.body, new.sender);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, body, sender)
+    VALUES ('delete', old.rowid, old.subject, old.body, old.sender);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, body, sender)
+    VALUES ('delete', old.rowid, old.subject, old.body, old.sender);
+    INSERT INTO messages_fts (rowid, subject, body, sender) VALUES (new.rowid, new.subject, new.body, new.sender);
+END;
+"""
+
+def _items(response: Any, field: str) -> List[Any]:
+    """List items of an SDK list response, whichever attribute they are under"""
+    return getattr(response, field, None) or getattr(response, 'data', None) or []
+
+def _timestamp(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value else None
+
+def fts_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query that matches every term literally
+    Each word or "quoted phrase" becomes an FTS5 string, so addresses,
+    hyphenated words and stray operators search as text instead of raising
+    a syntax error; a trailing * still searches by prefix.
+    """
+    terms = []
+    for match in QUERY_TERM_RE.finditer(query):
+        phrase, phrase_prefix, word, word_prefix = match.groups()
+        text = phrase if phrase is not None else word
+        if not text.strip():
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + (phrase_prefix or word_prefix or ''))
+    return ' '.join(terms)
+
+def _addresses(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(address) for address in value)
+    return str(value or '')
+
+class MailboxStore:
+    """SQLite mirror of AgentMail data with full-text search"""
+
+    def __init__(self, path: str = MAILBOX_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run while a sync writes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Sync
+
+    def sync_inboxes(self, client) -> List[str]:
+        """Mirror the inbox list (every page); returns the inbox IDs"""
+        inbox_ids = []
+        page_token = None
+        with self._conn() as conn:
+            while True:
+                kwargs = {'limit': SYNC_PAGE_SIZE}
+                if page_token:
+                    kwargs['page_token'] = page_token
+                response = client.inboxes.list(**kwargs)
+                for inbox in _items(response, 'inboxes'):
+                    conn.execute(
+                        "INSERT INTO inboxes (inbox_id, display_name) VALUES (?, ?) "
+                        "ON CONFLICT(inbox_id) DO UPDATE SET display_name = excluded.display_name",
+                        (inbox.inbox_id, getattr(inbox, 'display_name', None))
+                    )
+                    inbox_ids.append(inbox.inbox_id)
+                page_token = getattr(response, 'next_page_token', None)
+                if not page_token:
+                    break
+        return inbox_ids
+
+    def _cursor(self, inbox_id: str, field: str) -> Optional[datetime]:
+        row = self._conn().execute(f"SELECT {field} FROM inboxes WHERE inbox_id = ?", (inbox_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        return datetime.fromisoformat(row[0].replace('Z', '+00:00')) - SYNC_OVERLAP
+
+    def _pages(self, list_method, inbox_id: str, field: str, after: Optional[datetime]):
+        page_token = None
+        while True:
+            kwargs: Dict[str, Any] = {'inbox_id': inbox_id, 'limit': SYNC_PAGE_SIZE}
+            if after:
+                kwargs['after'] = after
+            if page_token:
+                kwargs['page_token'] = page_token
+            response = list_method(**kwargs)
+            yield _items(response, field)
+            page_token = getattr(response, 'next_page_token', None)
+            if not page_token:
+                return
+
+    def sync_inbox(self, client, inbox_id: str) -> Dict[str, int]:
+        """Mirror threads and messages created since the last sync; returns counts of what changed"""
+        stats = {'threads': 0, 'messages': 0, 'fetched': 0, 'relabeled': 0}
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO inboxes (inbox_id) VALUES (?)", (inbox_id,))
+
+        newest_thread = None
+        moved_threads = []
+        for threads in self._pages(client.inboxes.threads.list, inbox_id, 'threads',
+                                   self._cursor(inbox_id, 'threads_after')):
+            stored = {row[0]: row[1] for row in conn.execute(
+                f"SELECT thread_id, timestamp FROM threads WHERE thread_id IN ({','.join('?' * len(threads))})",
+                [thread.thread_id for thread in threads]
+            )} if threads else {}
+            with conn:
+                for thread in threads:
+                    timestamp = _timestamp(getattr(thread, 'timestamp', None))
+                    newest_thread = max(filter(None, [newest_thread, timestamp]), default=None)
+                    if thread.thread_id in stored and stored[thread.thread_id] != timestamp:
+                        moved_threads.append(thread.thread_id)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO threads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (thread.thread_id, inbox_id, getattr(thread, 'subject', None),
+                         json.dumps(list(getattr(thread, 'labels', None) or [])),
+                         getattr(thread, 'last_message_id', None),
+                         getattr(thread, 'message_count', None), timestamp)
+                    )
+                    stats['threads'] += 1
+
+        newest_message = None
+        for messages in self._pages(client.inboxes.messages.list, inbox_id, 'messages',
+                                    self._cursor(inbox_id, 'messages_after')):
+            known = {row[0] for row in conn.execute(
+                f"SELECT message_id FROM messages WHERE message_id IN ({','.join('?' * len(messages))})",
+                [message.message_id for message in messages]
+            )} if messages else set()
+            with conn:
+                for item in messages:
+                    timestamp = _timestamp(getattr(item, 'timestamp', None))
+                    newest_message = max(filter(None, [newest_message, timestamp]), default=None)
+                    labels = json.dumps(list(getattr(item, 'labels', None) or []))
+                    if item.message_id in known:
+                        # Already mirrored: only labels change after delivery
+                        conn.execute("UPDATE messages SET labels = ? WHERE message_id = ? AND labels != ?",
+                                     (labels, item.message_id, labels))
+                        continue
+                    # List items only carry a preview, so new messages are fetched once in full
+                    message = client.inboxes.messages.get(inbox_id=inbox_id, message_id=item.message_id)
+                    stats['fetched'] += 1
+                    self.upsert_message(message, inbox_id, conn)
+                    stats['messages'] += 1
+
+        # Older messages in an active thread aren't listed again, but their labels may have changed
+        for thread_id in moved_threads:
+            stats['relabeled'] += self.refresh_thread_labels(client, inbox_id, thread_id)
+
+        with conn:
+            conn.execute(
+                "UPDATE inboxes SET threads_after = COALESCE(?, threads_after), "
+                "messages_after = COALESCE(?, messages_after), synced_at = ? WHERE inbox_id = ?",
+                (newest_thread, newest_message, time.time(), inbox_id)
+            )
+        return stats
+
+    def refresh_thread_labels(self, client, inbox_id: str, thread_id: str) -> int:
+        """Re-read a thread's message labels from the API; returns how many mirrored messages changed"""
+        thread = client.inboxes.threads.get(inbox_id=inbox_id, thread_id=thread_id)
+        changed = 0
+        with self._conn() as conn:
+            for message in getattr(thread, 'messages', None) or []:
+                labels = json.dumps(list(getattr(message, 'labels', None) or []))
+                changed += conn.execute("UPDATE messages SET labels = ? WHERE message_id = ? AND labels != ?",
+                                        (labels, message.message_id, labels)).rowcount
+        return changed
+
+    def update_labels(self, message_id: str, add: List[str] = (), remove: List[str] = ()) -> None:
+        """Apply a label change made through the API to the mirrored message, if there is one"""
+        conn = self._conn()
+        row = conn.execute("SELECT labels FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        if not row:
+            return
+        labels = [label for label in json.loads(row[0] or '[]') if label not in remove]
+        labels += [label for label in add if label not in labels]
+        with conn:
+            conn.execute("UPDATE messages SET labels = ? WHERE message_id = ?", (json.dumps(labels), message_id))
+
+    def upsert_message(self, message: Any, inbox_id: Optional[str] = None,
+                       conn: Optional[sqlite3.Connection] = None) -> None:
+        """Store one full message (SDK object or event payload namespace)"""
+        conn = conn or self._conn()
+        body = getattr(message, 'text', None) or getattr(message, 'html', None) or getattr(message, 'preview', '')
+        conn.execute(
+            "INSERT INTO messages (message_id, thread_id, inbox_id, sender, recipients, subject, body, labels, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(message_id) DO UPDATE SET "
+            "labels = excluded.labels, body = excluded.body, subject = excluded.subject",
+            (message.message_id, getattr(message, 'thread_id', None),
+             inbox_id or getattr(message, 'inbox_id', None),
+             _addresses(getattr(message, 'from_', None) or getattr(message, 'sender', None)),
+             _addresses(getattr(message, 'to', None)), getattr(message, 'subject', None), body,
+             json.dumps(list(getattr(message, 'labels', None) or [])),
+             _timestamp(getattr(message, 'timestamp', None)))
+        )
+
+    def sync_all(self, client) -> Dict[str, Dict[str, int]]:
+        return {inbox_id: self.sync_inbox(client, inbox_id) for inbox_id in self.sync_inboxes(client)}
+
+    # Queries
+
+    def list_inboxes(self) -> List[Dict]:
+        return [dict(row) for row in self._conn().execute(
+            "SELECT inbox_id, display_name, synced_at FROM inboxes ORDER BY inbox_id")]
+
+    def list_threads(self, inbox_id: str, label: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Newest threads first, optionally only those carrying label"""
+        query = "SELECT * FROM threads WHERE inbox_id = ?"
+        params: List[Any] = [inbox_id]
+        if label:
+            query += " AND EXISTS (SELECT 1 FROM json_each(threads.labels) WHERE value = ?)"
+            params.append(label)
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._conn().execute(query, params)]
+
+    def thread_messages(self, thread_id: str) -> List[Dict]:
+        """A thread's messages, oldest first"""
+        return [dict(row) for row in self._conn().execute(
+            "SELECT message_id, thread_id, inbox_id, sender, recipients, subject, body, labels, timestamp "
+            "FROM messages WHERE thread_id = ? ORDER BY timestamp", (thread_id,))]
+
+    def history_before(self, thread_id: str, message_id: str) -> Optional[List[Dict]]:
+        """
+        A thread's messages before message_id, oldest first
+        Returns None unless message_id is mirrored and the thread has as many
+        messages mirrored as its last listing reported, i.e. nothing is missing.
+        """
+        row = self._conn().execute("SELECT message_count FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        messages = self.thread_messages(thread_id)
+        ids = [message['message_id'] for message in messages]
+        if not row or message_id not in ids or len(messages) < (row[0] or 0):
+            return None
+        return messages[:ids.index(message_id)]
+
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, query: str, inbox_id: Optional[str] = None, limit: int = 20, raw: bool = False) -> List[Dict]:
+        """
+        Full-text search over subject, body and sender, best matches first
+        By default every word or "phrase" in query must appear (see fts_query);
+        raw=True passes query through as FTS5 syntax (OR, NEAR, sender:name, ...).
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT m.message_id, m.thread_id, m.inbox_id, m.sender, m.subject, m.timestamp, "
+            "snippet(messages_fts, 1, '[', ']', ' ... ', 12) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if inbox_id:
+            sql += " AND m.inbox_id = ?"
+            params.append(inbox_id)
+        sql += " ORDER BY bm25(messages_fts) LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def get_stats(self) -> Dict[str, int]:
+        conn = self._conn()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('inboxes', 'threads', 'messages')}
+
+def main(argv):
+    """Small command line: sync the mirror or query it"""
+    if not argv or argv[0] not in ('sync', 'search', 'stats'):
+        print("Usage: python -m utils.mailbox_store sync [INBOX_ID...] | search [--raw] QUERY | stats")
+        return 1
+
+    store = MailboxStore()
+    command, args = argv[0], argv[1:]
+
+    if command == 'sync':
+        from components.agentmail_utils import client
+        started = time.time()
+        results = {inbox_id: store.sync_inbox(client, inbox_id) for inbox_id in args} if args else store.sync_all(client)
+        for inbox_id, stats in results.items():
+            print(f"{inbox_id}: {stats['messages']} new messages, {stats['threads']} threads updated, "
+                  f"{stats['relabeled']} labels refreshed")
+        print(f"Synced {len(results)} inboxes in {time.time() - started:.1f}s")
+    elif command == 'search':
+        raw = bool(args) and args[0] == '--raw'
+        for result in store.search(" ".join(args[1:] if raw else args), raw=raw):
+            print(f"{result['timestamp']}  {result['sender']}  {result['subject']}\n    {result['snippet']}")
+    else:
+        print(", ".join(f"{count} {table}" for table, count in store.get_stats().items()) + f" in {store.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,136 @@
+"""
+Incremental thread sync for AgentMail inboxes
+Keeps a cursor on disk (a high-water mark on thread activity plus the last
+message ID handled per thread) so each tick lists only threads active since
+the previous one, pages through all of them, and fetches just the latest
+message of threads that actually changed instead of every full thread.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+SYNC_PAGE_SIZE = 100
+# Re-list a little before the high-water mark so clock skew can't hide a thread;
+# the per-thread message IDs filter out what was already handled
+SYNC_OVERLAP = timedelta(seconds=60)
+
+def _thread_timestamp(thread) -> Optional[datetime]:
+    for field in ('updated_at', 'timestamp', 'created_at'):
+        value = getattr(thread, field, None)
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                continue
+    return None
+
+class ThreadSync:
+    """Lists changed threads since the last tick and remembers what was handled (inbox_id None: every inbox)"""
+
+    def __init__(self, client, inbox_id: Optional[str], cursor_path: str, labels: Optional[List[str]] = None):
+        self.client = client
+        self.inbox_id = inbox_id
+        self.cursor_path = cursor_path
+        self.labels = labels
+        self.high_water: Optional[datetime] = None
+        self.last_message_ids: Dict[str, str] = {}
+        # Changed threads not handled yet, by ID, with their activity time
+        self.pending: Dict[str, Optional[datetime]] = {}
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.cursor_path):
+            return
+        try:
+            with open(self.cursor_path, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cursor.get('high_water'):
+            self.high_water = datetime.fromisoformat(cursor['high_water'])
+        self.last_message_ids = cursor.get('threads', {})
+
+    def save(self) -> None:
+        """Advance the high-water mark past everything handled and write the cursor"""
+        with self._lock:
+            unhandled = [ts for ts in self.pending.values() if ts is not None]
+            if unhandled:
+                # Never move past a thread that still needs a reply, or the next list would skip it
+                self.high_water = min(unhandled + ([self.high_water] if self.high_water else []))
+            cursor = {
+                'high_water': self.high_water.isoformat() if self.high_water else None,
+                'threads': dict(self.last_message_ids),
+            }
+        directory = os.path.dirname(self.cursor_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        os.replace(tmp_path, self.cursor_path)
+
+    def _list_page(self, page_token: Optional[str]) -> Any:
+        kwargs: Dict[str, Any] = {'limit': SYNC_PAGE_SIZE}
+        if self.labels:
+            kwargs['labels'] = self.labels
+        if self.high_water:
+            kwargs['after'] = self.high_water - SYNC_OVERLAP
+        if page_token:
+            kwargs['page_token'] = page_token
+        self.api_calls += 1
+        return self.client.threads.list(**kwargs)
+
+    def changed_threads(self) -> List[Any]:
+        """Every thread whose latest message differs from the one last handled, across all pages"""
+        changed = []
+        newest = self.high_water
+        with self._lock:
+            # Anything left unhandled last tick is listed again: the high-water mark stayed before it
+            self.pending = {}
+        page_token = None
+        while True:
+            response = self._list_page(page_token)
+            threads = getattr(response, 'threads', None) or getattr(response, 'data', None) or []
+            for thread in threads:
+                thread_id = getattr(thread, 'thread_id', getattr(thread, 'id', None))
+                timestamp = _thread_timestamp(thread)
+                if timestamp and (newest is None or timestamp > newest):
+                    newest = timestamp
+                last_message_id = getattr(thread, 'last_message_id', None)
+                if thread_id is None or (last_message_id and self.last_message_ids.get(thread_id) == last_message_id):
+                    continue
+                changed.append(thread)
+                with self._lock:
+                    self.pending[thread_id] = timestamp
+            page_token = getattr(response, 'next_page_token', None)
+            if not page_token:
+                break
+        with self._lock:
+            if newest:
+                self.high_water = newest
+        return changed
+
+    def latest_message(self, thread) -> Any:
+        """Fetch only the thread's newest message when its ID is known, else the full thread"""
+        thread_id = getattr(thread, 'thread_id', getattr(thread, 'id', None))
+        last_message_id = getattr(thread, 'last_message_id', None)
+        self.api_calls += 1
+        if last_message_id:
+            # Threads listed across the organization carry their own inbox
+            inbox_id = getattr(thread, 'inbox_id', None) or self.inbox_id
+            return self.client.inboxes.messages.get(inbox_id=inbox_id, message_id=last_message_id)
+        thread_details = self.client.threads.get(thread_id)
+        return thread_details.messages[-1] if thread_details.messages else None
+
+    def mark_handled(self, thread_id: str, message_id: Optional[str]) -> None:
+        """Record that a thread's latest message needs nothing more"""
+        with self._lock:
+            self.pending.pop(thread_id, None)
+            if message_id:
+                self.last_message_ids[thread_id] = message_id
@@ -0,0 +1,195 @@
+"""
+Per-message latency tracing for the job agent's reply pipeline
+Each inbound message gets a trace of when it reached each stage (received by
+AgentMail, detected by a poll or webhook, started by a worker, fetched,
+generated, sent, labeled). Finished traces are appended to a JSONL log and
+counted into fixed-bucket histograms of the time between stages, so a
+summary can show where reply latency goes and check an SLO against it.
+
+Usage: python -m utils.pipeline_metrics summary [LOG] [--slo-p95 SECONDS]
+"""
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+STAGES = ['received', 'detected', 'started', 'fetched', 'generated', 'sent', 'labeled']
+# Reported durations: name -> (from stage, to stage)
+DURATIONS = {
+    'detect': ('received', 'detected'),
+    'queue': ('detected', 'started'),
+    'fetch': ('started', 'fetched'),
+    'generate': ('fetched', 'generated'),
+    'send': ('generated', 'sent'),
+    'label': ('sent', 'labeled'),
+    'time_to_reply': ('received', 'sent'),
+}
+# Upper bounds in seconds; the last bucket catches everything slower
+HISTOGRAM_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300]
+
+def to_epoch(value: Any) -> Optional[float]:
+    """Seconds since the epoch from an SDK datetime, ISO string or number"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return None
+
+def durations(stages: Dict[str, float]) -> Dict[str, float]:
+    return {name: stages[end] - stages[start] for name, (start, end) in DURATIONS.items()
+            if start in stages and end in stages}
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Histogram:
+    """Counts per fixed bucket, plus the running count and sum"""
+
+    def __init__(self, buckets: List[float] = HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (inf if it's the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+class PipelineMetrics:
+    """Collects stage timestamps per message and logs finished traces"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.histograms = {name: Histogram() for name in DURATIONS}
+        self.outcomes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def start(self, message_id: Optional[str], inbox_id: Optional[str], source: str,
+              received: Any = None, detected: Optional[float] = None) -> Dict:
+        """New trace for a message; received is the message's own timestamp"""
+        trace = {'message_id': message_id, 'inbox_id': inbox_id, 'source': source, 'stages': {}}
+        received_at = to_epoch(received)
+        if received_at is not None:
+            trace['stages']['received'] = received_at
+        trace['stages']['detected'] = detected or time.time()
+        return trace
+
+    def mark(self, trace: Optional[Dict], stage: str, **fields) -> None:
+        """Stamp a stage (and attach any extra fields, e.g. the message ID once known)"""
+        if trace is None:
+            return
+        trace['stages'][stage] = time.time()
+        trace.update(fields)
+
+    def finish(self, trace: Optional[Dict], outcome: str) -> None:
+        """Record a trace's outcome; only replied traces feed the histograms"""
+        if trace is None:
+            return
+        trace['outcome'] = outcome
+        trace['durations'] = durations(trace['stages'])
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if outcome == 'replied':
+                for name, value in trace['durations'].items():
+                    self.histograms[name].observe(value)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(trace) + "\n")
+
+    def status_line(self) -> str:
+        """One-line live view: replies so far and bucketed p50/p95 time to reply"""
+        with self._lock:
+            histogram = self.histograms['time_to_reply']
+            if not histogram.count:
+                return f"Outcomes: {self.outcomes or 'none yet'}"
+            return (f"Replies: {histogram.count}, time to reply p50 <= {histogram.quantile(0.5)}s, "
+                    f"p95 <= {histogram.quantile(0.95)}s")
+
+def load_traces(path: str) -> List[Dict]:
+    traces = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+    return traces
+
+def summarize(traces: List[Dict]) -> Dict[str, Dict]:
+    """Exact percentiles per duration over replied traces, plus outcome counts"""
+    replied = [trace for trace in traces if trace.get('outcome') == 'replied']
+    summary = {'outcomes': {}}
+    for trace in traces:
+        summary['outcomes'][trace.get('outcome')] = summary['outcomes'].get(trace.get('outcome'), 0) + 1
+    for name in DURATIONS:
+        values = [trace['durations'][name] for trace in replied if name in trace.get('durations', {})]
+        summary[name] = {
+            'count': len(values),
+            'mean': sum(values) / len(values) if values else None,
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': max(values) if values else None,
+        }
+    return summary
+
+def main(argv):
+    """Print where reply latency goes; exits 2 if --slo-p95 is given and missed"""
+    if not argv or argv[0] != 'summary':
+        print("Usage: python -m utils.pipeline_metrics summary [LOG] [--slo-p95 SECONDS]")
+        return 1
+    args = argv[1:]
+    slo = None
+    if '--slo-p95' in args:
+        index = args.index('--slo-p95')
+        slo = float(args[index + 1])
+        args = args[:index] + args[index + 2:]
+    path = args[0] if args else os.path.join('data', 'job_metrics.jsonl')
+
+    summary = summarize(load_traces(path))
+    print(f"Outcomes: {summary['outcomes']}")
+    print(f"{'stage':<15}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name in DURATIONS:
+        stats = summary[name]
+        cells = "".join(f"{value:>9.3f}" if value is not None else f"{'-':>9}"
+                        for value in (stats['mean'], stats['p50'], stats['p95'], stats['p99'], stats['max']))
+        print(f"{name:<15}{stats['count']:>7}{cells}")
+
+    if slo is not None:
+        p95 = summary['time_to_reply']['p95']
+        met = p95 is not None and p95 <= slo
+        print(f"SLO p95 time to reply <= {slo}s: {'met' if met else 'MISSED'} (p95 = {p95 if p95 is not None else 'n/a'})")
+        return 0 if met else 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,97 @@
+"""
+Compact contact context for AI prompts
+Turns a contact (including its raw JSON import) into a short, deduplicated
+key/value block that fits a fixed token budget, instead of the dict's repr.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from config import PROMPT_CONTEXT_TOKEN_BUDGET, PROMPT_CONTEXT_MAX_VALUE_CHARS
+
+# Fields already spelled out in every prompt's "Recipient Details"
+CORE_FIELDS = ('name', 'email', 'company', 'title')
+
+# Most useful fields first; anything not listed ranks after these
+FIELD_PRIORITY = [
+    'department', 'team', 'location', 'city', 'industry', 'seniority',
+    'years_experience', 'experience', 'skills', 'specialties', 'focus',
+    'hiring_for', 'open_roles', 'interests', 'school', 'education',
+    'bio', 'summary', 'about', 'headline', 'notes', 'info', 'linkedin',
+]
+FIELD_RANK = {field: rank for rank, field in enumerate(FIELD_PRIORITY)}
+
+# Keys that are almost never useful to the model
+SKIPPED_FIELDS = {'id', '_id', 'uuid', 'created_at', 'updated_at', 'timestamp', 'source', 'phone', 'photo', 'avatar'}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+def flatten_json(data: Any, prefix: str = "") -> List[Tuple[str, str]]:
+    """Flatten nested JSON into (dotted key, text value) pairs"""
+    items = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            items.extend(flatten_json(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, list):
+        if all(not isinstance(value, (dict, list)) for value in data):
+            text = ", ".join(str(value) for value in data if value not in (None, ""))
+            if text:
+                items.append((prefix, text))
+        else:
+            for index, value in enumerate(data):
+                items.extend(flatten_json(value, f"{prefix}.{index}"))
+    elif data not in (None, ""):
+        items.append((prefix, " ".join(str(data).split())))
+    return items
+
+def _field_rank(key: str) -> int:
+    leaf = key.rsplit('.', 1)[-1].lower()
+    return FIELD_RANK.get(leaf, len(FIELD_PRIORITY))
+
+def _format_key(key: str) -> str:
+    return key.replace('_', ' ').replace('.', ' ').strip().title()
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(' ', 1)[0]
+    return f"{cut}..."
+
+def serialize_contact_context(contact: Optional[Dict[str, Any]],
+                              token_budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+                              max_value_chars: int = PROMPT_CONTEXT_MAX_VALUE_CHARS) -> str:
+    """
+    Build a "- Key: value" block of the contact's extra fields
+    Core fields and values already shown are dropped, remaining fields are
+    ranked by usefulness, long values are cut, and lines stop at the budget.
+    """
+    if not contact:
+        return ""
+
+    original_data = contact.get('original_data') or {}
+    seen_values = {str(contact.get(field, '')).strip().lower() for field in CORE_FIELDS}
+    seen_values.discard('')
+
+    candidates = []
+    for position, (key, value) in enumerate(flatten_json(original_data)):
+        leaf = key.rsplit('.', 1)[-1].lower()
+        if leaf in CORE_FIELDS or leaf in SKIPPED_FIELDS:
+            continue
+        normalized = value.lower()
+        # Aliased fields (e.g. "full_name" next to "name") repeat a value already shown
+        if normalized in seen_values:
+            continue
+        seen_values.add(normalized)
+        # Stable ordering: priority rank, then shorter (denser) values, then input order
+        candidates.append((_field_rank(key), len(value), position, key, value))
+
+    lines = []
+    used_tokens = 0
+    for _, _, _, key, value in sorted(candidates):
+        line = f"- {_format_key(key)}: {_truncate(value, max_value_chars)}"
+        line_tokens = estimate_tokens(line) + 1
+        if used_tokens + line_tokens > token_budget:
+            continue
+        lines.append(line)
+        used_tokens += line_tokens
+
+    return "\n".join(lines)
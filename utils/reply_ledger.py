@@ -0,0 +1,121 @@
+"""
+Durable ledger of which inbound messages have been replied to
+Before generating a reply an agent claims the message; the claim is a single
+SQLite transaction, so of several workers, processes or restarts exactly one
+wins it. The send and the label update are recorded as they happen, so after
+a crash a sent-but-unlabeled message only gets its labels fixed instead of a
+second reply. A claim whose worker died is taken over after a lease expires;
+a crash between the send and mark_sent is covered by the send's idempotency
+key, which makes the API refuse a second reply to the same message.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+REPLY_CLAIM_LEASE_SECONDS = 300
+
+# Reply states, in order
+CLAIMED = 'claimed'
+SENT = 'sent'
+LABELED = 'labeled'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    message_id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    state TEXT NOT NULL,
+    owner TEXT,
+    reply_id TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class ReplyLedger:
+    """Message ID -> reply state, shared safely by threads and processes"""
+
+    def __init__(self, path: str, owner: Optional[str] = None, lease_seconds: float = REPLY_CLAIM_LEASE_SECONDS):
+        self.path = path
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; claim() opens its own write transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, message_id: str, thread_id: Optional[str] = None) -> str:
+        """
+        Try to take the right to reply to message_id
+        Returns CLAIMED if this worker now owns it. Otherwise returns the
+        state that stopped it: SENT or LABELED (already answered) or
+        'busy' (another worker holds a live claim).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state, owner, updated_at FROM replies WHERE message_id = ?",
+                               (message_id,)).fetchone()
+            if row is not None:
+                if row['state'] in (SENT, LABELED):
+                    conn.execute("COMMIT")
+                    return row['state']
+                if row['state'] == CLAIMED and now - row['updated_at'] < self.lease_seconds:
+                    conn.execute("COMMIT")
+                    return 'busy'
+            conn.execute(
+                "INSERT INTO replies (message_id, thread_id, state, owner, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?) ON CONFLICT(message_id) DO UPDATE SET "
+                "state = excluded.state, owner = excluded.owner, error = NULL, "
+                "attempts = replies.attempts + 1, updated_at = excluded.updated_at",
+                (message_id, thread_id, CLAIMED, self.owner, now)
+            )
+            conn.execute("COMMIT")
+            return CLAIMED
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _set(self, message_id: str, state: str, **fields) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE replies SET state = ?, updated_at = ?{', ' + columns if columns else ''} WHERE message_id = ?",
+            (state, time.time(), *fields.values(), message_id)
+        )
+
+    def mark_sent(self, message_id: str, reply_id: Optional[str]) -> None:
+        self._set(message_id, SENT, reply_id=reply_id)
+
+    def mark_labeled(self, message_id: str) -> None:
+        self._set(message_id, LABELED)
+
+    def mark_failed(self, message_id: str, error: str = "") -> None:
+        """Release a claim whose reply was not sent, so the next poll can retry it"""
+        self._set(message_id, FAILED, error=error[:500])
+
+    def get(self, message_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM replies WHERE message_id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_stats(self) -> Dict[str, int]:
+        return {row['state']: row['count'] for row in self._conn().execute(
+            "SELECT state, COUNT(*) AS count FROM replies GROUP BY state")}
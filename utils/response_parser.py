@@ -0,0 +1,78 @@
+"""
+Parsing of model responses into an email subject and body
+Handles JSON-mode output (optionally wrapped in a code fence) and the
+SUBJECT:/BODY: text format in one pass, tolerating markdown bold, headings,
+lowercase labels and the subject and body sharing a line. Labels count only at
+the start of a line, so "body:" inside a sentence is left alone. Whitespace inside
+the body is left alone so paragraphs survive.
+"""
+import json
+import re
+from typing import Dict, Optional
+
+# JSON schema for backends with structured output
+EMAIL_RESPONSE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'subject': {'type': 'STRING'},
+        'body': {'type': 'STRING'},
+    },
+    'required': ['subject', 'body'],
+}
+
+CODE_FENCE_RE = re.compile(r'^\s*```[a-zA-Z]*\s*\n(.*?)\n?\s*```\s*$', re.DOTALL)
+# "SUBJECT:", "**Subject:**", "## Body:" ... at the start of a line, after optional markdown
+FIELD_LABEL_RE = re.compile(r'^[#*_ \t]*\b(subject|body)\b[*_ \t]*:[*_]*[ \t]*', re.IGNORECASE | re.MULTILINE)
+# The same labels mid-line; only consulted for a body sharing the subject's line ("SUBJECT: Hi BODY: ...")
+INLINE_LABEL_RE = re.compile(r'(?<=\s)[*_]*\b(body)\b[*_ \t]*:[*_]*[ \t]*', re.IGNORECASE)
+SUBJECT_WRAPPER_RE = re.compile(r'^[\s"\'*_\[]+|[\s"\'*_\]]+$')
+
+def _parse_json(content: str) -> Optional[Dict[str, str]]:
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    fields = {str(key).lower(): value for key, value in data.items()}
+    if not isinstance(fields.get('body'), str):
+        return None
+    return {'subject': str(fields.get('subject') or '').strip(), 'body': fields['body'].strip()}
+
+def parse_email_response(content: str) -> Optional[Dict[str, str]]:
+    """
+    Split a model response into {'subject', 'body'}
+    Returns None when no body can be identified; the subject is '' if the
+    response had none.
+    """
+    if not content:
+        return None
+    fenced = CODE_FENCE_RE.match(content)
+    if fenced:
+        content = fenced.group(1)
+    if content.lstrip().startswith('{'):
+        parsed = _parse_json(content)
+        if parsed:
+            return parsed
+
+    labels = list(FIELD_LABEL_RE.finditer(content))
+    body_label = next((label for label in labels if label.group(1).lower() == 'body'), None)
+    subject_label = next((label for label in labels if label.group(1).lower() == 'subject'
+                          and (body_label is None or label.start() < body_label.start())), None)
+    if body_label is None:
+        # No line-start BODY: the body can only follow the subject on its own line
+        if subject_label is None:
+            return None
+        line_end = content.find('\n', subject_label.end())
+        body_label = INLINE_LABEL_RE.search(content, subject_label.end(), len(content) if line_end == -1 else line_end)
+        if body_label is None:
+            return None
+    # Everything after the BODY: label is body, even if it mentions "subject:" again
+    subject = content[subject_label.end():body_label.start()].strip().split('\n', 1)[0] if subject_label else ''
+    return {
+        'subject': SUBJECT_WRAPPER_RE.sub('', subject),
+        'body': content[body_label.end():].strip(),
+    }
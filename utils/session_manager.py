@@ -17,12 +17,62 @@ def init_session_state():
     
     if 'sender_info' not in st.session_state:
         st.session_state.sender_info = ""
+    
+    if 'segment_count' not in st.session_state:
+        st.session_state.segment_count = 0
+    
+    if 'auto_approve_passing' not in st.session_state:
+        st.session_state.auto_approve_passing = False
+    
+    if 'hedge_requests' not in st.session_state:
+        st.session_state.hedge_requests = False
 
-def reset_email_data():
-    """Reset email generation data"""
+def reset_email_data(keep_previous=True):
+    """Reset email generation data, by default keeping it so unchanged emails can be reused"""
     st.session_state.email_data_generated = False
     if 'email_data' in st.session_state:
+        st.session_state.previous_email_data = st.session_state.email_data if keep_previous else []
         del st.session_state.email_data
+    elif not keep_previous:
+        st.session_state.previous_email_data = []
+    clear_sample_stage()
+    clear_generation_retry_queue()
+
+def start_sample_stage(email_config, remaining_recipients):
+    """Remember the settings and recipients still to generate once the sample is approved"""
+    st.session_state.sample_stage = {
+        'email_config': email_config,
+        'remaining_recipients': remaining_recipients
+    }
+
+def get_sample_stage():
+    """Get the pending sample stage, or None if generation is not waiting on a sample review"""
+    return st.session_state.get('sample_stage')
+
+def clear_sample_stage():
+    """Leave sample review mode"""
+    if 'sample_stage' in st.session_state:
+        del st.session_state.sample_stage
+
+def set_generation_retry_queue(recipients, email_config):
+    """Remember recipients whose generation failed every attempt, with the settings to retry them"""
+    st.session_state.generation_retry_queue = {
+        'recipients': list(recipients),
+        'email_config': email_config
+    }
+
+def get_generation_retry_queue():
+    """Get the pending retry queue, or None if nothing failed"""
+    return st.session_state.get('generation_retry_queue')
+
+def clear_generation_retry_queue():
+    """Drop the retry queue"""
+    if 'generation_retry_queue' in st.session_state:
+        del st.session_state.generation_retry_queue
+
+def get_previous_email_data():
+    """Get email data from before the last reset, for incremental regeneration"""
+    return st.session_state.get('previous_email_data', [])
 
 def get_email_data():
     """Get current email data from session state"""
@@ -33,6 +83,12 @@ def set_email_data(email_data):
     st.session_state.email_data = email_data
     st.session_state.email_data_generated = True
 
+def save_partial_email_data(partial_email_data):
+    """Merge emails finished by an interrupted run into the session, replacing same-recipient entries"""
+    merged = {email['recipient']: email for email in get_email_data()} if is_email_data_generated() else {}
+    merged.update({email['recipient']: email for email in partial_email_data})
+    set_email_data(list(merged.values()))
+
 def is_email_data_generated():
     """Check if email data has been generated"""
     return st.session_state.get('email_data_generated', False) and 'email_data' in st.session_state
@@ -46,3 +102,10 @@ def mark_email_sent(index):
     """Mark email as sent"""
     if 'email_data' in st.session_state and index < len(st.session_state.email_data):
         st.session_state.email_data[index]['sent'] = True
+
+def mark_recipients_sent(recipients):
+    """Mark the emails for the given recipients as sent"""
+    sent = set(recipients)
+    for email_info in st.session_state.get('email_data', []):
+        if email_info['recipient'] in sent:
+            email_info['sent'] = True
@@ -0,0 +1,351 @@
+"""
+Suppression list for unsubscribed and bounced addresses
+Backed by a plain text file (one address per line). Two files are derived
+from it and kept next to it: a Bloom filter loaded via mmap, which answers
+most lookups, and an indexed SQLite copy that settles the filter's 'maybe'
+answers. Neither puts the list itself in memory, so multi-million-entry lists
+start instantly and stay on disk. Adds update both files in place.
+
+Usage: python -m utils.suppression add|import|check|stats ...
+"""
+import mmap
+import math
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import zlib
+from typing import Iterable, Iterator, Optional
+from config import SUPPRESSION_LIST_PATH, SUPPRESSION_BLOOM_FP_RATE
+
+BLOOM_MAGIC = b'MAB2'
+# magic, number of hash functions, number of bits, entries sized for, entries added
+BLOOM_HEADER = struct.Struct('<4sIQQQ')
+MIN_BLOOM_BITS = 1024
+# Filters are sized for this multiple of the list, so adds set bits in place and only
+# a list that outgrows its filter triggers a full rebuild (amortized O(1) per address)
+BLOOM_HEADROOM = 2
+
+def normalize_email(email: str) -> str:
+    """Normalize an address for suppression matching"""
+    return email.strip().lower()
+
+def _bloom_hashes(key: str):
+    """
+    Return the two base hashes used for double hashing
+    Two CRC32s (forward and reversed bytes) are C-speed and hold the configured
+    false positive rate for address-shaped keys, unlike a cryptographic digest
+    whose setup cost dominated every lookup.
+    """
+    data = key.encode('utf-8')
+    return zlib.crc32(data), zlib.crc32(data[::-1]) | 1
+
+class BloomFilter:
+    """Fixed-size Bloom filter stored as a flat bit array behind a small header"""
+
+    def __init__(self, num_bits: int, num_hashes: int, capacity: int, count: int = 0, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.capacity = capacity
+        self.count = count
+        # bytearray while building, writable mmap once loaded from disk
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self._offset = BLOOM_HEADER.size if isinstance(self.bits, mmap.mmap) else 0
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float) -> 'BloomFilter':
+        """Size a filter for the expected number of entries and false positive rate"""
+        capacity = max(capacity, 1)
+        num_bits = max(MIN_BLOOM_BITS, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes, capacity)
+
+    def add(self, key: str) -> None:
+        h1, h2 = _bloom_hashes(key)
+        bits, offset = self.bits, self._offset
+        for i in range(self.num_hashes):
+            index = (h1 + i * h2) % self.num_bits
+            bits[offset + (index >> 3)] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        # Same probes as _bloom_hashes, but most negatives stop at the first bit,
+        # so the second hash is only computed once that bit is set
+        data = key.encode('utf-8')
+        h1 = zlib.crc32(data)
+        bits, offset, num_bits = self.bits, self._offset, self.num_bits
+        index = h1 % num_bits
+        if not bits[offset + (index >> 3)] & (1 << (index & 7)):
+            return False
+        h2 = zlib.crc32(data[::-1]) | 1
+        for i in range(1, self.num_hashes):
+            index = (h1 + i * h2) % num_bits
+            if not bits[offset + (index >> 3)] & (1 << (index & 7)):
+                return False
+        return True
+
+    def has_room(self, extra: int) -> bool:
+        """Whether extra more entries fit without exceeding the sized capacity"""
+        return self.count + extra <= self.capacity
+
+    def _header(self) -> bytes:
+        return BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_hashes, self.num_bits, self.capacity, self.count)
+
+    def save(self, path: str) -> None:
+        """Write the filter atomically so readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._header())
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def flush(self, path: str) -> None:
+        """Persist bits set in place on a loaded filter, and mark the file as updated"""
+        self.bits[:BLOOM_HEADER.size] = self._header()
+        self.bits.flush()
+        # mmap writes do not reliably bump the mtime that freshness checks compare
+        os.utime(path)
+
+    def close(self) -> None:
+        if isinstance(self.bits, mmap.mmap):
+            self.bits.close()
+
+    @classmethod
+    def load(cls, path: str) -> Optional['BloomFilter']:
+        """Memory-map a saved filter, or return None if the file is missing or malformed"""
+        try:
+            with open(path, 'r+b') as f:
+                bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE)
+        except (OSError, ValueError):
+            return None
+
+        if len(bits) < BLOOM_HEADER.size:
+            bits.close()
+            return None
+        magic, num_hashes, num_bits, capacity, count = BLOOM_HEADER.unpack_from(bits)
+        if magic != BLOOM_MAGIC or len(bits) < BLOOM_HEADER.size + (num_bits + 7) // 8:
+            bits.close()
+            return None
+        return cls(num_bits, num_hashes, capacity, count, bits)
+
+class SuppressionList:
+    """Bloom filter in front of an on-disk index of addresses that must never be contacted"""
+
+    def __init__(self, path: str = SUPPRESSION_LIST_PATH, fp_rate: float = SUPPRESSION_BLOOM_FP_RATE):
+        self.path = path
+        self.bloom_path = f"{path}.bloom"
+        self.index_path = f"{path}.db"
+        self.fp_rate = fp_rate
+        self._bloom: Optional[BloomFilter] = None
+        self._index: Optional[sqlite3.Connection] = None
+        # One connection shared by Streamlit's script threads; also guards swapping the filter
+        self._lock = threading.Lock()
+        # Counters for reporting how much work the list saved
+        self.checks = 0
+        self.hits = 0
+        self.bloom_false_positives = 0
+        self._loaded_mtime = None
+        self._load()
+
+    def _list_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _is_fresh(self, path: str) -> bool:
+        return os.path.exists(path) and os.path.getmtime(path) >= self._loaded_mtime
+
+    def _load(self) -> None:
+        """Use the persisted filter and index if they are newer than the list, otherwise rebuild them"""
+        self._loaded_mtime = self._list_mtime()
+        if self._loaded_mtime is None:
+            self._set_bloom(None)
+            return
+
+        if self._is_fresh(self.bloom_path) and self._is_fresh(self.index_path):
+            bloom = BloomFilter.load(self.bloom_path)
+            if bloom is not None:
+                self._set_bloom(bloom)
+                self._open_index()
+                return
+        self.rebuild()
+
+    def _set_bloom(self, bloom: Optional[BloomFilter]) -> None:
+        """Swap in a filter and unmap the one it replaces"""
+        with self._lock:
+            previous, self._bloom = self._bloom, bloom
+        if previous is not None and previous is not bloom:
+            previous.close()
+
+    def _open_index(self) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+            self._index = sqlite3.connect(self.index_path, check_same_thread=False)
+
+    def _iter_list(self) -> Iterator[str]:
+        """Stream normalized addresses from the text list"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                email = normalize_email(line)
+                if email and not email.startswith('#'):
+                    yield email
+
+    def _in_index(self, key: str) -> bool:
+        if self._index is None:
+            return False
+        with self._lock:
+            return self._index.execute("SELECT 1 FROM suppressed WHERE email = ?", (key,)).fetchone() is not None
+
+    def reload_if_changed(self) -> None:
+        """Pick up entries added by another process (e.g. the command line below)"""
+        if self._list_mtime() != self._loaded_mtime:
+            self._load()
+
+    def rebuild(self) -> None:
+        """Rebuild and persist the Bloom filter and the index from the text list, streaming it twice"""
+        count = sum(1 for _ in self._iter_list())
+        bloom = BloomFilter.for_capacity(count * BLOOM_HEADROOM, self.fp_rate)
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        tmp_index = f"{self.index_path}.tmp"
+        if os.path.exists(tmp_index):
+            os.remove(tmp_index)
+        conn = sqlite3.connect(tmp_index)
+        conn.execute("CREATE TABLE suppressed (email TEXT PRIMARY KEY) WITHOUT ROWID")
+
+        def keys():
+            for email in self._iter_list():
+                bloom.add(email)
+                yield (email,)
+
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO suppressed VALUES (?)", keys())
+        # Duplicates set no new bits, so only distinct addresses count against capacity
+        bloom.count = conn.total_changes
+        conn.close()
+        os.replace(tmp_index, self.index_path)
+        bloom.save(self.bloom_path)
+        self._open_index()
+        self._set_bloom(BloomFilter.load(self.bloom_path))
+
+    def is_suppressed(self, email: str) -> bool:
+        """
+        Check an address against the list
+        Negatives are answered by the mmap'd Bloom filter alone; only its rare
+        'maybe' answers cost an indexed lookup on disk.
+        """
+        self.checks += 1
+        bloom = self._bloom
+        if bloom is None:
+            return False
+        key = normalize_email(email)
+        try:
+            maybe = key in bloom
+        except ValueError:
+            # Another thread swapped in a reloaded filter and unmapped this one mid-lookup
+            bloom = self._bloom
+            maybe = bloom is not None and key in bloom
+        if not maybe:
+            return False
+        if not self._in_index(key):
+            self.bloom_false_positives += 1
+            return False
+        self.hits += 1
+        return True
+
+    __contains__ = is_suppressed
+
+    def add(self, emails: Iterable[str]) -> int:
+        """
+        Append addresses to the persistent list and return how many were new
+        New addresses go into the existing index and filter in place; the filter
+        is only rebuilt once the list outgrows the capacity it was sized for.
+        """
+        new_emails = []
+        seen = set()
+        for email in emails:
+            key = normalize_email(email)
+            if key and key not in seen and not (self._bloom is not None and key in self._bloom
+                                                and self._in_index(key)):
+                seen.add(key)
+                new_emails.append(key)
+
+        if not new_emails:
+            return 0
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(new_emails) + '\n')
+        self._loaded_mtime = self._list_mtime()
+
+        bloom = self._bloom
+        if bloom is None or self._index is None or not bloom.has_room(len(new_emails)):
+            self.rebuild()
+            return len(new_emails)
+
+        # The list is written first, so a crash part way leaves the filter and index older than it
+        with self._lock:
+            with self._index:
+                self._index.executemany("INSERT OR IGNORE INTO suppressed VALUES (?)",
+                                        ((email,) for email in new_emails))
+            for email in new_emails:
+                bloom.add(email)
+            bloom.flush(self.bloom_path)
+        return len(new_emails)
+
+    def __len__(self) -> int:
+        if self._index is None:
+            return 0
+        with self._lock:
+            return self._index.execute("SELECT COUNT(*) FROM suppressed").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """Return lookup counters"""
+        return {
+            'checks': self.checks,
+            'suppressed': self.hits,
+            'bloom_false_positives': self.bloom_false_positives,
+        }
+
+_suppression_list: Optional[SuppressionList] = None
+
+def get_suppression_list() -> SuppressionList:
+    """Return the process-wide suppression list, loading it on first use"""
+    global _suppression_list
+    if _suppression_list is None:
+        _suppression_list = SuppressionList()
+    else:
+        _suppression_list.reload_if_changed()
+    return _suppression_list
+
+def main(argv):
+    """Small command line for maintaining the list"""
+    if not argv or argv[0] not in ('add', 'import', 'check', 'stats'):
+        print("Usage: python -m utils.suppression add EMAIL... | import FILE | check EMAIL... | stats")
+        return 1
+
+    suppression_list = get_suppression_list()
+    command, args = argv[0], argv[1:]
+
+    if command == 'add':
+        print(f"Added {suppression_list.add(args)} addresses to {suppression_list.path}")
+    elif command == 'import':
+        from utils.validators import iter_emails
+        added = 0
+        for file_path in args:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                added += suppression_list.add(iter_emails(f.read()))
+        print(f"Imported {added} addresses into {suppression_list.path}")
+    elif command == 'check':
+        for email in args:
+            print(f"{email}: {'suppressed' if suppression_list.is_suppressed(email) else 'ok'}")
+    else:
+        print(f"{len(suppression_list)} suppressed addresses in {suppression_list.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,116 @@
+"""
+Compiled mail-merge templates for regular emails
+Templates are parsed once into literal/field segments and then rendered per
+contact without any further parsing.
+
+Syntax:
+    {name}              value of the contact's "name" field
+    {company|our team}  value of "company", or "our team" if it is missing
+    {{ and }}           literal braces
+Anything else in braces (e.g. "{ }" or "{a b}") is kept as literal text.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FIELD_RE = re.compile(r'\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)(?:\|([^{}]*))?\}')
+
+# Used when a field is missing and the template gives no inline default
+DEFAULT_FIELD_VALUES = {
+    'name': 'there',
+    'company': 'your company',
+    'title': 'Professional',
+}
+
+class CompiledTemplate:
+    """A template parsed into alternating literal and field segments"""
+
+    def __init__(self, source: str):
+        self.source = source or ""
+        # Each segment is (literal, field, default); field is None for a pure literal
+        self.segments: List[Tuple[str, Optional[str], Optional[str]]] = []
+        self._parse()
+        self.fields = tuple(dict.fromkeys(field for _, field, _ in self.segments if field))
+        # Fields that have no inline default and so must come from the contact
+        self.required_fields = tuple(dict.fromkeys(
+            field for _, field, default in self.segments if field and default is None
+        ))
+
+    def _parse(self) -> None:
+        literal = []
+        position = 0
+        for match in FIELD_RE.finditer(self.source):
+            literal.append(self.source[position:match.start()])
+            position = match.end()
+            token = match.group()
+            if token == '{{':
+                literal.append('{')
+            elif token == '}}':
+                literal.append('}')
+            else:
+                self.segments.append((''.join(literal), match.group(1), match.group(2)))
+                literal = []
+        literal.append(self.source[position:])
+        self.segments.append((''.join(literal), None, None))
+
+    @property
+    def is_static(self) -> bool:
+        """True if the template has no fields, so every recipient gets the same text"""
+        return not self.fields
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """Render the template for one contact's flattened field values"""
+        parts = []
+        append = parts.append
+        get = values.get
+        for literal, field, default in self.segments:
+            append(literal)
+            if field is not None:
+                value = get(field)
+                if value in (None, ""):
+                    value = default if default is not None else DEFAULT_FIELD_VALUES.get(field, "")
+                append(str(value))
+        return ''.join(parts)
+
+    def missing_fields(self, values: Dict[str, Any]) -> List[str]:
+        """Return required fields this contact has no value for"""
+        return [field for field in self.required_fields if values.get(field) in (None, "")]
+
+def compile_template(source: str) -> CompiledTemplate:
+    """Parse a template once for repeated rendering"""
+    return CompiledTemplate(source)
+
+def contact_field_values(recipient: str, contact: Optional[Dict[str, Any]] = None,
+                         fallback: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Flatten a contact into merge fields
+    Raw JSON fields are available by their original keys; the extracted
+    name/company/title/email fields take precedence.
+    """
+    values: Dict[str, Any] = {}
+    if fallback:
+        values.update(fallback)
+    if contact:
+        for key, value in (contact.get('original_data') or {}).items():
+            if isinstance(value, (str, int, float)) and value != "":
+                values[key] = value
+        for key, value in contact.items():
+            if key != 'original_data' and value not in (None, ""):
+                values[key] = value
+    values['email'] = recipient
+    return values
+
+def find_missing_fields(templates: Iterable[CompiledTemplate],
+                        contacts: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Map each missing required field to the recipients lacking it, across all templates"""
+    missing: Dict[str, List[str]] = {}
+    templates = [template for template in templates if template.required_fields]
+    if not templates:
+        return missing
+
+    for recipient, values in contacts.items():
+        for template in templates:
+            for field in template.missing_fields(values):
+                recipients = missing.setdefault(field, [])
+                if not recipients or recipients[-1] != recipient:
+                    recipients.append(recipient)
+    return missing
@@ -1,20 +1,109 @@
 """
 Email validation and utility functions
+All address checks share the precompiled patterns below so every path agrees,
+and pasted text is split into entries once (iter_text_entries) for both
+extraction and diagnostics
 """
 import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+from config import (
+    EMAIL_ADDRESS_PATTERN, EMAIL_LOCAL_PART_PATTERN, EMAIL_DOMAIN_PATTERN, EMAIL_TLD_PATTERN
+)
+
+# Compiled once at import; callers never recompile per address
+EMAIL_FULLMATCH_RE = re.compile(EMAIL_ADDRESS_PATTERN)
+LOCAL_PART_RE = re.compile(EMAIL_LOCAL_PART_PATTERN)
+DOMAIN_RE = re.compile(EMAIL_DOMAIN_PATTERN)
+TLD_RE = re.compile(EMAIL_TLD_PATTERN)
+# Candidate entries in pasted text are runs between comma/semicolon/whitespace separators
+ENTRY_RE = re.compile(r'[^\s,;]+')
+ENTRY_STRIP_CHARS = '<>()[]"\'.:'
+# Link prefixes dropped from an entry before it is checked
+ENTRY_PREFIXES = ('mailto:',)
+
+def iter_emails(email_text: str) -> Iterator[str]:
+    """Yield the valid addresses among the entries of pasted text in a single streaming pass"""
+    fullmatch = EMAIL_FULLMATCH_RE.fullmatch
+    for entry in iter_text_entries(email_text):
+        if fullmatch(entry):
+            yield entry
 
 def extract_emails_from_text(email_text):
     """Extract valid email addresses from text"""
-    if not email_text:
-        return []
-    
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.findall(email_pattern, email_text)
+    return list(iter_emails(email_text))
 
 def validate_email(email):
     """Validate a single email address"""
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return bool(re.match(email_pattern, email))
+    return bool(email) and EMAIL_FULLMATCH_RE.fullmatch(email) is not None
+
+def invalid_email_reason(email: str) -> Optional[str]:
+    """Return why an address is invalid, or None if it is valid"""
+    if not email:
+        return "empty address"
+    if EMAIL_FULLMATCH_RE.fullmatch(email):
+        return None
+
+    at_count = email.count('@')
+    if at_count == 0:
+        return "missing @"
+    if at_count > 1:
+        return "more than one @"
+
+    local_part, domain = email.split('@')
+    if not local_part:
+        return "empty local part"
+    if not LOCAL_PART_RE.fullmatch(local_part):
+        return "invalid characters before @"
+    if not domain:
+        return "empty domain"
+    if not DOMAIN_RE.fullmatch(domain):
+        return "invalid characters in domain"
+    if '.' not in domain:
+        return "domain has no top-level domain"
+
+    tld = domain.rsplit('.', 1)[1]
+    if not TLD_RE.fullmatch(tld):
+        return f"invalid top-level domain '{tld}'"
+    return "invalid email format"
+
+def validate_emails(emails: Iterable[str]) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Validate many addresses in one pass
+    Returns (valid addresses, [(invalid entry, reason), ...]); blank entries are skipped
+    """
+    valid = []
+    invalid = []
+    fullmatch = EMAIL_FULLMATCH_RE.fullmatch
+
+    for entry in emails:
+        email = entry.strip() if entry else ""
+        if not email:
+            continue
+        if fullmatch(email):
+            valid.append(email)
+        else:
+            invalid.append((email, invalid_email_reason(email)))
+
+    return valid, invalid
+
+def iter_text_entries(email_text: str) -> Iterator[str]:
+    """Yield candidate entries (comma, semicolon or whitespace separated) from pasted text"""
+    if not email_text:
+        return
+    for match in ENTRY_RE.finditer(email_text):
+        entry = match.group().strip(ENTRY_STRIP_CHARS)
+        if entry.lower().startswith(ENTRY_PREFIXES):
+            entry = entry.split(':', 1)[1].strip(ENTRY_STRIP_CHARS)
+        # Only entries that look like an attempt at an address are worth reporting
+        if '@' in entry:
+            yield entry
+
+def validate_email_text(email_text: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Split pasted text into (valid addresses, [(invalid entry, reason), ...]) in one pass
+    Every address-like entry lands in exactly one of the two lists
+    """
+    return validate_emails(iter_text_entries(email_text))
 
 def format_inbox_display(inbox):
     """Format inbox for display in dropdown"""